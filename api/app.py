@@ -1,15 +1,24 @@
 """Minimal FastAPI bridge for web‑UI integration."""
+import json
 from fastapi import FastAPI
 from pydantic import BaseModel
-from codepipeline.cli import _gw, apply_fewshot_template, _default_tpl
+from codepipeline.cli import apply_fewshot_template, _default_tpl
+from codepipeline.circuit import BREAKERS
+from codepipeline.llm_gateway import AsyncLLMGateway
+from codepipeline.llm_cache import default_cache
+from codepipeline.rate_limit import default_limiter
+from codepipeline.semantic_cache import default_semantic_cache, is_semantic_hit
 
 class PromptIn(BaseModel):
     prompt: str
 
 class CodeOut(BaseModel):
     code: str
+    cache_hit: bool = False  # answered from the semantic cache
+    similarity: float | None = None
 
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, REGISTRY
 from prometheus_fastapi_instrumentator import Instrumentator
 app = FastAPI(title="CodePipeline API")
@@ -19,12 +28,44 @@ app.add_middleware(LatencyMiddleware)
 instrumentator = Instrumentator()
 instrumentator.instrument(app).expose(app)
 
+# non-blocking gateway: concurrent /synth requests share one pooled HTTP client
+_agw = AsyncLLMGateway(
+    cache=default_cache(), limiter=default_limiter(), semantic_cache=default_semantic_cache(), breakers=BREAKERS
+)
+
+@app.on_event("shutdown")
+async def _close_gateway():
+    await _agw.aclose()
+
 @app.post("/synth", response_model=CodeOut)
 async def synth(body: PromptIn):
     msgs = apply_fewshot_template(body.prompt, _default_tpl)
-    code = _gw.chat(msgs)
+    code = await _agw.chat(msgs, semantic_threshold=_default_tpl.semantic_threshold)
+    if is_semantic_hit(code):
+        return {"code": code, "cache_hit": True, "similarity": code.similarity}
     return {"code": code}
 
+@app.post("/synth/stream")
+async def synth_stream(body: PromptIn):
+    """Server-Sent Events: one ``data:`` event per JSON-encoded delta, then ``event: done``.
+
+    A semantic cache hit is announced first with ``event: cache-hit`` (data: similarity).
+    """
+    msgs = apply_fewshot_template(body.prompt, _default_tpl)
+
+    async def events():
+        try:
+            async for delta in _agw.chat_stream(msgs, semantic_threshold=_default_tpl.semantic_threshold):
+                if is_semantic_hit(delta):
+                    yield f"event: cache-hit\ndata: {delta.similarity:.4f}\n\n"
+                yield f"data: {json.dumps(delta)}\n\n"
+        except Exception as exc:  # headers are already sent – report in-band
+            yield f"event: error\ndata: {json.dumps(str(exc))}\n\n"
+            return
+        yield "event: done\ndata: \n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.get("/livez")
 async def livez():
     """Liveness probe for container orchestration."""
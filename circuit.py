@@ -4,68 +4,386 @@ Circuit Breaker Pattern Implementation.
 Provides a circuit breaker that can be used to prevent cascading failures
 in distributed systems by temporarily stopping the execution of operations
 that are likely to fail.
+
+Two modes are available:
+
+* :class:`CircuitBreaker` opens after ``fail_max`` failures;
+* :class:`SlidingWindowBreaker` opens when the failure *rate* over a
+  rolling time window reaches ``failure_rate``, once at least ``min_calls``
+  calls were seen in that window.
+
+Both are used via ``call``/``async_call`` or as a decorator (sync or async
+functions). While CLOSED a call costs one attribute read and no lock; locks
+are only taken on failures and state changes. After ``reset_timeout`` an
+open circuit admits a limited number of concurrent probe calls
+(HALF_OPEN) and closes again once they succeed.
+
+:class:`BreakerRegistry` hands out one breaker per ``(provider, model,
+endpoint)`` so a failing endpoint only opens its own circuit; the LLM
+gateways and the provider broker use the same key for the same target
+(``"openai"``, the model, ``"/v1/chat/completions"``). Callers that
+route between several targets check :meth:`available` and skip open
+breakers instead of calling them. Breaker state is exported as
+``codepipeline_circuit_state`` (0 closed, 1 half-open, 2 open) and rejected
+calls as ``codepipeline_circuit_rejected_total`` when *prometheus_client*
+is installed.
 """
 
+import abc
 import os
 import time
+import asyncio
+import functools
 import threading
 import logging
 from enum import Enum, auto
-from typing import Callable, TypeVar, Any, Optional
+from typing import Callable, TypeVar, Any, Awaitable, Optional, Dict, Tuple
 from codepipeline.logging_config import get_logger
 
+try:
+    from prometheus_client import Counter, Gauge
+except ModuleNotFoundError:  # metrics are optional
+    Counter=Gauge=None  # type: ignore[assignment]
+
 _T=TypeVar("_T")
 _log=get_logger(__name__)
 
+_LABELS=("provider","model","endpoint")
+CIRCUIT_STATE=Gauge("codepipeline_circuit_state","Circuit breaker state (0 closed, 1 half-open, 2 open)",_LABELS) if Gauge is not None else None
+CIRCUIT_REJECTED=Counter("codepipeline_circuit_rejected_total","Calls rejected by an open circuit",_LABELS) if Counter is not None else None
+
 class _State(Enum):
     CLOSED=auto()
     OPEN=auto()
     HALF_OPEN=auto()
 
-class CircuitBreaker:
+_CLOSED=_State.CLOSED
+_STATE_VALUE={_State.CLOSED:0,_State.HALF_OPEN:1,_State.OPEN:2}
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the circuit is open."""
+
+class Breaker(abc.ABC):
+    """State machine, probe admission and call forms shared by both breaker modes."""
+
     def __init__(self,
-                 fail_max:int=5,
-                 reset_timeout:float=30.0):
-        self.fail_max=fail_max
+                 reset_timeout:float,
+                 half_open_probes:int,
+                 key:Tuple[str,str,str]):
         self.reset_timeout=reset_timeout
+        self.half_open_probes=half_open_probes
+        self.key=key
         self._state=_State.CLOSED
-        self._failure_count=0
         self._opened_at:float|None=None
+        self._probes=0  # probes admitted in the current HALF_OPEN phase
+        self._probe_ok=0
+        self._probe_at=0.0
         self._lock=threading.Lock()
+        self._export()
+
+    @property
+    def name(self)->str:
+        return ":".join(part for part in self.key if part)
+
+    @property
+    def state(self)->str:
+        return self._state.name.lower()
+
+    def _export(self):
+        if CIRCUIT_STATE is not None:
+            CIRCUIT_STATE.labels(*self.key).set(_STATE_VALUE[self._state])
 
     def _transition(self,_state:_State):
-        _log.debug("Circuit transition %s -> %s",self._state,_state)
+        _log.debug("Circuit %s transition %s -> %s",self.name,self._state,_state)
         self._state=_state
         if _state==_State.OPEN:
             self._opened_at=time.time()
+        elif _state==_State.HALF_OPEN:
+            self._probes=self._probe_ok=0
         elif _state==_State.CLOSED:
-            self._failure_count=0
             self._opened_at=None
+            self._reset_counts()
+        self._export()
+
+    @abc.abstractmethod
+    def _reset_counts(self):
+        """Clear the failure statistics (on closing the circuit)."""
+
+    def available(self)->bool:
+        """True unless the circuit is open and still inside ``reset_timeout`` (no state change)."""
+        return self._state!=_State.OPEN or time.time()-(self._opened_at or 0)>=self.reset_timeout
+
+    def before_call(self)->None:
+        """Admit a call or raise :class:`CircuitOpenError`.
+
+        An expired OPEN circuit moves to HALF_OPEN, where at most
+        ``half_open_probes`` calls are admitted (more once ``reset_timeout``
+        passes without a probe reporting back).
+        """
+        if self._state is _CLOSED:
+            return
+        with self._lock:
+            now=time.time()
+            if self._state==_State.OPEN and now-(self._opened_at or 0)>=self.reset_timeout:
+                self._transition(_State.HALF_OPEN)
+            if self._state==_State.HALF_OPEN and (
+                self._probes<self.half_open_probes or now-self._probe_at>=self.reset_timeout
+            ):
+                self._probes+=1
+                self._probe_at=now
+                return
+            if self._state is _CLOSED:
+                return
+        if CIRCUIT_REJECTED is not None:
+            CIRCUIT_REJECTED.labels(*self.key).inc()
+        raise CircuitOpenError(f"Circuit {self.name} open – rejecting call")
+
+    def _probe_result(self,ok:bool)->None:
+        """Count a probe outcome; caller holds the lock and the state is HALF_OPEN."""
+        if not ok:
+            self._transition(_State.OPEN)
+            return
+        self._probe_ok+=1
+        if self._probe_ok>=self.half_open_probes:
+            self._transition(_State.CLOSED)
+
+    def record_ignored(self)->None:
+        """Release an admitted call without an outcome (e.g. rate limited – not an outage).
+
+        Frees its HALF_OPEN probe slot so the next call can probe instead of
+        being rejected until ``reset_timeout`` passes again.
+        """
+        if self._state is _CLOSED:
+            return
+        with self._lock:
+            if self._state==_State.HALF_OPEN and self._probes>0:
+                self._probes-=1
+
+    @abc.abstractmethod
+    def record_success(self)->None:
+        """Count a successful call."""
+
+    @abc.abstractmethod
+    def record_failure(self)->None:
+        """Count a failed call; may open the circuit."""
 
     def call(self, func:Callable[...,_T], *args:Any, **kwargs:Any)->_T:
+        self.before_call()
+        try:
+            result=func(*args,**kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    async def async_call(self, func:Callable[...,Awaitable[_T]], *args:Any, **kwargs:Any)->_T:
+        """Await ``func(*args, **kwargs)`` under the breaker (cancellation is not a failure)."""
+        self.before_call()
+        try:
+            result=await func(*args,**kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def __call__(self, func:Callable[...,Any])->Callable[...,Any]:
+        """Decorator form; coroutine functions are wrapped with :meth:`async_call`."""
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def _async_wrapper(*args:Any, **kwargs:Any)->Any:
+                return await self.async_call(func,*args,**kwargs)
+            return _async_wrapper
+
+        call=self.call
+
+        @functools.wraps(func)
+        def _wrapper(*args:Any, **kwargs:Any)->Any:
+            return call(func,*args,**kwargs)
+        return _wrapper
+
+class CircuitBreaker(Breaker):
+    """Opens after ``fail_max`` failures."""
+
+    def __init__(self,
+                 fail_max:int=5,
+                 reset_timeout:float=30.0,
+                 key:Tuple[str,str,str]=("global","",""),
+                 half_open_probes:int=1):
+        self.fail_max=fail_max
+        self._failure_count=0
+        super().__init__(reset_timeout,half_open_probes,key)
+
+    def _reset_counts(self):
+        self._failure_count=0
+
+    def record_success(self)->None:
+        if self._state is _CLOSED:
+            return
+        with self._lock:
+            if self._state==_State.HALF_OPEN:
+                self._probe_result(True)
+
+    def record_failure(self)->None:
         with self._lock:
-            if self._state==_State.OPEN:
-                if time.time()- (self._opened_at or 0) >= self.reset_timeout:
-                    self._transition(_State.HALF_OPEN)
-                else:
-                    raise RuntimeError("Circuit open – rejecting call")
+            if self._state==_State.HALF_OPEN:
+                self._probe_result(False)
+                return
+            self._failure_count+=1
+            if self._failure_count>=self.fail_max and self._state is _CLOSED:
+                self._transition(_State.OPEN)
+
+class SlidingWindowBreaker(Breaker):
+    """Opens when failures / calls over the last ``window`` seconds reach ``failure_rate``.
+
+    The window is split into ``buckets`` slots of per-slot success and
+    failure counts; slots older than the window are cleared as time moves
+    on. No decision is taken below ``min_calls`` calls in the window.
+    Success counts are updated without a lock, so under heavy thread
+    contention an occasional increment may be lost – the rate stays a
+    close estimate.
+    """
+
+    def __init__(self,
+                 failure_rate:float=0.5,
+                 window:float=60.0,
+                 min_calls:int=20,
+                 reset_timeout:float=30.0,
+                 half_open_probes:int=1,
+                 buckets:int=10,
+                 key:Tuple[str,str,str]=("global","","")):
+        self.failure_rate=failure_rate
+        self.window=window
+        self.min_calls=min_calls
+        self._n=buckets
+        self._width=window/buckets
+        self._ok=[0]*buckets
+        self._fail=[0]*buckets
+        epoch=int(time.monotonic()/self._width)
+        self._epoch=epoch
+        self._slot=epoch%buckets
+        self._edge=(epoch+1)*self._width  # monotonic time at which the current slot ends
+        super().__init__(reset_timeout,half_open_probes,key)
+
+    def _reset_counts(self):
+        self._ok=[0]*self._n
+        self._fail=[0]*self._n
+
+    def _advance(self,now:float)->None:
+        """Move to the slot of *now*, clearing slots that fell out of the window (takes the lock; rare)."""
+        with self._lock:
+            epoch=int(now/self._width)
+            last=self._epoch
+            if epoch<=last:
+                return
+            if epoch-last>=self._n:
+                self._reset_counts()
+            else:
+                for e in range(last+1,epoch+1):
+                    self._ok[e%self._n]=0
+                    self._fail[e%self._n]=0
+            self._epoch=epoch
+            self._slot=epoch%self._n
+            self._edge=(epoch+1)*self._width
+
+    def counts(self)->Tuple[int,int]:
+        """``(calls, failures)`` in the current window."""
+        now=time.monotonic()
+        if now>=self._edge:
+            self._advance(now)
+        failures=sum(self._fail)
+        return sum(self._ok)+failures,failures
 
+    def record_success(self)->None:
+        if self._state is _CLOSED:
+            now=time.monotonic()
+            if now>=self._edge:
+                self._advance(now)
+            self._ok[self._slot]+=1
+            return
+        with self._lock:
+            if self._state==_State.HALF_OPEN:
+                self._probe_result(True)
+
+    def record_failure(self)->None:
+        now=time.monotonic()
+        if now>=self._edge:
+            self._advance(now)
+        with self._lock:
+            if self._state==_State.HALF_OPEN:
+                self._probe_result(False)
+                return
+            if self._state is not _CLOSED:
+                return
+            self._fail[self._slot]+=1
+            failures=sum(self._fail)
+            calls=sum(self._ok)+failures
+            if calls>=self.min_calls and failures>=self.failure_rate*calls:
+                _log.warning("Circuit %s open: %d/%d calls failed in %.0fs",self.name,failures,calls,self.window)
+                self._transition(_State.OPEN)
+
+    def call(self, func:Callable[...,_T], *args:Any, **kwargs:Any)->_T:
+        if self._state is not _CLOSED:
+            return super().call(func,*args,**kwargs)
         try:
             result=func(*args,**kwargs)
-        except Exception as exc:
-            with self._lock:
-                self._failure_count+=1
-                if self._failure_count>=self.fail_max:
-                    self._transition(_State.OPEN)
+        except Exception:
+            self.record_failure()
             raise
-        else:
+        # inlined record_success() for the CLOSED fast path
+        now=time.monotonic()
+        if now>=self._edge:
+            self._advance(now)
+        self._ok[self._slot]+=1
+        return result
+
+class BreakerRegistry:
+    """Lazily created breakers keyed by ``(provider, model, endpoint)``.
+
+    ``factory(key)`` builds a new breaker; by default a :class:`CircuitBreaker`
+    with the registry's ``fail_max``/``reset_timeout``.
+    """
+
+    def __init__(self, fail_max:int=5, reset_timeout:float=30.0,
+                 factory:Optional[Callable[[Tuple[str,str,str]],Breaker]]=None):
+        self.fail_max=fail_max
+        self.reset_timeout=reset_timeout
+        self.factory=factory or (lambda key: CircuitBreaker(self.fail_max,self.reset_timeout,key))
+        self._breakers:Dict[Tuple[str,str,str],Breaker]={}
+        self._lock=threading.Lock()
+
+    def get(self, provider:str, model:str="", endpoint:str="")->Breaker:
+        key=(provider,model,endpoint)
+        breaker=self._breakers.get(key)
+        if breaker is None:
             with self._lock:
-                if self._state==_State.HALF_OPEN:
-                    self._transition(_State.CLOSED)
-            return result
+                breaker=self._breakers.get(key)
+                if breaker is None:
+                    breaker=self._breakers[key]=self.factory(key)
+        return breaker
+
+    def states(self)->Dict[str,str]:
+        """Current state per breaker name, e.g. ``{"openai:gpt-4o-mini:/v1/chat/completions": "closed"}``."""
+        return {b.name:b.state for b in list(self._breakers.values())}
+
+def _default_registry()->BreakerRegistry:
+    """Registry from the environment: ``CB_MODE=rate`` selects :class:`SlidingWindowBreaker`
+    (``CB_FAILURE_RATE``, ``CB_WINDOW``, ``CB_MIN_CALLS``), otherwise ``CB_FAIL_MAX`` failures."""
+    reset_timeout=float(os.getenv("CB_RESET_TIMEOUT", "30"))
+    factory=None
+    if os.getenv("CB_MODE", "count").lower()=="rate":
+        failure_rate=float(os.getenv("CB_FAILURE_RATE", "0.5"))
+        window=float(os.getenv("CB_WINDOW", "60"))
+        min_calls=int(os.getenv("CB_MIN_CALLS", "20"))
+        factory=lambda key: SlidingWindowBreaker(failure_rate,window,min_calls,reset_timeout,key=key)
+    return BreakerRegistry(int(os.getenv("CB_FAIL_MAX", "5")),reset_timeout,factory)
+
+# shared registry for the provider broker and the LLM gateways
+BREAKERS=_default_registry()
 
-# global breaker instance for provider broker
+# global breaker instance for provider broker (kept for existing callers; prefer BREAKERS)
 GLOBAL_BREAKER=CircuitBreaker(
     fail_max=int(os.getenv("CB_FAIL_MAX", "5")),
     reset_timeout=float(os.getenv("CB_RESET_TIMEOUT", "30"))
-)
\ No newline at end of file
+)
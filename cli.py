@@ -1,26 +1,53 @@
 """Command‑line interface for CodePipeline."""
-import sys, json, pathlib, typer
+import os, sys, json, pathlib, typer
+from codepipeline.circuit import BREAKERS
 from codepipeline.llm_gateway import LLMGateway
+from codepipeline.llm_cache import default_cache
+from codepipeline.rate_limit import default_limiter
+from codepipeline.semantic_cache import default_semantic_cache, is_semantic_hit
 from codepipeline.prompt_guard import apply_fewshot_template, PromptTemplate
 from codepipeline.rag_core import RAGCore
 
 app = typer.Typer(add_completion=False, help="CodePipeline CLI")
 
-_gw = LLMGateway()
+_gw = LLMGateway(
+    cache=default_cache(), limiter=default_limiter(), semantic_cache=default_semantic_cache(), breakers=BREAKERS
+)
 _default_tpl = PromptTemplate(
     name="cli",
     system="You are a senior Python engineer.",
+    semantic_cache=os.getenv("LLM_SEMANTIC_CACHE", "0").lower() in {"1", "true", "on", "yes"},
 )
 
 @app.command()
 def synth(
     prompt: str = typer.Option(..., help="Prompt text"),
     target: pathlib.Path = typer.Option(..., help="Output file path"),
+    stream: bool = typer.Option(True, "--stream/--no-stream", help="Stream tokens to disk as they arrive; target is replaced once complete"),
 ):
     """Generate code from prompt and write to target."""
     messages = apply_fewshot_template(prompt, _default_tpl)
-    code = _gw.chat(messages)
-    target.write_text(code)
+    hit = None
+    if stream:
+        # stream into a sibling file and swap it in only once complete,
+        # so a failed request never leaves the target truncated
+        partial = target.with_name(f".{target.name}.{os.getpid()}.part")
+        try:
+            with partial.open("w") as fh:
+                for delta in _gw.chat_stream(messages, semantic_threshold=_default_tpl.semantic_threshold):
+                    hit = delta if is_semantic_hit(delta) else None
+                    fh.write(delta)
+                    fh.flush()
+            os.replace(partial, target)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+    else:
+        code = _gw.chat(messages, semantic_threshold=_default_tpl.semantic_threshold)
+        hit = code if is_semantic_hit(code) else None
+        target.write_text(code)
+    if hit is not None:
+        typer.echo(f"cache-hit: reused answer to a similar prompt (similarity {hit.similarity:.2f})")
     typer.echo(f"Written to {target}")
 
 if __name__ == "__main__":  # pragma: no cover
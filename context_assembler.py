@@ -1,5 +1,21 @@
+"""Select the snippets most similar to a query and join them into a prompt context.
+
+For large corpora build an :class:`EmbeddingIndex` once: it holds the
+snippet embeddings as a pre-normalised float32 matrix, so a query costs one
+matrix-vector product plus ``argpartition`` for the top-k, and
+``top_k_batch``/:func:`assemble_context_batch` answer several queries with
+one matrix-matrix product. :func:`assemble_context` still accepts the
+``{id: embedding}`` dict and converts it on the fly; without NumPy it falls
+back to the pure-Python scan.
+"""
+import heapq
 import math
-from typing import Dict, List
+from typing import Dict, List, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ModuleNotFoundError:  # pure-Python fallback below
+    np = None  # type: ignore[assignment]
 
 def cosine_similarity(a: List[float], b: List[float]) -> float:
     dot = sum(x * y for x, y in zip(a, b))
@@ -9,9 +25,65 @@ def cosine_similarity(a: List[float], b: List[float]) -> float:
         return 0.0
     return dot / (norm_a * norm_b)
 
+def _normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    # zero vectors stay zero and score 0.0, as in cosine_similarity
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+class EmbeddingIndex:
+    """Snippet ids with their L2-normalised embeddings as one float32 matrix."""
+
+    def __init__(self, ids: Sequence[str], embeddings) -> None:
+        if np is None:
+            raise RuntimeError("numpy not installed")
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+            raise ValueError(f"expected {len(ids)} embedding rows, got shape {matrix.shape}")
+        self.ids = list(ids)
+        self.matrix = _normalize_rows(matrix)
+
+    @classmethod
+    def from_dict(cls, snippet_embeddings: Dict[str, List[float]]) -> "EmbeddingIndex":
+        return cls(list(snippet_embeddings), list(snippet_embeddings.values()))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def top_k(self, query_embedding: Sequence[float], k: int = 8) -> List[Tuple[str, float]]:
+        """``(id, similarity)`` of the *k* most similar snippets, best first."""
+        return self.top_k_batch([query_embedding], k)[0]
+
+    def top_k_batch(self, query_embeddings, k: int = 8) -> List[List[Tuple[str, float]]]:
+        """:meth:`top_k` for several queries with a single matrix product."""
+        queries = _normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        k = min(k, len(self.ids))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+        scores = queries @ self.matrix.T  # (queries, snippets)
+        if k < scores.shape[1]:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        results = []
+        for row, cand in zip(scores, candidates):
+            # best first; equal scores keep index order like the stable sort before
+            order = cand[np.lexsort((cand, -row[cand]))]
+            results.append([(self.ids[i], float(row[i])) for i in order])
+        return results
+
+def _join(top_ids: List[str], snippets: Dict[str, str], token_limit: int) -> str:
+    # Build context respecting token limit (approx. by length)
+    context = ""
+    for sid in top_ids:
+        snippet = snippets.get(sid, "")
+        if len(context) + len(snippet) > token_limit:
+            break
+        context += snippet + "\n"
+    return context
+
 def assemble_context(
     query_embedding: List[float],
-    snippet_embeddings: Dict[str, List[float]],
+    snippet_embeddings: Union[Dict[str, List[float]], EmbeddingIndex],
     snippets: Dict[str, str],
     top_k: int = 8,
     token_limit: int = 2048,
@@ -19,19 +91,30 @@ def assemble_context(
     """
     Select top_k snippets by cosine similarity and concatenate them
     into a context string without exceeding token_limit (approx. by char count).
+    ``snippet_embeddings`` is an :class:`EmbeddingIndex` or an ``{id: embedding}`` dict.
     """
-    # Compute similarities
-    sims = [
-        (cosine_similarity(query_embedding, snippet_embeddings[sid]), sid)
-        for sid in snippet_embeddings
+    if isinstance(snippet_embeddings, EmbeddingIndex):
+        index = snippet_embeddings
+    elif np is not None and snippet_embeddings:
+        index = EmbeddingIndex.from_dict(snippet_embeddings)
+    else:
+        sims = (
+            (cosine_similarity(query_embedding, emb), sid)
+            for sid, emb in snippet_embeddings.items()
+        )
+        top_ids = [sid for _, sid in heapq.nlargest(top_k, sims, key=lambda x: x[0])]
+        return _join(top_ids, snippets, token_limit)
+    return _join([sid for sid, _ in index.top_k(query_embedding, top_k)], snippets, token_limit)
+
+def assemble_context_batch(
+    query_embeddings: Sequence[Sequence[float]],
+    index: EmbeddingIndex,
+    snippets: Dict[str, str],
+    top_k: int = 8,
+    token_limit: int = 2048,
+) -> List[str]:
+    """:func:`assemble_context` for several queries against one index."""
+    return [
+        _join([sid for sid, _ in hits], snippets, token_limit)
+        for hits in index.top_k_batch(query_embeddings, top_k)
     ]
-    # Sort and select top_k
-    top_ids = [sid for _, sid in sorted(sims, key=lambda x: x[0], reverse=True)[:top_k]]
-    # Build context respecting token limit (approx. by length)
-    context = ""
-    for sid in top_ids:
-        snippet = snippets.get(sid, "")
-        if len(context) + len(snippet) > token_limit:
-            break
-        context += snippet + "\n"
-    return context
\ No newline at end of file
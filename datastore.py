@@ -1,12 +1,40 @@
 """
 Module: codepipeline.datastore
 Beschreibung: CRUD-API für Iterations-Daten mit CSV/JSON-Export.
+
+Standardmäßig hält der DataStore pro Thread eine persistente Verbindung im
+WAL-Modus offen; wiederholte Aufrufe nutzen so den Statement-Cache von
+sqlite3 (vorbereitete Statements) statt bei jedem Aufruf Verbindung und
+Schema-Cache neu aufzubauen. ``persistent=False`` öffnet wie früher für jeden
+Aufruf eine eigene Verbindung.
+
+Patches werden über den indizierten SHA-256-Hash ``patch_hash`` gefunden
+(``get_by_patch``); ``iter_iterations`` liest große Tabellen seitenweise per
+Keyset-Pagination und kann den ``patch``-Text per Spaltenprojektion
+auslassen.
+
+Alle Exporte (CSV, JSON, NDJSON, Parquet) lesen die Tabelle über
+``iter_iterations`` und schreiben inkrementell – der Speicherbedarf bleibt
+auch bei mehreren GB Historie konstant.
+
+KPI-Aggregate über ``score``, ``coverage_delta``, ``performance`` und
+``cost`` werden per Trigger beim Schreiben fortgeschrieben (Welford: Anzahl,
+Mittelwert, M2), global und je Stunden-Bucket, dazu Zähler je Status.
+``kpi_summary`` liest daraus ohne Scan der Historie. Veraltete Stunden-Buckets
+verwirft ``prune_kpis`` – nicht im Trigger, sondern höchstens einmal je
+``KPI_PRUNE_INTERVAL`` beim Lesen.
 """
 
 import sqlite3
 import json
 import csv
-from contextlib import closing
+import hashlib
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import closing, contextmanager
 
 DB_SCHEMA = """
 CREATE TABLE IF NOT EXISTS iterations (
@@ -17,32 +45,240 @@ CREATE TABLE IF NOT EXISTS iterations (
     coverage_delta REAL DEFAULT 0.0,
     performance REAL DEFAULT 0.0,
     cost REAL DEFAULT 0.0,
-    status TEXT NOT NULL
+    status TEXT NOT NULL,
+    patch_hash TEXT
 );
 """
 
+INSERT_ITERATION = (
+    "INSERT INTO iterations (timestamp, patch, score, status, coverage_delta, performance, cost, patch_hash) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# öffentliche Spalten (Reihenfolge der bisherigen Ergebnis-dicts)
+COLUMNS = ("id", "timestamp", "patch", "score", "status", "coverage_delta", "performance", "cost")
+
+def patch_hash(patch):
+    """SHA-256-Hexdigest eines Patch-Textes (Schlüssel für den Patch-Index)."""
+    return hashlib.sha256(patch.encode("utf-8")).hexdigest()
+
+EXPORT_BATCH_SIZE = 5000
+
+# Kennzahlen mit inkrementell gepflegten Aggregaten
+KPI_METRICS = ("score", "coverage_delta", "performance", "cost")
+
+# Stunden-Bucket eines Zeitstempels (''-Bucket = Gesamthistorie)
+_HOUR_BUCKET = "strftime('%Y-%m-%d %H:00', {})"
+# ältester Stunden-Bucket des 24h-Fensters (aktuelle Stunde + 23 vorherige, UTC)
+_LAST_24H = "'now', '-23 hours'"
+# Stunden-Buckets älter als dieses Fenster (24h plus Reserve) werden verworfen
+_KPI_RETENTION = "'now', '-48 hours'"
+# Mindestabstand in Sekunden zwischen zwei Bereinigungen in ``kpi_summary``
+KPI_PRUNE_INTERVAL = 3600.0
+
+def _kpi_add(row):
+    """Welford-Schritt für alle Kennzahlen eines neuen Datensatzes (``row`` = NEW), ein Upsert."""
+    values = " UNION ALL ".join(
+        f"SELECT '{m}' AS m, {row}.{m} AS x" if i == 0 else f"SELECT '{m}', {row}.{m}"
+        for i, m in enumerate(KPI_METRICS)
+    )
+    return f"""
+        INSERT INTO iteration_kpis (bucket, metric, n, mean, m2)
+        SELECT b, m, 1, x, 0.0
+          FROM (SELECT '' AS b UNION ALL SELECT {_HOUR_BUCKET.format(row + '.timestamp')}),
+               ({values})
+         WHERE b IS NOT NULL AND x IS NOT NULL
+        ON CONFLICT (bucket, metric) DO UPDATE SET
+            n = n + 1,
+            mean = mean + (excluded.mean - mean) / (n + 1),
+            m2 = m2 + (excluded.mean - mean) * (excluded.mean - mean - (excluded.mean - mean) / (n + 1));"""
+
+def _kpi_remove(row, metric):
+    """Umgekehrter Welford-Schritt für einen entfernten Wert (``row`` = OLD)."""
+    x = f"{row}.{metric}"
+    return f"""
+        UPDATE iteration_kpis SET
+            n = n - 1,
+            mean = CASE WHEN n > 1 THEN (n * mean - {x}) / (n - 1) ELSE 0.0 END,
+            m2 = CASE WHEN n > 1 THEN MAX(m2 - ({x} - mean) * ({x} - (n * mean - {x}) / (n - 1)), 0.0) ELSE 0.0 END
+         WHERE metric = '{metric}' AND {x} IS NOT NULL
+           AND bucket IN ('', {_HOUR_BUCKET.format(row + '.timestamp')});"""
+
+def _kpi_trigger_body(removed, added):
+    body = []
+    if removed:
+        body += [_kpi_remove("OLD", m) for m in KPI_METRICS]
+        body.append("\n        UPDATE iteration_status_counts SET n = n - 1 WHERE status = OLD.status;")
+    if added:
+        body.append(_kpi_add("NEW"))
+        body.append("""
+        INSERT INTO iteration_status_counts (status, n) VALUES (NEW.status, 1)
+        ON CONFLICT (status) DO UPDATE SET n = n + 1;""")
+    return "".join(body)
+
+_KPI_TRIGGERS = ("trg_iterations_kpi_insert", "trg_iterations_kpi_delete", "trg_iterations_kpi_update")
+
+KPI_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS iteration_kpis (
+        bucket TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        mean REAL NOT NULL,
+        m2 REAL NOT NULL,
+        PRIMARY KEY (bucket, metric)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS iteration_status_counts (
+        status TEXT PRIMARY KEY,
+        n INTEGER NOT NULL
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_iterations_kpi_insert AFTER INSERT ON iterations
+    BEGIN{_kpi_trigger_body(False, True)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_iterations_kpi_delete AFTER DELETE ON iterations
+    BEGIN{_kpi_trigger_body(True, False)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_iterations_kpi_update
+    AFTER UPDATE OF timestamp, score, status, coverage_delta, performance, cost ON iterations
+    BEGIN{_kpi_trigger_body(True, True)}
+    END""",
+)
+
+def _kpi_stats(n, mean, m2):
+    """Kennzahlen aus Welford-Zustand (Stichprobenvarianz)."""
+    variance = m2 / (n - 1) if n > 1 else 0.0
+    return {"n": n, "mean": mean if n else None, "variance": variance, "stddev": math.sqrt(variance)}
+
+def _kpi_merge(states):
+    """Fasst Welford-Zustände (n, mean, m2) zusammen (Chan et al.)."""
+    n, mean, m2 = 0, 0.0, 0.0
+    for n_b, mean_b, m2_b in states:
+        if not n_b:
+            continue
+        delta = mean_b - mean
+        total = n + n_b
+        mean += delta * n_b / total
+        m2 += m2_b + delta * delta * n * n_b / total
+        n = total
+    return n, mean, m2
+
+# Arrow-Typen der Spalten für den Parquet-Export
+_ARROW_TYPES = {
+    "id": "int64", "timestamp": "string", "patch": "string", "score": "float64",
+    "status": "string", "coverage_delta": "float64", "performance": "float64", "cost": "float64",
+}
+
+def _projection(columns):
+    """Validiert eine Spaltenauswahl und liefert die SELECT-Liste (``id`` immer enthalten)."""
+    if columns is None:
+        return ", ".join(COLUMNS)
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unbekannte Spalten: {sorted(unknown)}")
+    return ", ".join(["id"] + [c for c in COLUMNS if c in columns and c != "id"])
+
 class DataStore:
-    def __init__(self, db_path):
+    def __init__(self, db_path, persistent=True):
         self.db_path = db_path
+        self.persistent = persistent
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._kpis_pruned_at = None
         self._initialize()
 
     def _initialize(self):
         """Initialisiert die Datenbank und das Schema."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             conn.execute(DB_SCHEMA)
+            cols = {c[1] for c in conn.execute("PRAGMA table_info(iterations)")}
+            if "patch_hash" not in cols:
+                # Bestandsdatenbank: Spalte ergänzen und Hashes nachtragen
+                conn.execute("ALTER TABLE iterations ADD COLUMN patch_hash TEXT")
+                conn.create_function("patch_hash", 1, patch_hash, deterministic=True)
+                conn.execute("UPDATE iterations SET patch_hash = patch_hash(patch)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_iterations_patch_hash ON iterations(patch_hash)")
+        with self._connection() as conn:
+            # Aggregattabellen und Trigger atomar anlegen, Bestandsdaten einmalig nachrechnen
+            conn.execute("BEGIN IMMEDIATE")
+            fresh = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'iteration_kpis'"
+            ).fetchone() is None
+            # Trigger stets neu anlegen, damit ältere Fassungen ersetzt werden
+            for name in _KPI_TRIGGERS:
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            for statement in KPI_SCHEMA:
+                conn.execute(statement)
+            if fresh:
+                self._rebuild_kpis(conn)
+
+    def _connect(self):
+        """Öffnet eine neue Verbindung; im persistenten Modus WAL-optimiert."""
+        conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False, cached_statements=256)
+        if self.persistent:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            with self._conns_lock:
+                self._conns.append((conn, os.getpid()))
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Liefert eine Verbindung innerhalb einer Transaktion (Commit/Rollback am Ende)."""
+        if not self.persistent:
+            with closing(self._connect()) as conn, conn:
+                yield conn
+            return
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = self._connect()
+            local.pid = os.getpid()
+        with local.conn:
+            yield local.conn
+
+    def close(self):
+        """Schließt alle persistenten Verbindungen dieses Prozesses."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn, pid in conns:
+            if pid == os.getpid():
+                conn.close()
+        self._local = threading.local()
 
     def create_iteration(self, timestamp, patch, score, status, coverage_delta=0.0, performance=0.0, cost=0.0):
         """Legt einen neuen Iterationseintrag an."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute(
-                "INSERT INTO iterations (timestamp, patch, score, status, coverage_delta, performance, cost) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (timestamp, patch, score, status, coverage_delta, performance, cost)
+                INSERT_ITERATION,
+                (timestamp, patch, score, status, coverage_delta, performance, cost, patch_hash(patch))
             )
             return cursor.lastrowid
 
+    def create_iterations_bulk(self, iterations):
+        """Legt viele Iterationseinträge in einer einzigen Transaktion an.
+
+        :param iterations: Iterable von dicts mit den Feldern von ``create_iteration``
+        :return: Liste der neuen IDs (in Eingabereihenfolge)
+        """
+        rows = [
+            (
+                it["timestamp"], it["patch"], it["score"], it["status"],
+                it.get("coverage_delta", 0.0), it.get("performance", 0.0), it.get("cost", 0.0),
+                patch_hash(it["patch"]),
+            )
+            for it in iterations
+        ]
+        if not rows:
+            return []
+        with self._connection() as conn:
+            # Schreibsperre vorab holen: die neuen rowids schließen lückenlos an MAX(id) an
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM iterations").fetchone()[0]
+            conn.executemany(INSERT_ITERATION, rows)
+        return list(range(last_id + 1, last_id + 1 + len(rows)))
+
     def get_iteration(self, iteration_id):
         """Gibt einen Iterationsdatensatz anhand der ID zurück."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute(
                 "SELECT id, timestamp, patch, score, status, coverage_delta, performance, cost FROM iterations WHERE id = ?",
                 (iteration_id,)
@@ -50,22 +286,80 @@ class DataStore:
             row = cursor.fetchone()
             return dict(zip([column[0] for column in cursor.description], row)) if row else None
 
-    def list_iterations(self):
-        """Listet alle Iterationsdatensätze."""
-        with sqlite3.connect(self.db_path) as conn:
+    def get_by_patch(self, patch, columns=None):
+        """Gibt den ersten Iterationsdatensatz zu einem Patch zurück (Index-Lookup über ``patch_hash``)."""
+        with self._connection() as conn:
             cursor = conn.execute(
-                "SELECT id, timestamp, patch, score, status, coverage_delta, performance, cost FROM iterations ORDER BY id"
+                f"SELECT {_projection(columns)} FROM iterations WHERE patch_hash = ? AND patch = ? ORDER BY id LIMIT 1",
+                (patch_hash(patch), patch)
+            )
+            row = cursor.fetchone()
+            return dict(zip([column[0] for column in cursor.description], row)) if row else None
+
+    def get_many_by_patch(self, patches, columns=None, chunk_size=500):
+        """Wie ``get_by_patch`` für viele Patches: ``patch_hash IN (...)`` in Blöcken von ``chunk_size``.
+
+        :return: dict Patch -> erster Iterationsdatensatz (fehlende Patches fehlen im dict)
+        """
+        wanted = list(dict.fromkeys(patches))
+        select = _projection(None if columns is None else set(columns) | {"patch"})
+        found = {}
+        with self._connection() as conn:
+            for start in range(0, len(wanted), chunk_size):
+                chunk = wanted[start:start + chunk_size]
+                cursor = conn.execute(
+                    f"SELECT {select} FROM iterations WHERE patch_hash IN ({', '.join('?' * len(chunk))}) ORDER BY id",
+                    [patch_hash(patch) for patch in chunk]
+                )
+                names = [column[0] for column in cursor.description]
+                for row in cursor:
+                    entry = dict(zip(names, row))
+                    found.setdefault(entry["patch"], entry)
+        # Hash-Treffer ohne passenden Patch-Text (Kollision) verwerfen
+        return {patch: found[patch] for patch in wanted if patch in found}
+
+    def list_iterations(self, columns=None):
+        """Listet alle Iterationsdatensätze (optional nur die Spalten ``columns``)."""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                f"SELECT {_projection(columns)} FROM iterations ORDER BY id"
             )
             columns = [col[0] for col in cursor.description]
             return [dict(zip(columns, row)) for row in cursor.fetchall()]
 
+    def iter_iterations(self, batch_size=1000, columns=None):
+        """Liefert alle Iterationsdatensätze als Generator, seitenweise per Keyset-Pagination.
+
+        Jede Seite ist eine eigene kurze Abfrage (``WHERE id > ? ORDER BY id
+        LIMIT ?``), der Speicherbedarf bleibt unabhängig von der Tabellengröße
+        konstant. Mit ``columns`` (z.B. ohne ``patch``) wird nur die
+        angegebene Projektion gelesen; ``id`` ist immer enthalten.
+        """
+        select = _projection(columns)
+        last_id = 0
+        while True:
+            with self._connection() as conn:
+                cursor = conn.execute(
+                    f"SELECT {select} FROM iterations WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                )
+                names = [col[0] for col in cursor.description]
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(zip(names, row))
+            last_id = rows[-1][0]
+
     def update_iteration(self, iteration_id, **fields):
         """Aktualisiert ein Iterationsdatensatz. Felder: timestamp, patch, score, status, coverage_delta, performance, cost."""
         if not fields:
             return False
+        if "patch" in fields:
+            fields["patch_hash"] = patch_hash(fields["patch"])
         keys = ", ".join(f"{k}=?" for k in fields)
         values = list(fields.values()) + [iteration_id]
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute(
                 f"UPDATE iterations SET {keys} WHERE id = ?",
                 values
@@ -74,27 +368,173 @@ class DataStore:
 
     def delete_iteration(self, iteration_id):
         """Löscht einen Iterationsdatensatz anhand der ID."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connection() as conn:
             cursor = conn.execute(
                 "DELETE FROM iterations WHERE id = ?",
                 (iteration_id,)
             )
             return cursor.rowcount > 0
 
-    def export_to_csv(self, csv_path):
-        """Exportiert alle Iterationsdatensätze nach CSV."""
-        rows = self.list_iterations()
-        if not rows:
+    def _rebuild_kpis(self, conn):
+        """Berechnet alle KPI-Aggregate aus der Rohtabelle neu (streamend über den Cursor)."""
+        conn.execute("DELETE FROM iteration_kpis")
+        conn.execute("DELETE FROM iteration_status_counts")
+        conn.execute(
+            "INSERT INTO iteration_status_counts (status, n) SELECT status, COUNT(*) FROM iterations GROUP BY status"
+        )
+        states = {}
+        cursor = conn.execute(
+            f"SELECT {_HOUR_BUCKET.format('timestamp')}, {', '.join(KPI_METRICS)} FROM iterations"
+        )
+        for hour, *values in cursor:
+            for bucket in ("", hour) if hour is not None else ("",):
+                for metric, x in zip(KPI_METRICS, values):
+                    if x is None:
+                        continue
+                    n, mean, m2 = states.get((bucket, metric), (0, 0.0, 0.0))
+                    n += 1
+                    delta = x - mean
+                    mean += delta / n
+                    states[(bucket, metric)] = (n, mean, m2 + delta * (x - mean))
+        conn.executemany(
+            "INSERT INTO iteration_kpis (bucket, metric, n, mean, m2) VALUES (?, ?, ?, ?, ?)",
+            [key + state for key, state in states.items()]
+        )
+
+    def rebuild_kpis(self):
+        """Setzt die KPI-Aggregate aus den Rohdaten neu auf (Reparatur/Migration)."""
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._rebuild_kpis(conn)
+
+    def prune_kpis(self):
+        """Verwirft Stunden-Buckets außerhalb des 24h-Fensters (plus Reserve).
+
+        :return: Anzahl gelöschter Aggregatzeilen
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM iteration_kpis WHERE bucket > '' AND bucket < {_HOUR_BUCKET.format(_KPI_RETENTION)}"
+            )
+        self._kpis_pruned_at = time.monotonic()
+        return cursor.rowcount
+
+    def kpi_summary(self, last_n=None):
+        """Liefert die KPI-Zusammenfassung aus den materialisierten Aggregaten.
+
+        :param last_n: optional zusätzlich Kennzahlen über die letzten N Iterationen
+            (Bereichsscan über den Primärschlüssel, O(N) statt O(Historie))
+        :return: dict mit ``count``, ``status_counts``, ``metrics`` (gesamt) und
+            ``last_24h`` (Stunden-Buckets der letzten 24h, UTC), je Kennzahl
+            ``n``, ``mean``, ``variance`` und ``stddev``
+        """
+        if self._kpis_pruned_at is None or time.monotonic() - self._kpis_pruned_at >= KPI_PRUNE_INTERVAL:
+            self.prune_kpis()
+        with self._connection() as conn:
+            status_counts = dict(conn.execute(
+                "SELECT status, n FROM iteration_status_counts WHERE n > 0 ORDER BY status"
+            ))
+            totals = {
+                metric: (n, mean, m2)
+                for metric, n, mean, m2 in conn.execute(
+                    "SELECT metric, n, mean, m2 FROM iteration_kpis WHERE bucket = ''"
+                )
+            }
+            hourly = {}
+            for metric, n, mean, m2 in conn.execute(
+                "SELECT metric, n, mean, m2 FROM iteration_kpis "
+                f"WHERE bucket >= {_HOUR_BUCKET.format(_LAST_24H)}"
+            ):
+                hourly.setdefault(metric, []).append((n, mean, m2))
+            window = None
+            if last_n is not None:
+                # zentrierte Zwei-Pass-Summe statt SUM(x*x) - n*mean² (Auslöschung)
+                means = ", ".join(f"AVG({m}) AS mean_{m}" for m in KPI_METRICS)
+                aggregates = ", ".join(
+                    f"COUNT({m}), mean_{m}, SUM(({m} - mean_{m}) * ({m} - mean_{m}))" for m in KPI_METRICS
+                )
+                row = conn.execute(
+                    f"WITH w AS (SELECT {', '.join(KPI_METRICS)} FROM iterations ORDER BY id DESC LIMIT ?) "
+                    f"SELECT {aggregates} FROM w, (SELECT {means} FROM w)",
+                    (last_n,)
+                ).fetchone()
+                window = {
+                    metric: _kpi_stats(row[3 * i] or 0, row[3 * i + 1] or 0.0, max(row[3 * i + 2] or 0.0, 0.0))
+                    for i, metric in enumerate(KPI_METRICS)
+                }
+        summary = {
+            "count": sum(status_counts.values()),
+            "status_counts": status_counts,
+            "metrics": {m: _kpi_stats(*totals.get(m, (0, 0.0, 0.0))) for m in KPI_METRICS},
+            "last_24h": {m: _kpi_stats(*_kpi_merge(hourly.get(m, ()))) for m in KPI_METRICS},
+        }
+        if window is not None:
+            summary["last_n"] = window
+        return summary
+
+    def iter_ndjson(self, columns=None, batch_size=EXPORT_BATCH_SIZE):
+        """Liefert die Iterationsdatensätze als NDJSON-Zeilen (z.B. für Streaming-Responses)."""
+        for row in self.iter_iterations(batch_size, columns):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    def export(self, path, fmt="ndjson", columns=None):
+        """Exportiert im Format ``csv``, ``json``, ``ndjson`` oder ``parquet``."""
+        exporters = {
+            "csv": self.export_to_csv,
+            "json": self.export_to_json,
+            "ndjson": self.export_to_ndjson,
+            "parquet": self.export_to_parquet,
+        }
+        if fmt not in exporters:
+            raise ValueError(f"Unbekanntes Exportformat: {fmt}")
+        return exporters[fmt](path, columns=columns)
+
+    def export_to_csv(self, csv_path, columns=None):
+        """Exportiert alle Iterationsdatensätze nach CSV (streamend)."""
+        rows = self.iter_iterations(EXPORT_BATCH_SIZE, columns)
+        first = next(rows, None)
+        if first is None:
             return False
         with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=rows[0].keys())
+            writer = csv.DictWriter(csvfile, fieldnames=first.keys())
             writer.writeheader()
+            writer.writerow(first)
             writer.writerows(rows)
         return True
 
-    def export_to_json(self, json_path):
-        """Exportiert alle Iterationsdatensätze nach JSON."""
-        rows = self.list_iterations()
+    def export_to_json(self, json_path, columns=None):
+        """Exportiert alle Iterationsdatensätze als JSON-Array (streamend, ein Datensatz pro Zeile)."""
         with open(json_path, 'w', encoding='utf-8') as jsonfile:
-            json.dump(rows, jsonfile, ensure_ascii=False, indent=2)
-        return True
\ No newline at end of file
+            jsonfile.write("[")
+            for i, row in enumerate(self.iter_iterations(EXPORT_BATCH_SIZE, columns)):
+                jsonfile.write(",\n  " if i else "\n  ")
+                jsonfile.write(json.dumps(row, ensure_ascii=False))
+            jsonfile.write("\n]")
+        return True
+
+    def export_to_ndjson(self, ndjson_path, columns=None):
+        """Exportiert alle Iterationsdatensätze als NDJSON (ein JSON-Objekt pro Zeile)."""
+        with open(ndjson_path, 'w', encoding='utf-8') as ndjsonfile:
+            ndjsonfile.writelines(self.iter_ndjson(columns))
+        return True
+
+    def export_to_parquet(self, parquet_path, columns=None, batch_size=EXPORT_BATCH_SIZE):
+        """Exportiert alle Iterationsdatensätze spaltenorientiert nach Parquet (benötigt ``pyarrow``).
+
+        Jede Seite aus ``iter_iterations`` wird als eigene Row-Group geschrieben.
+        """
+        try:
+            import pyarrow as pa  # type: ignore
+            import pyarrow.parquet as pq  # type: ignore
+        except ImportError:  # pragma: no cover
+            raise RuntimeError("pyarrow not installed")
+        names = [c.strip() for c in _projection(columns).split(",")]
+        schema = pa.schema([(name, getattr(pa, _ARROW_TYPES[name])()) for name in names])
+        rows = self.iter_iterations(batch_size, columns)
+        with pq.ParquetWriter(parquet_path, schema) as writer:
+            while True:
+                batch = list(itertools.islice(rows, batch_size))
+                if not batch:
+                    break
+                writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+        return True
@@ -2,39 +2,27 @@
 GUI ↔ Orchestrator Bridge
 """
 
-import threading
 import tkinter as tk
 from codepipeline.orchestrator import Orchestrator
 from codepipeline.task_queue import TaskQueue
+from codepipeline.task_executor import TaskExecutor
 
 class GUIBridge:
     def __init__(self, root: tk.Tk):
         self.root = root
         self.orchestrator = Orchestrator()
         self.task_queue = TaskQueue()
-        self._running = True
+        # one pipeline run at a time; a failed run is not retried automatically
+        self.executor = TaskExecutor(self.task_queue, max_workers=1, max_attempts=1)
+        self.executor.register('run_pipeline', self._run_pipeline)
 
-    def start_background_worker(self):
-        def worker():
-            while self._running:
-                task = self.task_queue.fetch_next()
-                if not task:
-                    import time; time.sleep(0.5)
-                    continue
-                try:
-                    # Map tasks to orchestrator methods
-                    if task['type'] == 'run_pipeline':
-                        self.orchestrator.run()
-                    # mark success after execution
-                    self.task_queue.mark_success(task['id'])
-                except Exception as exc:  # pylint: disable=broad-except
-                    # Mark task as failed and persist the exception type
-                    self.task_queue.mark_failed(task['id'], type(exc).__name__)
-                    import logging, traceback
-                    logging.error('Task %s failed: %s', task['id'], traceback.format_exc())
+    def _run_pipeline(self, task) -> None:
+        # the handler's return value is stored as the JSON task result; the
+        # orchestrator's return value is not guaranteed to be serialisable
+        self.orchestrator.run()
 
-        thread = threading.Thread(target=worker, daemon=True)
-        thread.start()
+    def start_background_worker(self):
+        self.executor.start()
 
     def setup_events(self):
         self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
@@ -43,5 +31,5 @@ class GUIBridge:
         run_button.pack()
 
     def shutdown(self):
-        self._running = False
-        self.root.quit()
\ No newline at end of file
+        self.executor.shutdown(drain=False)
+        self.root.quit()
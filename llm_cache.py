@@ -0,0 +1,226 @@
+"""Content-addressed response cache for :class:`~codepipeline.llm_gateway.LLMGateway`.
+
+Responses are keyed by a SHA-256 over the model, the messages and all
+sampling kwargs (see :func:`cache_key`), so only byte-identical requests
+share an entry. Two tiers are provided and can be combined:
+
+* :class:`LRUCache` – in-process, bounded by entry count;
+* :class:`SQLiteCache` – on disk, shared between processes and CI reruns,
+  bounded by entry count (oldest entries are evicted first).
+
+:class:`TieredCache` reads memory first, then disk (promoting hits) and
+writes through to both. Every tier honours a TTL. Any object with
+``get(key)``/``set(key, value)`` can be plugged into the gateway instead.
+
+Hits and misses are counted per tier in ``stats`` and, when
+*prometheus_client* is installed, in ``codepipeline_llm_cache_requests_total``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+
+from codepipeline.logging_config import get_logger
+
+try:
+    from prometheus_client import Counter
+except ModuleNotFoundError:  # metrics are optional
+    Counter = None  # type: ignore[assignment]
+
+logger = get_logger(__name__)
+
+DEFAULT_TTL = 7 * 24 * 3600
+
+CACHE_REQUESTS = (
+    Counter("codepipeline_llm_cache_requests_total", "LLM response cache lookups", ["tier", "result"])
+    if Counter is not None
+    else None
+)
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], **kwargs: Any) -> str:
+    """Stable hash of a chat request (model, messages and sampling kwargs)."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "kwargs": kwargs},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(Protocol):
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str) -> None: ...
+
+
+class _Stats:
+    """Hit/miss bookkeeping shared by the tiers."""
+
+    tier = "cache"
+
+    def __init__(self) -> None:
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _record(self, hit: bool) -> None:
+        self.stats["hits" if hit else "misses"] += 1
+        if CACHE_REQUESTS is not None:
+            CACHE_REQUESTS.labels(tier=self.tier, result="hit" if hit else "miss").inc()
+
+
+class LRUCache(_Stats):
+    """Thread-safe in-memory LRU with per-entry TTL."""
+
+    tier = "memory"
+
+    def __init__(self, max_entries: int = 1024, ttl: float | None = DEFAULT_TTL) -> None:
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.time() - item[0] > self.ttl:
+                del self._data[key]
+                item = None
+            if item is not None:
+                self._data.move_to_end(key)
+        self._record(item is not None)
+        return None if item is None else item[1]
+
+    def set(self, key: str, value: str, created: float | None = None) -> None:
+        with self._lock:
+            self._data[key] = (time.time() if created is None else created, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache(_Stats):
+    """On-disk cache tier; one connection per thread, opened lazily."""
+
+    tier = "sqlite"
+
+    def __init__(self, path: str | os.PathLike, max_entries: int = 100_000, ttl: float | None = DEFAULT_TTL) -> None:
+        super().__init__()
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created)")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, key: str) -> Optional[Tuple[float, str]]:
+        """Return ``(created, value)`` for a live entry, counting the hit/miss."""
+        row = self.conn.execute("SELECT created, value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is not None and self.ttl is not None and time.time() - row[0] > self.ttl:
+            self.conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            row = None
+        self._record(row is not None)
+        return row
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.lookup(key)
+        return None if row is None else row[1]
+
+    def set(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+        self._writes += 1
+        # size check is a COUNT(*) scan – amortise it over writes
+        if self._writes % 64 == 0 or self.max_entries < 64:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries and the oldest ones beyond ``max_entries``."""
+        removed = 0
+        if self.ttl is not None:
+            removed += self.conn.execute(
+                "DELETE FROM llm_cache WHERE created < ?", (time.time() - self.ttl,)
+            ).rowcount
+        excess = self.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+        if excess > 0:
+            removed += self.conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY created LIMIT ?)",
+                (excess,),
+            ).rowcount
+        return removed
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class TieredCache:
+    """Memory tier in front of a disk tier; disk hits are promoted."""
+
+    def __init__(self, memory: LRUCache, disk: SQLiteCache | None = None) -> None:
+        self.memory = memory
+        self.disk = disk
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None or self.disk is None:
+            return value
+        row = self.disk.lookup(key)
+        if row is None:
+            return None
+        # keep the original creation time so the TTL is not extended by promotion
+        self.memory.set(key, row[1], created=row[0])
+        return row[1]
+
+    def set(self, key: str, value: str) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+
+def default_cache() -> TieredCache | None:
+    """Cache configured from the environment, or ``None`` unless ``LLM_CACHE=1``.
+
+    Caching is opt-in: a cached response is replayed for every identical
+    request, which is only right when callers sample deterministically
+    (``temperature=0``). ``LLM_CACHE_PATH`` sets the SQLite file (empty for
+    memory only), ``LLM_CACHE_TTL`` the TTL in seconds and
+    ``LLM_CACHE_MAX_ENTRIES`` the disk tier size.
+    """
+    if os.getenv("LLM_CACHE", "0").lower() not in {"1", "true", "on", "yes"}:
+        return None
+    ttl = float(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL))
+    path = os.getenv("LLM_CACHE_PATH", str(Path.home() / ".cache" / "codepipeline" / "llm_cache.db"))
+    disk = SQLiteCache(path, int(os.getenv("LLM_CACHE_MAX_ENTRIES", 100_000)), ttl) if path else None
+    return TieredCache(LRUCache(ttl=ttl), disk)
@@ -1,54 +1,578 @@
 """Unified LLM Gateway wrapping *openai-python* with transparent retries.
 
 Other modules should **not** access ``openai.OpenAI`` directly.
+
+Pass a response cache (see :mod:`codepipeline.llm_cache`) to serve
+byte-identical requests without a provider call; ``chat(..., cache=False)``
+bypasses it for calls that rely on non-deterministic sampling.
+
+:class:`AsyncLLMGateway` is the asyncio counterpart for the API server: it
+uses ``openai.AsyncOpenAI`` on one pooled ``httpx.AsyncClient`` and retries
+with :func:`async_retry`, so waiting on the provider never blocks the event
+loop.
+
+Both gateways coalesce concurrent identical requests (same cache key) into
+a single upstream call via :mod:`codepipeline.singleflight`.
+
+``chat_stream`` yields content deltas as they arrive (a generator on
+:class:`LLMGateway`, an async iterator on :class:`AsyncLLMGateway`). Only
+opening the stream is retried; once output has been yielded a failure is
+raised to the caller. Cache hits are yielded as a single chunk and complete
+streams are written to the cache.
+
+An optional :class:`~codepipeline.rate_limit.RateLimiter` paces every
+provider call by requests and estimated tokens per minute; a 429 with a
+``Retry-After`` hint pauses all callers sharing the limiter. The retry
+decorators sleep for the provider's ``Retry-After`` when given and jitter
+their backoff so concurrent callers do not retry in lockstep.
+
+``LLMGateway.chat_batch`` runs many requests for offline workloads, either
+through ``chat`` on a bounded thread pool or, with ``use_batch_api=True``,
+as one job on the provider's asynchronous Batch API (discounted, up to 24h
+turnaround). Results come back in input order with per-item errors.
+
+With a :class:`~codepipeline.semantic_cache.SemanticCache`,
+``chat(..., semantic_threshold=0.95)`` also answers paraphrases of earlier
+prompts: the last user message is compared with earlier ones sent with the
+same model, system prompt and kwargs, and a hit is returned as a
+:class:`~codepipeline.semantic_cache.SemanticHit` (a ``str`` marked
+``semantic_hit``). Sampled hits are re-generated in the background for the
+false-hit audit.
+
+With a :class:`~codepipeline.circuit.BreakerRegistry` each provider call
+goes through the breaker for ``("openai", model, endpoint)``; an open
+circuit fails fast with :class:`~codepipeline.circuit.CircuitOpenError`,
+which the retry decorators do not retry.
 """
 from __future__ import annotations
 
+import asyncio
+import functools
+import json
 import logging
+import random
+import threading
 import time
-from typing import Any, Dict, List, Callable, TypeVar
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Dict, Iterator, List, Callable, Mapping, Sequence, TypeVar
+import httpx
+from openai import AsyncOpenAI, OpenAI
 from codepipeline.secrets import ensure_env
 from codepipeline.logging_config import get_logger
+from codepipeline.circuit import BreakerRegistry, CircuitOpenError
+from codepipeline.llm_cache import ResponseCache, cache_key
+from codepipeline.semantic_cache import SemanticCache, SemanticHit
+from codepipeline.singleflight import AsyncSingleFlight, SingleFlight
+from codepipeline.rate_limit import RateLimiter, estimate_tokens, is_rate_limited, retry_after
 
 _T = TypeVar("_T")
 
+PROVIDER = "openai"
+DEFAULT_MODEL = "gpt-4o-mini"
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+_BATCH_FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+# ``chat`` options handled by the gateway itself, never sent to the provider
+_GATEWAY_KWARGS = frozenset({"cache", "semantic_threshold"})
+
+@dataclass
+class BatchResult:
+    """Outcome of one :meth:`LLMGateway.chat_batch` request."""
+
+    content: str | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
 def _default_client() -> OpenAI:
     """Initialise the OpenAI client with API‑Key sourced via Vault helper."""
     ensure_env("OPENAI_API_KEY")
     return OpenAI()
 
-def retry(times: int = 3, delay: float = 1.0, backoff: float = 2.0) -> Callable[[Callable[..., _T]], Callable[..., _T]]:
-    """Very small retry decorator with exponential backoff."""
+def _default_async_client(max_connections: int = 256, timeout: float = 120.0) -> AsyncOpenAI:
+    """Async OpenAI client on a single pooled HTTP client shared by all requests."""
+    ensure_env("OPENAI_API_KEY")
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout,
+    )
+    return AsyncOpenAI(http_client=http_client)
+
+def _retry_wait(exc: Exception, delay: float, jitter: float, max_delay: float) -> float:
+    """Provider ``Retry-After`` if present, else the backoff *delay* reduced by up to ``jitter`` × delay.
+
+    Both are capped at *max_delay*.
+    """
+    hint = retry_after(exc)
+    if hint is not None:
+        return min(hint, max_delay)
+    return min(delay, max_delay) * (1.0 - jitter * random.random())
+
+def retry(
+    times: int = 3,
+    delay: float = 1.0,
+    backoff: float = 2.0,
+    *,
+    jitter: float = 0.5,
+    max_delay: float = 60.0,
+) -> Callable[[Callable[..., _T]], Callable[..., _T]]:
+    """Very small retry decorator with jittered exponential backoff and ``Retry-After`` support."""
     def _decorator(fn: Callable[..., _T]) -> Callable[..., _T]:
+        @functools.wraps(fn)
         def _wrapper(*args: Any, **kwargs: Any) -> _T:
             _delay = delay
             for attempt in range(1, times + 1):
                 try:
                     return fn(*args, **kwargs)
+                except CircuitOpenError:
+                    raise
                 except Exception as exc:  # pragma: no cover
                     if attempt == times:
                         raise
-                    get_logger(__name__).warning("LLM call failed (attempt %s/%s): %s – retrying in %.1fs", attempt, times, exc, _delay)
-                    time.sleep(_delay)
+                    wait = _retry_wait(exc, _delay, jitter, max_delay)
+                    get_logger(__name__).warning("LLM call failed (attempt %s/%s): %s – retrying in %.1fs", attempt, times, exc, wait)
+                    time.sleep(wait)
                     _delay *= backoff
         return _wrapper
     return _decorator
 
+def async_retry(
+    times: int = 3,
+    delay: float = 1.0,
+    backoff: float = 2.0,
+    *,
+    jitter: float = 0.5,
+    max_delay: float = 60.0,
+) -> Callable[[Callable[..., Awaitable[_T]]], Callable[..., Awaitable[_T]]]:
+    """Coroutine variant of :func:`retry`; waits with ``asyncio.sleep``."""
+    def _decorator(fn: Callable[..., Awaitable[_T]]) -> Callable[..., Awaitable[_T]]:
+        @functools.wraps(fn)
+        async def _wrapper(*args: Any, **kwargs: Any) -> _T:
+            _delay = delay
+            for attempt in range(1, times + 1):
+                try:
+                    return await fn(*args, **kwargs)
+                except CircuitOpenError:
+                    raise
+                except Exception as exc:  # pragma: no cover
+                    if attempt == times:
+                        raise
+                    wait = _retry_wait(exc, _delay, jitter, max_delay)
+                    get_logger(__name__).warning("LLM call failed (attempt %s/%s): %s – retrying in %.1fs", attempt, times, exc, wait)
+                    await asyncio.sleep(wait)
+                    _delay *= backoff
+        return _wrapper
+    return _decorator
+
+def _semantic_scope(model: str, messages: List[Dict[str, str]], kwargs: Mapping[str, Any]) -> tuple[str, str]:
+    """Split a request into its semantic-cache scope key and the prompt compared within it."""
+    return cache_key(model, messages[:-1], **kwargs), str(messages[-1].get("content") or "")
+
+def _delta(chunk: Any) -> str | None:
+    """Content delta of a streamed chat completion chunk (``None`` for role/usage chunks)."""
+    return chunk.choices[0].delta.content if chunk.choices else None
+
 class LLMGateway:
     """Production‑grade thin wrapper around OpenAI Chat Completions."""
 
-    def __init__(self, client: OpenAI | None = None):
+    def __init__(
+        self,
+        client: OpenAI | None = None,
+        cache: ResponseCache | None = None,
+        limiter: RateLimiter | None = None,
+        semantic_cache: SemanticCache | None = None,
+        breakers: BreakerRegistry | None = None,
+    ):
         self._client = client or _default_client()
+        self._cache = cache
+        self._limiter = limiter
+        self._semantic = semantic_cache
+        self._breakers = breakers
+        self._flight = SingleFlight()
 
-    @retry()
     def chat(
         self,
         messages: List[Dict[str, str]],
         *,
-        model: str = "gpt-4o-mini",
+        model: str = DEFAULT_MODEL,
+        cache: bool = True,
+        semantic_threshold: float | None = None,
+        **kwargs: Any,
+    ) -> str:
+        """Send chat completion request and return raw content.
+
+        With a configured cache, identical ``(model, messages, kwargs)``
+        requests are answered from it; concurrent identical requests share
+        one upstream call. ``cache=False`` skips cache and coalescing.
+        ``semantic_threshold`` enables the semantic cache for this call.
+        """
+        if not cache:
+            return self._complete(messages, model=model, **kwargs)
+        key = cache_key(model, messages, **kwargs)
+        if self._cache is not None:
+            content = self._cache.get(key)
+            if content is not None:
+                return content
+        hit, vector = self._semantic_lookup(messages, model, kwargs, semantic_threshold)
+        if hit is not None:
+            return hit
+        content = self._flight.do(key, lambda: self._complete_and_store(key, messages, model, kwargs))
+        self._semantic_add(messages, model, kwargs, vector, content)
+        return content
+
+    def _semantic_lookup(
+        self, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any], threshold: float | None
+    ) -> tuple[SemanticHit | None, Any]:
+        """Semantic hit (or ``None``) and the prompt vector; the vector is ``None`` when the cache is off."""
+        if threshold is None or self._semantic is None:
+            return None, None
+        hit, vector = self._semantic.search(*_semantic_scope(model, messages, kwargs), threshold)
+        if hit is not None and self._semantic.should_audit():
+            threading.Thread(
+                target=self._audit, args=(hit, messages, model, kwargs), name="semantic-audit", daemon=True
+            ).start()
+        return hit, vector
+
+    def _semantic_add(
+        self, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any], vector: Any, content: str | None
+    ) -> None:
+        """Store *content* under the vector from :meth:`_semantic_lookup` (no-op if the cache was off)."""
+        if vector is not None and content:
+            self._semantic.add(*_semantic_scope(model, messages, kwargs), content, vector)
+
+    def _audit(self, hit: SemanticHit, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any]) -> None:
+        try:
+            fresh = self._complete(messages, model=model, **kwargs)
+        except Exception as exc:  # the audit must never affect callers
+            get_logger(__name__).warning("Semantic cache audit failed: %r", exc)
+            return
+        self._semantic.audit(hit, fresh)
+
+    def _complete_and_store(self, key: str, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any]) -> str:
+        content = self._complete(messages, model=model, **kwargs)
+        if self._cache is not None and content is not None:
+            self._cache.set(key, content)
+        return content
+
+    def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: str = DEFAULT_MODEL,
+        cache: bool = True,
+        semantic_threshold: float | None = None,
+        **kwargs: Any,
+    ) -> Iterator[str]:
+        """Yield the completion as content deltas while it is generated."""
+        key = cache_key(model, messages, **kwargs)
+        if cache and self._cache is not None:
+            content = self._cache.get(key)
+            if content is not None:
+                yield content
+                return
+        vector = None
+        if cache:
+            hit, vector = self._semantic_lookup(messages, model, kwargs, semantic_threshold)
+            if hit is not None:
+                yield hit
+                return
+        parts: List[str] = []
+        for chunk in self._open_stream(messages, model=model, **kwargs):
+            delta = _delta(chunk)
+            if delta:
+                parts.append(delta)
+                yield delta
+        if cache and self._cache is not None:
+            self._cache.set(key, "".join(parts))
+        self._semantic_add(messages, model, kwargs, vector, "".join(parts))
+
+    def chat_batch(
+        self,
+        requests: Sequence[Mapping[str, Any]],
+        *,
+        max_concurrency: int = 8,
+        use_batch_api: bool = False,
+        poll_interval: float = 30.0,
+        timeout: float | None = None,
+    ) -> List[BatchResult]:
+        """Run many chat requests; results are returned in input order.
+
+        Each request is a mapping with ``messages`` and optionally ``model``
+        and further ``chat`` kwargs. Failures are reported per item in
+        :attr:`BatchResult.error` instead of being raised.
+
+        By default requests go through :meth:`chat` on at most
+        *max_concurrency* threads (cache, coalescing and rate limiting
+        apply). With *use_batch_api* the cache misses are submitted as one
+        provider batch job, polled every *poll_interval* seconds for at most
+        *timeout* seconds.
+        """
+        if use_batch_api:
+            return self._run_batch_job(requests, poll_interval, timeout)
+        results: List[BatchResult] = []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(requests)))) as pool:
+            futures = [
+                pool.submit(self.chat, req["messages"], **{k: v for k, v in req.items() if k != "messages"})
+                for req in requests
+            ]
+            for future in futures:
+                try:
+                    results.append(BatchResult(content=future.result()))
+                except Exception as exc:  # pylint: disable=broad-except
+                    results.append(BatchResult(error=exc))
+        return results
+
+    def _run_batch_job(
+        self, requests: Sequence[Mapping[str, Any]], poll_interval: float, timeout: float | None
+    ) -> List[BatchResult]:
+        results = [BatchResult() for _ in requests]
+        bodies: Dict[str, Dict[str, Any]] = {}
+        members: Dict[str, List[int]] = {}
+        for i, req in enumerate(requests):
+            body = {k: v for k, v in req.items() if k not in _GATEWAY_KWARGS}
+            body.setdefault("model", DEFAULT_MODEL)
+            key = cache_key(body["model"], body["messages"], **{k: v for k, v in body.items() if k not in ("model", "messages")})
+            if self._cache is not None and req.get("cache", True):
+                content = self._cache.get(key)
+                if content is not None:
+                    results[i].content = content
+                    continue
+            bodies.setdefault(key, body)  # identical requests are submitted once
+            members.setdefault(key, []).append(i)
+        if not bodies:
+            return results
+
+        try:
+            outcomes = self._submit_batch(bodies, poll_interval, timeout)
+        except Exception as exc:  # pylint: disable=broad-except
+            outcomes = {key: exc for key in bodies}
+        for key, indexes in members.items():
+            outcome = outcomes.get(key, RuntimeError("no result in batch output"))
+            for i in indexes:
+                if isinstance(outcome, Exception):
+                    results[i].error = outcome
+                else:
+                    results[i].content = outcome
+            if isinstance(outcome, str) and self._cache is not None:
+                self._cache.set(key, outcome)
+        return results
+
+    def _submit_batch(
+        self, bodies: Mapping[str, Dict[str, Any]], poll_interval: float, timeout: float | None
+    ) -> Dict[str, Any]:
+        """Upload *bodies* (keyed by custom id) as a batch job and collect content or errors per id."""
+        lines = "\n".join(
+            json.dumps({"custom_id": key, "method": "POST", "url": CHAT_COMPLETIONS_ENDPOINT, "body": body})
+            for key, body in bodies.items()
+        )
+        upload = self._client.files.create(file=("batch.jsonl", lines.encode("utf-8")), purpose="batch")
+        batch = self._client.batches.create(
+            input_file_id=upload.id, endpoint=CHAT_COMPLETIONS_ENDPOINT, completion_window="24h"
+        )
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while batch.status not in _BATCH_FINAL_STATES:
+            if deadline is not None and time.monotonic() >= deadline:
+                self._client.batches.cancel(batch.id)
+                raise TimeoutError(f"batch {batch.id} not finished after {timeout}s")
+            time.sleep(poll_interval)
+            batch = self._client.batches.retrieve(batch.id)
+        get_logger(__name__).info("Batch %s finished with status %s", batch.id, batch.status)
+
+        outcomes: Dict[str, Any] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self._client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    outcomes[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+                else:
+                    outcomes[item["custom_id"]] = RuntimeError(item.get("error") or response.get("body"))
+        if batch.status != "completed":
+            for key in bodies:
+                outcomes.setdefault(key, RuntimeError(f"batch {batch.id} {batch.status}"))
+        return outcomes
+
+    @retry()
+    def _complete(self, messages: List[Dict[str, str]], *, model: str, **kwargs: Any) -> str:
+        resp = self._create(messages, model=model, **kwargs)
+        return resp.choices[0].message.content  # type: ignore[attr-defined]
+
+    @retry()
+    def _open_stream(self, messages: List[Dict[str, str]], *, model: str, **kwargs: Any) -> Any:
+        return self._create(messages, model=model, stream=True, **kwargs)
+
+    def _create(self, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        """Single provider call, guarded by the circuit breaker and paced by the rate limiter."""
+        breaker = None
+        if self._breakers is not None:
+            breaker = self._breakers.get(PROVIDER, kwargs.get("model", ""), CHAT_COMPLETIONS_ENDPOINT)
+            breaker.before_call()
+        if self._limiter is not None:
+            self._limiter.acquire(estimate_tokens(messages, kwargs.get("max_tokens")))
+        try:
+            response = self._client.chat.completions.create(messages=messages, **kwargs)
+        except Exception as exc:
+            if is_rate_limited(exc):  # quota, not an outage – the limiter handles it
+                if self._limiter is not None:
+                    self._limiter.block(retry_after(exc))
+                if breaker is not None:
+                    breaker.record_ignored()
+            elif breaker is not None:
+                breaker.record_failure()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return response
+
+class AsyncLLMGateway:
+    """asyncio counterpart of :class:`LLMGateway` (same caching and retry semantics)."""
+
+    def __init__(
+        self,
+        client: AsyncOpenAI | None = None,
+        cache: ResponseCache | None = None,
+        limiter: RateLimiter | None = None,
+        semantic_cache: SemanticCache | None = None,
+        breakers: BreakerRegistry | None = None,
+    ):
+        self._client = client or _default_async_client()
+        self._cache = cache
+        self._limiter = limiter
+        self._semantic = semantic_cache
+        self._breakers = breakers
+        self._flight = AsyncSingleFlight()
+        self._audits: set[asyncio.Task] = set()
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: str = DEFAULT_MODEL,
+        cache: bool = True,
+        semantic_threshold: float | None = None,
         **kwargs: Any,
     ) -> str:
         """Send chat completion request and return raw content."""
-        resp = self._client.chat.completions.create(model=model, messages=messages, **kwargs)
-        return resp.choices[0].message.content  # type: ignore[attr-defined]
\ No newline at end of file
+        if not cache:
+            return await self._complete(messages, model=model, **kwargs)
+        key = cache_key(model, messages, **kwargs)
+        if self._cache is not None:
+            content = self._cache.get(key)
+            if content is not None:
+                return content
+        hit, vector = await self._semantic_lookup(messages, model, kwargs, semantic_threshold)
+        if hit is not None:
+            return hit
+        content = await self._flight.do(key, lambda: self._complete_and_store(key, messages, model, kwargs))
+        await self._semantic_add(messages, model, kwargs, vector, content)
+        return content
+
+    async def _semantic_lookup(
+        self, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any], threshold: float | None
+    ) -> tuple[SemanticHit | None, Any]:
+        """Like :meth:`LLMGateway._semantic_lookup`; embedding and index search run in a worker thread."""
+        if threshold is None or self._semantic is None:
+            return None, None
+        hit, vector = await asyncio.to_thread(self._semantic.search, *_semantic_scope(model, messages, kwargs), threshold)
+        if hit is not None and self._semantic.should_audit():
+            task = asyncio.ensure_future(self._audit(hit, messages, model, kwargs))
+            self._audits.add(task)
+            task.add_done_callback(self._audits.discard)
+        return hit, vector
+
+    async def _semantic_add(
+        self, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any], vector: Any, content: str | None
+    ) -> None:
+        if vector is not None and content:
+            # SQLite write off the event loop; the prompt is not embedded again
+            await asyncio.to_thread(self._semantic.add, *_semantic_scope(model, messages, kwargs), content, vector)
+
+    async def _audit(self, hit: SemanticHit, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any]) -> None:
+        try:
+            fresh = await self._complete(messages, model=model, **kwargs)
+        except Exception as exc:  # the audit must never affect callers
+            get_logger(__name__).warning("Semantic cache audit failed: %r", exc)
+            return
+        self._semantic.audit(hit, fresh)
+
+    async def _complete_and_store(
+        self, key: str, messages: List[Dict[str, str]], model: str, kwargs: Dict[str, Any]
+    ) -> str:
+        content = await self._complete(messages, model=model, **kwargs)
+        if self._cache is not None and content is not None:
+            self._cache.set(key, content)
+        return content
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: str = DEFAULT_MODEL,
+        cache: bool = True,
+        semantic_threshold: float | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[str]:
+        """Yield the completion as content deltas while it is generated."""
+        key = cache_key(model, messages, **kwargs)
+        if cache and self._cache is not None:
+            content = self._cache.get(key)
+            if content is not None:
+                yield content
+                return
+        vector = None
+        if cache:
+            hit, vector = await self._semantic_lookup(messages, model, kwargs, semantic_threshold)
+            if hit is not None:
+                yield hit
+                return
+        parts: List[str] = []
+        async for chunk in await self._open_stream(messages, model=model, **kwargs):
+            delta = _delta(chunk)
+            if delta:
+                parts.append(delta)
+                yield delta
+        if cache and self._cache is not None:
+            self._cache.set(key, "".join(parts))
+        await self._semantic_add(messages, model, kwargs, vector, "".join(parts))
+
+    @async_retry()
+    async def _complete(self, messages: List[Dict[str, str]], *, model: str, **kwargs: Any) -> str:
+        resp = await self._create(messages, model=model, **kwargs)
+        return resp.choices[0].message.content  # type: ignore[attr-defined]
+
+    @async_retry()
+    async def _open_stream(self, messages: List[Dict[str, str]], *, model: str, **kwargs: Any) -> Any:
+        return await self._create(messages, model=model, stream=True, **kwargs)
+
+    async def _create(self, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        """Single provider call, guarded by the circuit breaker and paced by the rate limiter."""
+        breaker = None
+        if self._breakers is not None:
+            breaker = self._breakers.get(PROVIDER, kwargs.get("model", ""), CHAT_COMPLETIONS_ENDPOINT)
+            breaker.before_call()
+        if self._limiter is not None:
+            await self._limiter.acquire_async(estimate_tokens(messages, kwargs.get("max_tokens")))
+        try:
+            response = await self._client.chat.completions.create(messages=messages, **kwargs)
+        except Exception as exc:
+            if is_rate_limited(exc):  # quota, not an outage – the limiter handles it
+                if self._limiter is not None:
+                    self._limiter.block(retry_after(exc))
+                if breaker is not None:
+                    breaker.record_ignored()
+            elif breaker is not None:
+                breaker.record_failure()
+            raise
+        if breaker is not None:
+            breaker.record_success()
+        return response
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP connections."""
+        await self._client.close()
@@ -13,25 +13,78 @@ Next Steps:
     1. Implementieren eines minimalen OpenAI-Wrappers (llm_client.complete) als LLM-Client-Adapter.
     2. Erweiterung des DataStore um die Felder fix_suggestion und commit_hash inklusive persistenter Speicherung.
     3. Ergänzung umfassender Unit-Tests zur Validierung aller neuen Methoden und Datenfelder.
+
+Parallelisierung:
+    ``generate_tasks`` fragt das LLM über einen Thread-Pool mit begrenzter
+    Parallelität an. Antworten werden pro Prompt-Hash (SHA-256 über Patch und
+    KPI-Werte) in ``planner_proposals`` zwischengespeichert; unveränderte
+    Iterationen lösen beim nächsten Lauf keinen LLM-Aufruf aus. Die Top-N
+    werden inkrementell über einen Heap bestimmt.
 """
 
 import os
 import json
+import heapq
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from codepipeline.datastore import DataStore
 from codepipeline.github_client import GitHubClient
+from codepipeline.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# KPI-Spalten, die in den Prompt eingehen
+PROMPT_COLUMNS = ('patch', 'coverage_delta', 'performance', 'cost')
+
+class _ProposalCache:
+    """Persistenter Cache geparster LLM-Vorschläge, Schlüssel = Prompt-Hash."""
+
+    def __init__(self, db_path):
+        self._conn = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS planner_proposals ("
+                "prompt_hash TEXT PRIMARY KEY, proposals TEXT NOT NULL)"
+            )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT proposals FROM planner_proposals WHERE prompt_hash = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, proposals):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO planner_proposals (prompt_hash, proposals) VALUES (?, ?)",
+                (key, json.dumps(proposals))
+            )
+
+    def close(self):
+        self._conn.close()
 
 class MetaPlanner:
-    def __init__(self, db_path, owner, repo, llm_client, github_client=None):
+    def __init__(self, db_path, owner, repo, llm_client, github_client=None, max_workers=8):
         self.store = DataStore(db_path)
+        self.cache = _ProposalCache(db_path)
         self.owner = owner
         self.repo = repo
         self.llm = llm_client
         self.github = github_client or GitHubClient()
+        self.max_workers = max_workers
 
     def _fetch_kpis(self):
         """Liest KPI-Werte und Abweichungen aus DataStore."""
         return self.store.list_iterations()
 
+    def kpi_summary(self, last_n=None):
+        """Liest die materialisierten KPI-Aggregate (Mittelwert/Varianz, 24h-Fenster, Status-Zähler) ohne Tabellenscan."""
+        return self.store.kpi_summary(last_n=last_n)
+
     def _build_prompt(self, entry):
         """Erstellt LLM-Prompt für eine Iteration."""
         return (
@@ -43,35 +96,83 @@ class MetaPlanner:
             "Generiere eine User-Story oder Refactoring-Task, um diese Abweichungen zu adressieren."
         )
 
-    def generate_tasks(self):
+    @staticmethod
+    def _prompt_hash(prompt):
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def _ask(self, prompt):
+        """LLM-Aufruf für einen Prompt; liefert die geparste Vorschlagsliste oder None."""
+        llm_response = self.llm.complete(prompt)
+        # Erwartetes Format: JSON-Liste von Tasks mit impact und effort
+        try:
+            proposals = json.loads(llm_response)
+        except json.JSONDecodeError:
+            return None
+        return proposals if isinstance(proposals, list) else None
+
+    def _proposals(self, max_workers):
+        """
+        Liefert ``(Position, Vorschlagsliste)`` je Iteration (Reihenfolge nach Fertigstellung).
+        Cache-Treffer werden ohne LLM-Aufruf geliefert, höchstens ``2 * max_workers``
+        Anfragen sind gleichzeitig offen.
+        """
+        entries = self.store.iter_iterations(columns=PROMPT_COLUMNS)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='meta-planner') as pool:
+            pending = {}
+
+            def _drain(return_when):
+                done, _ = wait(pending, return_when=return_when)
+                for future in done:
+                    index, key = pending.pop(future)
+                    try:
+                        proposals = future.result()
+                    except Exception as exc:  # pylint: disable=broad-except
+                        logger.warning("LLM-Aufruf für Prompt %s fehlgeschlagen: %r", key[:12], exc)
+                        continue
+                    if proposals is not None:
+                        self.cache.put(key, proposals)
+                        yield index, proposals
+
+            for index, entry in enumerate(entries):
+                prompt = self._build_prompt(entry)
+                key = self._prompt_hash(prompt)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    yield index, cached
+                    continue
+                pending[pool.submit(self._ask, prompt)] = (index, key)
+                if len(pending) >= 2 * max_workers:
+                    yield from _drain(FIRST_COMPLETED)
+            while pending:
+                yield from _drain(FIRST_COMPLETED)
+
+    def generate_tasks(self, top_n=None, max_workers=None):
         """
         Generiert Tasks über LLM und priorisiert sie.
+        :param top_n: nur die N Tasks mit dem höchsten Score liefern (Heap statt Vollsortierung)
+        :param max_workers: parallele LLM-Aufrufe (Default: ``self.max_workers``)
         :return: Liste von dicts mit 'type', 'description', 'impact', 'effort', 'score'
         """
-        entries = self._fetch_kpis()
-        tasks = []
-        for entry in entries:
-            prompt = self._build_prompt(entry)
-            llm_response = self.llm.complete(prompt)
-            # Erwartetes Format: JSON-Liste von Tasks mit impact und effort
-            try:
-                proposals = json.loads(llm_response)
-            except json.JSONDecodeError:
-                continue
-            for task in proposals:
+        heap = []
+        for index, proposals in self._proposals(max_workers or self.max_workers):
+            for pos, task in enumerate(proposals):
                 impact = task.get('impact', 0)
                 effort = task.get('effort', 1)
                 score = impact / effort
-                tasks.append({
+                # bei gleichem Score gewinnt die frühere Iteration (wie bei stabiler Sortierung)
+                item = (score, -index, -pos, {
                     'type': task.get('type', 'story'),
                     'description': task.get('description'),
                     'impact': impact,
                     'effort': effort,
                     'score': score
                 })
+                if top_n is None or len(heap) < top_n:
+                    heapq.heappush(heap, item)
+                elif item[:3] > heap[0][:3]:
+                    heapq.heapreplace(heap, item)
         # Priorisieren nach Score absteigend
-        tasks.sort(key=lambda t: t['score'], reverse=True)
-        return tasks
+        return [item[3] for item in sorted(heap, key=lambda i: i[:3], reverse=True)]
 
     def create_draft_issues(self, tasks, top_n=5):
         """
@@ -79,7 +180,7 @@ class MetaPlanner:
         :param tasks: Liste generierter Tasks
         :param top_n: Anzahl der zu erstellenden Issues
         """
-        for task in tasks[:top_n]:
+        for task in heapq.nlargest(top_n, tasks, key=lambda t: t['score']):
             title = f"[Meta-Plan] {task['type'].capitalize()}: {task['description'][:50]}..."
             body = (
                 f"**Typ:** {task['type']}\n"
@@ -0,0 +1,233 @@
+"""
+Background Pushgateway pusher with update coalescing.
+
+Callers record gauge values with :meth:`MetricsPusher.set` (a dict write
+under a lock); a daemon thread pushes them to the Pushgateway every
+``interval`` seconds, or earlier once ``flush_size`` updates are pending::
+
+    pusher = MetricsPusher("localhost:9091", job="reward_engine")
+    pusher.start()
+    pusher.set("pipeline_patch_score", 0.7, {"patch_id": "fix-123"})
+    ...
+    pusher.stop()  # final flush
+
+Repeated updates of the same series coalesce to the latest value. Flushes
+use POST, which replaces only the metrics whose names are in the request, so
+each flush sends just the metric families changed since the last successful
+push (with all of their series); unchanged families stay on the gateway as
+they are. At most ``max_series`` series are kept; beyond that the least
+recently updated series is dropped, which bounds both memory while the
+gateway is unreachable and the label cardinality of a single push. Failed
+flushes are retried with exponential backoff and never block :meth:`set`.
+"""
+
+from __future__ import annotations
+
+import atexit
+import functools
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, pushadd_to_gateway
+from prometheus_client.core import GaugeMetricFamily
+
+from codepipeline.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+PUSH_FAILURES = Counter(
+    "codepipeline_metrics_push_failures_total",
+    "Failed Pushgateway flushes",
+    ["job"],
+)
+SERIES_DROPPED = Counter(
+    "codepipeline_metrics_push_dropped_series_total",
+    "Series evicted because the pusher reached max_series",
+    ["job"],
+)
+
+
+class _SnapshotCollector:
+    """Exposes a frozen copy of the pusher's series as gauge families."""
+
+    def __init__(self, series: Mapping[SeriesKey, float], docs: Mapping[str, str], names: Iterable[str] = ()) -> None:
+        self._series = series
+        self._docs = docs
+        self._names = names  # families to send even without series, so the gateway clears them
+
+    def collect(self):
+        families: Dict[str, GaugeMetricFamily] = {}
+        for (name, labels), value in self._series.items():
+            family = families.get(name)
+            if family is None:
+                family = families[name] = GaugeMetricFamily(
+                    name, self._docs.get(name, name), labels=[k for k, _ in labels]
+                )
+            family.add_metric([v for _, v in labels], value)
+        for name in self._names:
+            if name not in families:
+                families[name] = GaugeMetricFamily(name, self._docs.get(name, name))
+        return list(families.values())
+
+
+def _stop_at_exit(ref: "weakref.ref[MetricsPusher]") -> None:
+    pusher = ref()
+    if pusher is not None:
+        pusher.stop()
+
+
+class MetricsPusher:
+    """Coalescing, bounded background pusher for Prometheus gauges."""
+
+    def __init__(
+        self,
+        gateway: str,
+        job: str,
+        *,
+        interval: float = 5.0,
+        flush_size: int = 1000,
+        max_series: int = 100_000,
+        max_backoff: float = 300.0,
+        timeout: float = 5.0,
+        grouping_key: Optional[Dict[str, str]] = None,
+    ) -> None:
+        self.gateway = gateway
+        self.job = job
+        self.interval = interval
+        self.flush_size = flush_size
+        self.max_series = max_series
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.grouping_key = grouping_key
+        self.dropped = 0
+        self._series: "OrderedDict[SeriesKey, float]" = OrderedDict()
+        self._docs: Dict[str, str] = {}
+        self._dirty: set = set()  # metric names changed since the last successful push
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        # weak reference, so the exit hook does not keep the pusher alive
+        self._atexit = functools.partial(_stop_at_exit, weakref.ref(self))
+
+    # ------------------------------------------------------------------#
+    # Recording                                                          #
+    # ------------------------------------------------------------------#
+    def set(self, name: str, value: float, labels: Optional[Mapping[str, str]] = None, documentation: str = "") -> None:
+        """Record the latest *value* of gauge *name* for *labels*."""
+        self.set_many(name, [(labels or {}, value)], documentation)
+
+    def set_many(
+        self,
+        name: str,
+        samples: Iterable[Tuple[Mapping[str, str], float]],
+        documentation: str = "",
+    ) -> None:
+        """Record several ``(labels, value)`` samples of gauge *name* at once."""
+        dropped = 0
+        with self._lock:
+            if documentation:
+                self._docs[name] = documentation
+            series = self._series
+            self._dirty.add(name)
+            for labels, value in samples:
+                key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+                series[key] = float(value)
+                series.move_to_end(key)
+                self._pending += 1
+            while len(series) > self.max_series:
+                (evicted, _), _ = series.popitem(last=False)
+                self._dirty.add(evicted)  # re-push the family so the gateway drops the series too
+                dropped += 1
+            self.dropped += dropped
+            due = self._pending >= self.flush_size
+        if dropped:
+            SERIES_DROPPED.labels(job=self.job).inc(dropped)
+        if due:
+            self._wake.set()
+
+    @property
+    def pending(self) -> int:
+        """Number of updates recorded since the last successful flush."""
+        return self._pending
+
+    # ------------------------------------------------------------------#
+    # Flushing                                                           #
+    # ------------------------------------------------------------------#
+    def flush(self) -> bool:
+        """Push the changed metric families now. Returns ``False`` if the gateway push failed."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                snapshot = {key: value for key, value in self._series.items() if key[0] in dirty}
+                docs = dict(self._docs)
+                pending, self._pending = self._pending, 0
+                if not dirty:
+                    return True
+            registry = CollectorRegistry()
+            registry.register(_SnapshotCollector(snapshot, docs, dirty))
+            try:
+                pushadd_to_gateway(
+                    self.gateway,
+                    job=self.job,
+                    registry=registry,
+                    grouping_key=self.grouping_key,
+                    timeout=self.timeout,
+                )
+            except Exception as exc:  # pylint: disable=broad-except
+                with self._lock:
+                    self._pending += pending
+                    self._dirty |= dirty
+                PUSH_FAILURES.labels(job=self.job).inc()
+                logger.warning("Pushgateway flush to %s failed: %r", self.gateway, exc)
+                return False
+            return True
+
+    # ------------------------------------------------------------------#
+    # Lifecycle                                                          #
+    # ------------------------------------------------------------------#
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-pusher", daemon=True)
+        self._thread.start()
+        atexit.register(self._atexit)
+
+    def stop(self, flush: bool = True) -> None:
+        """Stop the background thread, pushing pending updates once more if *flush*."""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+            atexit.unregister(self._atexit)
+        if flush and self._pending:
+            self.flush()
+
+    def __enter__(self) -> "MetricsPusher":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._stopping.is_set():
+            if failures:
+                # back off without reacting to flush_size wake-ups
+                self._stopping.wait(min(self.interval * 2 ** failures, self.max_backoff))
+            else:
+                self._wake.wait(self.interval)
+                self._wake.clear()
+            if self._stopping.is_set():
+                break
+            if self._pending:
+                failures = 0 if self.flush() else failures + 1
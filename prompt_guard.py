@@ -27,6 +27,13 @@ class PromptTemplate:
     system: str
     examples: List[Dict[str, str]] = field(default_factory=list)
     min_score: float = 0.4  # thresholds 0..1
+    semantic_cache: bool = False  # answer near-duplicate prompts from the semantic cache
+    similarity_threshold: float = 0.95  # cosine similarity 0..1 for a semantic hit
+
+    @property
+    def semantic_threshold(self) -> float | None:
+        """Threshold to pass to ``LLMGateway.chat`` (``None`` disables the semantic cache)."""
+        return self.similarity_threshold if self.semantic_cache else None
 
 # ------------------------------------------------------------------
 # Heuristic quality evaluation (very lightweight, no ML)
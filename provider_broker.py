@@ -1,20 +1,69 @@
 """
 Provider broker for CodePipeline.
+
+:class:`Broker` routes each request to the fastest healthy provider. Per
+provider it keeps an EWMA of latency and error rate plus a window of recent
+latencies; providers whose error EWMA exceeds ``max_error_rate`` are only
+used as a last resort until ``recovery_time`` has passed since their last
+failure. A provider without a successful call yet is ranked with an
+optimistic prior – the mean latency of the measured providers – and wins
+ties against providers with more samples, so new providers get measured
+while one that keeps failing does not jump ahead of working ones; a fresh
+broker behaves like the plain ordered failover. Optionally a share
+``explore`` of requests (none by default) goes to the runner-up instead, so
+a provider demoted by a latency spike is re-measured and can win back.
+
+With ``hedge=True`` a second request is sent to the next provider once the
+primary has been running longer than its own latency quantile
+(``hedge_quantile``, p95 by default); the first successful answer wins and
+the other request is cancelled if it has not started yet, otherwise its
+result is discarded (``Provider.generate`` is synchronous and cannot be
+interrupted). Its latency is still recorded.
+
+Every provider has its own circuit breaker from a
+:class:`~codepipeline.circuit.BreakerRegistry`, keyed by
+:attr:`Provider.breaker_key` – ``(name, model, endpoint)``, the same key the
+LLM gateways use for the same target. Without ``breakers=`` the broker keeps
+a private registry; pass :data:`~codepipeline.circuit.BREAKERS` to share
+circuit state with the gateways. Providers with an open circuit are left
+out of the ranking rather than being called and timed out.
 """
 
 import os
-from typing import Dict, Any, Optional
+import random
+import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple
+from codepipeline.circuit import Breaker, BreakerRegistry, CircuitOpenError
 from codepipeline.logging_config import get_logger
 from abc import ABC, abstractmethod
 
 logger = get_logger(__name__)
 
 class Provider(ABC):
+    # circuit-breaker key parts, see breaker_key
+    name: str = ""
+    model: str = ""
+    endpoint: str = ""
+
+    @property
+    def breaker_key(self) -> Tuple[str, str, str]:
+        """``(provider, model, endpoint)``; the class name stands in for a missing ``name``."""
+        return (self.name or self.__class__.__name__, self.model, self.endpoint)
+
     @abstractmethod
     def generate(self, prompt: str) -> str:
         pass
 
 class OpenAIProvider(Provider):
+    # same key as LLMGateway's calls (PROVIDER, DEFAULT_MODEL, CHAT_COMPLETIONS_ENDPOINT)
+    name = "openai"
+    model = "gpt-4o-mini"
+    endpoint = "/v1/chat/completions"
+
     def generate(self, prompt: str) -> str:
         # Placeholder for OpenAI API call
         from openai import Completion
@@ -22,21 +71,185 @@ class OpenAIProvider(Provider):
         return f"OpenAI response for: {prompt}"
 
 class AnthropicProvider(Provider):
+    name = "anthropic"
+    endpoint = "/v1/messages"
+
     def generate(self, prompt: str) -> str:
         # Placeholder for Anthropic API call
         from anthropic import Anthropic, HUMAN_PROMPT, AI_PROMPT
         return f"Anthropic response for: {prompt}"
 
+@dataclass
+class ProviderStats:
+    """Rolling latency/error statistics of one provider."""
+
+    latency: Optional[float] = None  # EWMA in seconds, None until the first success
+    error_rate: float = 0.0  # EWMA of failures (0..1)
+    last_failure: float = 0.0
+    samples: deque = field(default_factory=lambda: deque(maxlen=256))
+
+    def record(self, seconds: float, ok: bool, alpha: float) -> None:
+        self.error_rate += alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.latency = seconds if self.latency is None else self.latency + alpha * (seconds - self.latency)
+            self.samples.append(seconds)
+        else:
+            self.last_failure = time.monotonic()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
 class Broker:
-    def __init__(self, providers: list[Provider]):
+    def __init__(
+        self,
+        providers: list[Provider],
+        *,
+        alpha: float = 0.1,
+        max_error_rate: float = 0.5,
+        recovery_time: float = 30.0,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        min_samples: int = 20,
+        explore: float = 0.0,
+        breakers: Optional[BreakerRegistry] = None,
+    ):
+        if not providers:
+            raise ValueError("Broker needs at least one provider")
         self.providers = providers
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.recovery_time = recovery_time
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples  # no hedging before the quantile is meaningful
+        self.explore = explore
+        self.stats: Dict[int, ProviderStats] = {id(p): ProviderStats() for p in providers}
+        registry = BreakerRegistry() if breakers is None else breakers
+        self.breakers: Dict[int, Breaker] = {id(p): registry.get(*p.breaker_key) for p in providers}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _healthy(self, stats: ProviderStats) -> bool:
+        return (
+            stats.error_rate < self.max_error_rate
+            or time.monotonic() - stats.last_failure >= self.recovery_time
+        )
+
+    def ranking(self) -> list[Provider]:
+        """Providers in routing order: healthy by latency EWMA, then unhealthy by error rate.
+
+        Providers whose circuit is open are left out.
+        """
+        with self._lock:
+            stats = [self.stats[id(p)] for p in self.providers]
+            healthy = [self._healthy(s) for s in stats]
+            measured = [s.latency for s in stats if s.latency is not None]
+            prior = sum(measured) / len(measured) if measured else 0.0
+            order = sorted(
+                (i for i, p in enumerate(self.providers) if self.breakers[id(p)].available()),
+                key=lambda i: (
+                    not healthy[i],
+                    stats[i].error_rate if not healthy[i] else (
+                        prior if stats[i].latency is None else stats[i].latency
+                    ),
+                    stats[i].error_rate,
+                    len(stats[i].samples),
+                    i,
+                ),
+            )
+        if len(order) > 1 and healthy[order[1]] and random.random() < self.explore:
+            order[0], order[1] = order[1], order[0]
+        return [self.providers[i] for i in order]
+
+    def _call(self, provider: Provider, prompt: str) -> str:
+        breaker = self.breakers[id(provider)]
+        breaker.before_call()  # rejections are not provider failures – nothing to record
+        start = time.perf_counter()
+        try:
+            result = provider.generate(prompt)
+        except Exception:
+            breaker.record_failure()
+            self._record(provider, time.perf_counter() - start, ok=False)
+            raise
+        breaker.record_success()
+        self._record(provider, time.perf_counter() - start, ok=True)
+        return result
+
+    def _record(self, provider: Provider, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.stats[id(provider)].record(seconds, ok, self.alpha)
+
+    def _hedge_delay(self, provider: Provider) -> Optional[float]:
+        with self._lock:
+            stats = self.stats[id(provider)]
+            if len(stats.samples) < self.min_samples:
+                return None
+            return stats.quantile(self.hedge_quantile)
 
     def generate(self, prompt: str) -> str:
+        if self.hedge and len(self.providers) > 1:
+            return self._generate_hedged(prompt)
         last_error = None
-        for provider in self.providers:
+        for provider in self.ranking():
             try:
-                return provider.generate(prompt)
+                return self._call(provider, prompt)
             except Exception as e:
                 logger.warning(f"Provider {provider.__class__.__name__} failed: {e}")
                 last_error = e
-        raise RuntimeError(f"All providers failed: {last_error}")
\ No newline at end of file
+        if last_error is None:
+            raise CircuitOpenError("All providers failed: every circuit is open")
+        raise RuntimeError(f"All providers failed: {last_error}")
+
+    def _generate_hedged(self, prompt: str) -> str:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=min(32, 4 * len(self.providers) + (os.cpu_count() or 1)),
+                        thread_name_prefix="broker",
+                    )
+        candidates = iter(self.ranking())
+        pending: Dict[Future, Provider] = {}
+        last_error = None
+        hedged = False
+
+        def _launch() -> Optional[Provider]:
+            provider = next(candidates, None)
+            if provider is not None:
+                pending[self._pool.submit(self._call, provider, prompt)] = provider
+            return provider
+
+        primary = _launch()
+        while pending:
+            # at most one hedge per request, fired once the primary passes its p95
+            delay = None if hedged or len(pending) > 1 else self._hedge_delay(primary)
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                if _launch() is not None:
+                    logger.debug("Hedging request after %.3fs", delay)
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"Provider {provider.__class__.__name__} failed: {e}")
+                    last_error = e
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                return result
+            if not pending:
+                primary = _launch()
+        if last_error is None:
+            raise CircuitOpenError("All providers failed: every circuit is open")
+        raise RuntimeError(f"All providers failed: {last_error}")
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,198 @@
+"""Client-side rate limiting for LLM provider calls.
+
+:class:`RateLimiter` paces calls with two token buckets, one for requests
+per minute and one for (estimated) tokens per minute, both running at
+``headroom`` × the provider quota so sustained throughput stays just below
+it::
+
+    limiter = RateLimiter(rpm=500, tpm=200_000)
+    limiter.acquire(estimate_tokens(messages, max_tokens=512))  # sleeps if needed
+    ...
+    limiter.block(retry_after(exc))  # provider said 429 – pause every caller
+
+Buckets are reservation based: a caller takes its cost immediately (the
+level may go negative) and sleeps until the debt is repaid. Concurrent
+callers therefore queue up in an orderly way instead of waking together.
+
+With ``path`` the bucket state lives in a SQLite file, so every process
+using the same file shares one quota. :func:`retry_after` extracts the
+provider's ``Retry-After``/``retry-after-ms`` hint from an exception.
+"""
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from codepipeline.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# rough average for English text and code; errs on the high side
+CHARS_PER_TOKEN = 4
+# per-message formatting overhead of the chat format
+TOKENS_PER_MESSAGE = 4
+# assumed completion size when the request sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 256
+
+_BLOCKED = "__blocked__"
+
+
+def estimate_tokens(messages: List[Mapping[str, Any]], max_tokens: int | None = None) -> int:
+    """Estimate the quota cost of a chat request (prompt plus completion budget)."""
+    prompt = sum(TOKENS_PER_MESSAGE + len(str(m.get("content") or "")) // CHARS_PER_TOKEN for m in messages)
+    return prompt + (DEFAULT_COMPLETION_TOKENS if max_tokens is None else max_tokens)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds to wait according to the provider's response headers, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or getattr(exc, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):  # neither seconds nor an HTTP date
+        return None
+    return None if parsed is None else max(parsed.timestamp() - time.time(), 0.0)
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    return getattr(exc, "status_code", None) == 429 or getattr(getattr(exc, "response", None), "status_code", None) == 429
+
+
+class RateLimiter:
+    """Requests/min + tokens/min token buckets shared by threads (and optionally processes)."""
+
+    def __init__(
+        self,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        *,
+        headroom: float = 0.95,
+        burst_seconds: float = 10.0,
+        path: str | os.PathLike | None = None,
+    ) -> None:
+        # bucket name -> (refill rate per second, capacity)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        for name, per_minute in (("requests", rpm), ("tokens", tpm)):
+            if per_minute:
+                rate = per_minute * headroom / 60.0
+                self._buckets[name] = (rate, max(rate * burst_seconds, 1.0))
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._state: Dict[str, Tuple[float, float]] = {}  # name -> (level, updated)
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------#
+    # Public API                                                         #
+    # ------------------------------------------------------------------#
+    def reserve(self, tokens: int = 0) -> float:
+        """Take one request and *tokens* from the buckets; return the seconds to wait."""
+        costs = {"requests": 1.0, "tokens": float(tokens)}
+        if self.path is None:
+            with self._lock:
+                return self._reserve(self._state, costs, time.monotonic())
+        return self._reserve_shared(costs)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until the call may proceed; returns the time slept."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: int = 0) -> float:
+        """Like :meth:`acquire` but sleeps with ``asyncio.sleep``."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def block(self, seconds: float | None) -> None:
+        """Hold back every caller for *seconds* (e.g. a provider ``Retry-After``)."""
+        if not seconds or seconds <= 0:
+            return
+        if self.path is None:
+            with self._lock:
+                until = time.monotonic() + seconds
+                if until > self._state.get(_BLOCKED, (0.0, 0.0))[0]:
+                    self._state[_BLOCKED] = (until, until)
+            return
+        until = time.time() + seconds
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO rate_limit (name, level, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET level = MAX(level, excluded.level), updated = excluded.updated",
+                (_BLOCKED, until, until),
+            )
+
+    # ------------------------------------------------------------------#
+    # Internals                                                          #
+    # ------------------------------------------------------------------#
+    def _reserve(self, state: Dict[str, Tuple[float, float]], costs: Mapping[str, float], now: float) -> float:
+        wait = max(state.get(_BLOCKED, (0.0, 0.0))[0] - now, 0.0)
+        # time at which the caller will actually run – refill is counted from there
+        start = now + wait
+        for name, (rate, capacity) in self._buckets.items():
+            level, updated = state.get(name, (capacity, now))
+            level = min(capacity, level + max(start - updated, 0.0) * rate) - costs[name]
+            state[name] = (level, max(start, updated))
+            if level < 0:
+                wait = max(wait, start - now - level / rate)
+        return wait
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            assert self.path is not None
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _reserve_shared(self, costs: Mapping[str, float]) -> float:
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            state = {name: (level, updated) for name, level, updated in conn.execute("SELECT name, level, updated FROM rate_limit")}
+            wait = self._reserve(state, costs, time.time())
+            conn.executemany(
+                "INSERT OR REPLACE INTO rate_limit (name, level, updated) VALUES (?, ?, ?)",
+                [(name, *state[name]) for name in self._buckets],
+            )
+        return wait
+
+
+def default_limiter() -> RateLimiter | None:
+    """Limiter configured from ``LLM_RPM``/``LLM_TPM`` (``None`` if neither is set).
+
+    ``LLM_RATE_LIMIT_DB`` points at a SQLite file to share the quota between processes.
+    """
+    rpm = float(os.getenv("LLM_RPM", 0)) or None
+    tpm = float(os.getenv("LLM_TPM", 0)) or None
+    if rpm is None and tpm is None:
+        return None
+    return RateLimiter(rpm, tpm, path=os.getenv("LLM_RATE_LIMIT_DB") or None)
@@ -2,25 +2,48 @@
 Module: codepipeline.reward_engine
 Beschreibung: Quantitative Bewertung jedes Patches anhand von Coverage-Delta, Performance-Metriken und Kosten-Impact.
 Export der Scores nach Prometheus.
+
+``evaluate_many``/``evaluate_all`` bewerten viele Patches in einem
+vektorisierten NumPy-Durchlauf.
+
+Scores werden nicht mehr im Bewertungsaufruf gepusht, sondern an einen
+``MetricsPusher`` übergeben, der sie im Hintergrund gebündelt an das
+Pushgateway sendet – Ausfälle oder Latenz des Gateways bremsen die
+Bewertung nicht.
 """
 
 import os
-from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
+import numpy as np
 from codepipeline.datastore import DataStore
+from codepipeline.metrics_pusher import MetricsPusher
+
+# Gewichte der Score-Berechnung je Kennzahl
+METRIC_COLUMNS = ('coverage_delta', 'performance', 'cost')
+SCORE_WEIGHTS = np.array([0.5, 0.3, -0.2])
+
+SCORE_METRIC = 'pipeline_patch_score'
+SCORE_HELP = 'Quantitativer Score für jeden Patch'
 
 class RewardEngine:
-    def __init__(self, db_path, prometheus_gateway=None):
+    def __init__(self, db_path, prometheus_gateway=None, pusher=None):
+        """
+        :param pusher: optional eigener ``MetricsPusher`` (Lebenszyklus beim Aufrufer);
+            ohne Angabe wird ein Hintergrund-Pusher für ``prometheus_gateway`` gestartet
+        """
         # DataStore initialisieren
         self.store = DataStore(db_path)
         # Prometheus Setup
-        self.registry = CollectorRegistry()
-        self.score_gauge = Gauge(
-            'pipeline_patch_score',
-            'Quantitativer Score für jeden Patch',
-            ['patch_id'],
-            registry=self.registry
-        )
         self.gateway = prometheus_gateway or os.getenv('PROMETHEUS_GATEWAY', 'localhost:9091')
+        self._owns_pusher = pusher is None
+        self.pusher = pusher or MetricsPusher(self.gateway, job='reward_engine')
+        if self._owns_pusher:
+            self.pusher.start()
+
+    def close(self):
+        """Stoppt den eigenen Pusher (mit letztem Flush) und schließt den DataStore."""
+        if self._owns_pusher:
+            self.pusher.stop()
+        self.store.close()
 
     def evaluate(self, patch_id):
         """
@@ -28,9 +51,8 @@ class RewardEngine:
         :param patch_id: ID oder Kennung des Patches
         :return: Score (float)
         """
-        # Iterationsdaten abrufen
-        iterations = self.store.list_iterations()
-        entry = next((it for it in iterations if it['patch'] == patch_id), None)
+        # Iterationsdaten per Index-Lookup abrufen (ohne Patch-Text)
+        entry = self.store.get_by_patch(patch_id, columns=('coverage_delta', 'performance', 'cost'))
         if not entry:
             raise ValueError(f"Kein Eintrag für patch_id={patch_id} gefunden.")
 
@@ -42,8 +64,58 @@ class RewardEngine:
         # Score-Berechnung (gewichtete Summe)
         score = 0.5 * coverage_delta + 0.3 * performance - 0.2 * cost_impact
 
-        # Score exportieren
-        self.score_gauge.labels(patch_id=patch_id).set(score)
-        push_to_gateway(self.gateway, job='reward_engine', registry=self.registry)
+        # Score zum Export vormerken (Push erfolgt im Hintergrund)
+        self.pusher.set(SCORE_METRIC, score, {'patch_id': patch_id}, SCORE_HELP)
 
-        return score
\ No newline at end of file
+        return score
+
+    def _load_metrics(self, patch_ids=None):
+        """
+        Lädt die Kennzahlen aller (bzw. der angefragten) Patches.
+        Pro Patch zählt wie bei ``get_by_patch`` der älteste Eintrag. Angefragte
+        Patches werden über den ``patch_hash``-Index nachgeschlagen, nur ohne
+        ``patch_ids`` wird die ganze Tabelle gelesen.
+        :return: (Liste der Patch-IDs, Matrix n x 3 mit coverage_delta, performance, cost)
+        """
+        if patch_ids is not None:
+            entries = self.store.get_many_by_patch(patch_ids, columns=METRIC_COLUMNS).values()
+        else:
+            entries = self.store.iter_iterations(batch_size=10_000, columns=('patch',) + METRIC_COLUMNS)
+        patches, values = [], []
+        seen = set()
+        for entry in entries:
+            patch = entry['patch']
+            if patch in seen:
+                continue
+            seen.add(patch)
+            patches.append(patch)
+            values.extend(entry[c] or 0.0 for c in METRIC_COLUMNS)
+        return patches, np.array(values, dtype=np.float64).reshape(-1, len(METRIC_COLUMNS))
+
+    def _score_and_push(self, patches, metrics):
+        """Berechnet alle Scores vektorisiert und merkt sie gesammelt zum Export vor."""
+        scores = metrics @ SCORE_WEIGHTS
+        result = dict(zip(patches, scores.tolist()))
+        self.pusher.set_many(SCORE_METRIC, (({'patch_id': p}, s) for p, s in result.items()), SCORE_HELP)
+        return result
+
+    def evaluate_many(self, patch_ids):
+        """
+        Bewertet mehrere Patches in einem Durchlauf.
+        :param patch_ids: Iterable von Patch-Kennungen
+        :return: dict patch_id -> Score (in Reihenfolge der Eingabe)
+        """
+        patch_ids = list(dict.fromkeys(patch_ids))
+        patches, metrics = self._load_metrics(patch_ids)
+        missing = set(patch_ids) - set(patches)
+        if missing:
+            raise ValueError(f"Kein Eintrag für patch_id={sorted(missing)} gefunden.")
+        scores = self._score_and_push(patches, metrics)
+        return {patch_id: scores[patch_id] for patch_id in patch_ids}
+
+    def evaluate_all(self):
+        """
+        Bewertet alle Patches im DataStore.
+        :return: dict patch_id -> Score
+        """
+        return self._score_and_push(*self._load_metrics())
\ No newline at end of file
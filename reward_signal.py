@@ -10,11 +10,14 @@ from sqlalchemy import create_engine, text
 from codepipeline.training_db import log_review_result
 from typing import Dict, Any, List
 from codepipeline.logging_config import get_logger
+from codepipeline.metrics_pusher import MetricsPusher
 
 logger = get_logger(__name__)
 DB_URL = os.getenv("DB_URL", "sqlite:///data/chroma/embeddings.db")
 
-def persist_reward_signal():
+def persist_reward_signal(pusher=None):
+    """Persist the current reward KPIs; with *pusher* (a ``MetricsPusher``)
+    they are also queued for the Pushgateway as ``pipeline_reward_signal``."""
     engine = create_engine(DB_URL)
     with engine.connect() as conn:
         # Retrieve latest review scores and compute KPIs
@@ -30,10 +33,21 @@ def persist_reward_signal():
             "timestamp": datetime.utcnow().isoformat()
         }
         log_review_result(DB_URL, data)
+        if pusher is not None:
+            pusher.set_many(
+                "pipeline_reward_signal",
+                (({"kpi": k}, data[k]) for k in ("average_score", "merge_rate", "bug_density")),
+                "Latest reward signal KPIs",
+            )
         logger.info(f"Persisted reward signal: {data}")
 
 def main():
-    persist_reward_signal()
+    gateway = os.getenv("PROMETHEUS_GATEWAY")
+    if not gateway:
+        persist_reward_signal()
+        return
+    with MetricsPusher(gateway, job="reward_signal") as pusher:
+        persist_reward_signal(pusher)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
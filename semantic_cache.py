@@ -0,0 +1,301 @@
+"""Semantic near-duplicate cache for prompts.
+
+Paraphrased prompts (different whitespace, casing or slightly different
+wording) miss the exact-match :mod:`codepipeline.llm_cache`. The semantic
+cache normalises the prompt, embeds it and looks for the most similar
+earlier prompt in a local vector index; above the similarity threshold the
+earlier response is returned as a :class:`SemanticHit` – a ``str`` carrying
+``semantic_hit = True``, the ``similarity`` and the matched prompt.
+
+Entries are grouped by *scope* (model, system prompt, few-shot examples and
+sampling kwargs), so only the final user prompt is compared semantically.
+The embedder – any callable ``text -> vector`` – has to be a real embedding
+model such as :class:`OpenAIEmbedder`: lexical features cannot tell "sort
+ascending" from "sort descending", so there is deliberately no built-in
+default, and :func:`default_semantic_cache` returns ``None`` (cache off)
+unless ``LLM_SEMANTIC_EMBED_MODEL`` names one. Vectors are kept per
+embedding model, so switching models never compares incompatible vectors.
+
+A share of hits (``audit_rate``) can be re-generated upstream and compared
+with the cached answer; hits whose fresh answer differs too much are
+counted as false hits. Hit/miss and audit counts are kept in ``stats`` and,
+when *prometheus_client* is installed, exported as
+``codepipeline_semantic_cache_requests_total`` and
+``codepipeline_semantic_cache_audits_total``.
+"""
+from __future__ import annotations
+
+import difflib
+import os
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from codepipeline.logging_config import get_logger
+
+try:
+    from prometheus_client import Counter
+except ModuleNotFoundError:  # metrics are optional
+    Counter = None  # type: ignore[assignment]
+
+logger = get_logger(__name__)
+
+DEFAULT_THRESHOLD = 0.95
+# audited answers below this normalised-text similarity count as false hits
+AUDIT_MIN_RATIO = 0.8
+
+SEMANTIC_REQUESTS = (
+    Counter("codepipeline_semantic_cache_requests_total", "Semantic cache lookups", ["result"])
+    if Counter is not None
+    else None
+)
+SEMANTIC_AUDITS = (
+    Counter("codepipeline_semantic_cache_audits_total", "Audited semantic cache hits", ["result"])
+    if Counter is not None
+    else None
+)
+
+Embedder = Callable[[str], Sequence[float]]
+
+
+def normalize_prompt(text: str) -> str:
+    """Canonical form of a prompt: NFKC, lower case, single spaces."""
+    return " ".join(unicodedata.normalize("NFKC", text).lower().split())
+
+
+class SemanticHit(str):
+    """Cached response returned for a semantically similar prompt."""
+
+    semantic_hit = True
+
+    def __new__(cls, response: str, similarity: float, matched_prompt: str) -> "SemanticHit":
+        hit = super().__new__(cls, response)
+        hit.similarity = similarity
+        hit.matched_prompt = matched_prompt
+        return hit
+
+
+def is_semantic_hit(response: object) -> bool:
+    return getattr(response, "semantic_hit", False)
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI embeddings endpoint (``text-embedding-3-small`` by default)."""
+
+    def __init__(self, model: str = "text-embedding-3-small", client=None) -> None:
+        if client is None:
+            from openai import OpenAI
+
+            from codepipeline.secrets import ensure_env
+
+            ensure_env("OPENAI_API_KEY")
+            client = OpenAI()
+        self.model = model
+        self._client = client
+
+    def __call__(self, text: str) -> List[float]:
+        return self._client.embeddings.create(model=self.model, input=text).data[0].embedding
+
+
+class _ScopeIndex:
+    """Ring buffer of at most ``capacity`` unit vectors with their prompts and responses."""
+
+    def __init__(self, dim: int, capacity: int) -> None:
+        self.capacity = capacity
+        self.vectors = np.zeros((min(16, capacity), dim), dtype=np.float32)
+        self.prompts: List[str] = []
+        self.responses: List[str] = []
+        self._next = 0  # slot overwritten next once the buffer is full
+
+    def __len__(self) -> int:
+        return len(self.prompts)
+
+    def add(self, vector: np.ndarray, prompt: str, response: str) -> None:
+        n = len(self)
+        if n < self.capacity:
+            if n == len(self.vectors):
+                grown = np.zeros((min(2 * n, self.capacity), self.vectors.shape[1]), dtype=np.float32)
+                grown[:n] = self.vectors
+                self.vectors = grown
+            self.vectors[n] = vector
+            self.prompts.append(prompt)
+            self.responses.append(response)
+            return
+        # full: overwrite the oldest entry in place
+        slot = self._next
+        self.vectors[slot] = vector
+        self.prompts[slot] = prompt
+        self.responses[slot] = response
+        self._next = (slot + 1) % self.capacity
+
+    def nearest(self, vector: np.ndarray) -> tuple[int, float]:
+        sims = self.vectors[: len(self)] @ vector
+        best = int(np.argmax(sims))
+        return best, float(sims[best])
+
+
+class SemanticCache:
+    """Local vector index of previous prompts and their responses."""
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        *,
+        threshold: float = DEFAULT_THRESHOLD,
+        max_entries: int = 10_000,
+        audit_rate: float = 0.0,
+        path: str | os.PathLike | None = None,
+        prune_batch: int | None = None,
+    ) -> None:
+        """
+        :param embedder: embedding model, ``text -> vector``
+        :param prune_batch: rows a scope may exceed ``max_entries`` on disk before
+            the oldest are deleted in one statement (default: a tenth of ``max_entries``)
+        """
+        self.embedder = embedder
+        # embedding space of the vectors; part of every index key
+        self.space = str(getattr(embedder, "model", type(embedder).__name__))
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.prune_batch = max(prune_batch if prune_batch is not None else max_entries // 10, 1)
+        self.audit_rate = audit_rate
+        self.path = Path(path) if path is not None else None
+        self.stats = {"hits": 0, "misses": 0, "audits": 0, "false_hits": 0}
+        self._scopes: Dict[str, _ScopeIndex] = {}
+        self._stored: Dict[str, int] = {}  # rows per index key in the SQLite store
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._loaded = False
+
+    # ------------------------------------------------------------------#
+    # Lookup / store                                                     #
+    # ------------------------------------------------------------------#
+    def lookup(self, scope: str, prompt: str, threshold: float | None = None) -> Optional[SemanticHit]:
+        """Return the cached response of the most similar prompt in *scope*, if similar enough."""
+        return self.search(scope, prompt, threshold)[0]
+
+    def search(
+        self, scope: str, prompt: str, threshold: float | None = None
+    ) -> tuple[Optional[SemanticHit], np.ndarray]:
+        """:meth:`lookup` that also returns the prompt's vector, to pass on to :meth:`add` after a miss."""
+        vector = self.embed(prompt)
+        with self._lock:
+            self._load()
+            index = self._scopes.get(self._key(scope))
+            hit = None
+            if index is not None and len(index):
+                best, similarity = index.nearest(vector)
+                if similarity >= (self.threshold if threshold is None else threshold):
+                    hit = SemanticHit(index.responses[best], similarity, index.prompts[best])
+            self.stats["hits" if hit is not None else "misses"] += 1
+        if SEMANTIC_REQUESTS is not None:
+            SEMANTIC_REQUESTS.labels(result="hit" if hit is not None else "miss").inc()
+        return hit, vector
+
+    def add(self, scope: str, prompt: str, response: str, vector: np.ndarray | None = None) -> None:
+        """Store *response* for *prompt*; *vector* from :meth:`search` saves embedding the prompt again."""
+        if vector is None:
+            vector = self.embed(prompt)
+        key = self._key(scope)
+        with self._lock:
+            self._load()
+            self._index(key, len(vector)).add(vector, prompt, response)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT INTO semantic_cache (scope, prompt, response, vector) VALUES (?, ?, ?, ?)",
+                        (key, prompt, response, vector.tobytes()),
+                    )
+                    stored = self._stored[key] = self._stored.get(key, 0) + 1
+                    if stored > self.max_entries + self.prune_batch:
+                        # drop the rows that fell out of the ring buffer, in one batch
+                        self._conn.execute(
+                            "DELETE FROM semantic_cache WHERE id IN "
+                            "(SELECT id FROM semantic_cache WHERE scope = ? ORDER BY id LIMIT ?)",
+                            (key, stored - self.max_entries),
+                        )
+                        self._stored[key] = self.max_entries
+
+    # ------------------------------------------------------------------#
+    # False-hit audit                                                    #
+    # ------------------------------------------------------------------#
+    def should_audit(self) -> bool:
+        return self.audit_rate > 0 and np.random.random() < self.audit_rate
+
+    def audit(self, hit: SemanticHit, fresh: str) -> bool:
+        """Compare a served hit with a freshly generated answer; returns ``True`` for a false hit."""
+        ratio = difflib.SequenceMatcher(None, normalize_prompt(hit), normalize_prompt(fresh)).ratio()
+        false_hit = ratio < AUDIT_MIN_RATIO
+        with self._lock:
+            self.stats["audits"] += 1
+            self.stats["false_hits"] += false_hit
+        if SEMANTIC_AUDITS is not None:
+            SEMANTIC_AUDITS.labels(result="false_hit" if false_hit else "match").inc()
+        if false_hit:
+            logger.warning(
+                "Semantic cache false hit (similarity %.3f, answer overlap %.2f) for prompt %r",
+                hit.similarity, ratio, hit.matched_prompt[:80],
+            )
+        return false_hit
+
+    # ------------------------------------------------------------------#
+    # Internals                                                          #
+    # ------------------------------------------------------------------#
+    def _key(self, scope: str) -> str:
+        return f"{self.space}\x00{scope}"
+
+    def _index(self, key: str, dim: int) -> _ScopeIndex:
+        index = self._scopes.get(key)
+        if index is None:
+            index = self._scopes[key] = _ScopeIndex(dim, self.max_entries)
+        return index
+
+    def embed(self, prompt: str) -> np.ndarray:
+        """Unit vector of the normalised prompt (one embedder call)."""
+        vector = np.asarray(self.embedder(normalize_prompt(prompt)), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _load(self) -> None:
+        """Open the SQLite store on first use and rebuild the in-memory index from it."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_cache ("
+            "id INTEGER PRIMARY KEY, scope TEXT NOT NULL, prompt TEXT NOT NULL, "
+            "response TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_semantic_cache_scope ON semantic_cache (scope, id)")
+        for key, prompt, response, blob in self._conn.execute(
+            "SELECT scope, prompt, response, vector FROM semantic_cache ORDER BY id"
+        ):
+            vector = np.frombuffer(blob, dtype=np.float32)
+            self._index(key, len(vector)).add(vector, prompt, response)
+            self._stored[key] = self._stored.get(key, 0) + 1
+
+
+def default_semantic_cache() -> Optional[SemanticCache]:
+    """Semantic cache embedding with the OpenAI model ``LLM_SEMANTIC_EMBED_MODEL``.
+
+    Returns ``None`` – no semantic caching – if no embedding model is configured.
+    The cache is persisted at ``LLM_SEMANTIC_CACHE_PATH`` (empty for memory only);
+    ``LLM_SEMANTIC_AUDIT_RATE`` sets the share of hits re-generated for the false-hit audit.
+    """
+    model = os.getenv("LLM_SEMANTIC_EMBED_MODEL")
+    if not model:
+        return None
+    path = os.getenv(
+        "LLM_SEMANTIC_CACHE_PATH", str(Path.home() / ".cache" / "codepipeline" / "semantic_cache.db")
+    )
+    return SemanticCache(
+        OpenAIEmbedder(model), path=path or None, audit_rate=float(os.getenv("LLM_SEMANTIC_AUDIT_RATE", 0.0))
+    )
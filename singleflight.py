@@ -0,0 +1,118 @@
+"""Single-flight deduplication of concurrent identical calls.
+
+Callers that ask for the same key while a call for it is in flight wait
+for that call and share its result (or exception) instead of starting
+their own::
+
+    flight = SingleFlight()
+    content = flight.do(key, lambda: client.chat(...))        # threads
+
+    aflight = AsyncSingleFlight()
+    content = await aflight.do(key, lambda: client.achat(...))  # asyncio
+
+Only *concurrent* callers are merged – once the call finishes the key is
+forgotten, so later callers start a fresh call (pair with a response cache
+for reuse over time). Coalesced callers are counted in ``coalesced`` and,
+when *prometheus_client* is installed, in
+``codepipeline_llm_coalesced_calls_total``.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+try:
+    from prometheus_client import Counter
+except ModuleNotFoundError:  # metrics are optional
+    Counter = None  # type: ignore[assignment]
+
+_T = TypeVar("_T")
+
+COALESCED_CALLS = (
+    Counter("codepipeline_llm_coalesced_calls_total", "Calls served by an identical in-flight call", ["mode"])
+    if Counter is not None
+    else None
+)
+
+
+class _Call(Generic[_T]):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: _T | None = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Thread-based single-flight group."""
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call[Any]] = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], _T]) -> _T:
+        """Run *fn* unless a call for *key* is in flight; then wait for its outcome."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            if COALESCED_CALLS is not None:
+                COALESCED_CALLS.labels(mode="thread").inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result  # type: ignore[return-value]
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """asyncio single-flight group.
+
+    The shared call runs as its own task, so cancelling one waiting caller
+    does not cancel the call for the others.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[_T]]) -> _T:
+        """Await *fn()* unless a call for *key* is in flight; then share its outcome."""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        else:
+            self.coalesced += 1
+            if COALESCED_CALLS is not None:
+                COALESCED_CALLS.labels(mode="async").inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every waiter was cancelled
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
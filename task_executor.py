@@ -0,0 +1,248 @@
+"""
+Task executor: runs :class:`~codepipeline.task_queue.TaskQueue` tasks on a
+worker pool.
+
+Handlers are registered per task type and receive the claimed task dict
+(``id``, ``type``, ``payload``, ``attempts`` …); a non-``None`` return value
+is stored as the task result (see :meth:`TaskQueue.get_result`)::
+
+    executor = TaskExecutor(queue, max_workers=8)
+    executor.register("synth", run_synth, max_concurrency=4)       # LLM calls
+    executor.register("docker_test", run_tests, max_concurrency=2)
+    executor.start()
+    ...
+    executor.shutdown()  # drains in-flight tasks
+
+A dispatcher thread claims tasks only for registered types and only as many
+as there are free worker slots and free per-type slots, so a capped type
+never holds leases it cannot run. Leases are renewed by heartbeat while
+tasks run. Handlers run on a thread pool by default; ``use_processes=True``
+switches to a process pool (handlers must then be picklable, i.e. module
+level functions).
+
+Queue-wait and run durations are exported as Prometheus histograms when
+*prometheus_client* is installed.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from codepipeline.logging_config import get_logger
+from codepipeline.task_queue import DEFAULT_LEASE_SECONDS, TaskQueue
+
+try:
+    from prometheus_client import Histogram
+except ModuleNotFoundError:  # metrics are optional
+    Histogram = None  # type: ignore[assignment]
+
+logger = get_logger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Any]
+
+TASK_QUEUE_WAIT = (
+    Histogram(
+        "codepipeline_task_queue_wait_seconds",
+        "Time between a task becoming due and its execution start",
+        ["type"],
+        buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30, 120, 600),
+    )
+    if Histogram is not None
+    else None
+)
+TASK_RUN_DURATION = (
+    Histogram(
+        "codepipeline_task_run_seconds",
+        "Task handler run time",
+        ["type", "status"],
+        buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 30, 120, 600, 1800),
+    )
+    if Histogram is not None
+    else None
+)
+
+
+@dataclass
+class _Registration:
+    handler: Handler
+    max_concurrency: Optional[int] = None
+    running: int = 0
+
+
+class TaskExecutor:
+    """Pool of workers consuming a :class:`TaskQueue`."""
+
+    def __init__(
+        self,
+        queue: TaskQueue,
+        *,
+        max_workers: int = 4,
+        use_processes: bool = False,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        max_attempts: int = 3,
+        poll_timeout: float = 1.0,
+        worker_id: str | None = None,
+    ) -> None:
+        self.queue = queue
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_timeout = poll_timeout
+        self.worker_id = worker_id or queue.worker_id
+        self._handlers: Dict[str, _Registration] = {}
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._stopping = threading.Event()
+        self._pool: Executor | None = None
+        self._dispatcher: threading.Thread | None = None
+
+    # ------------------------------------------------------------------#
+    # Registration                                                       #
+    # ------------------------------------------------------------------#
+    def register(self, task_type: str, handler: Handler, *, max_concurrency: int | None = None) -> None:
+        """Route tasks of *task_type* to *handler*, at most *max_concurrency* at a time."""
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be >= 1")
+        with self._cond:
+            self._handlers[task_type] = _Registration(handler, max_concurrency)
+
+    def handler(self, task_type: str, *, max_concurrency: int | None = None) -> Callable[[Handler], Handler]:
+        """Decorator form of :meth:`register`."""
+        def _decorator(fn: Handler) -> Handler:
+            self.register(task_type, fn, max_concurrency=max_concurrency)
+            return fn
+        return _decorator
+
+    # ------------------------------------------------------------------#
+    # Lifecycle                                                          #
+    # ------------------------------------------------------------------#
+    def start(self) -> None:
+        if self._dispatcher is not None:
+            return
+        self._stopping.clear()
+        pool_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        self._pool = pool_cls(max_workers=self.max_workers)
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="task-executor", daemon=True)
+        self._dispatcher.start()
+
+    def shutdown(self, drain: bool = True, timeout: float | None = None) -> bool:
+        """Stop claiming new tasks.
+
+        With *drain* the call waits (up to *timeout*) until every in-flight
+        task has finished and been marked; otherwise tasks that have not
+        started yet are cancelled and put back into the queue. Returns
+        ``True`` if nothing is left in flight.
+        """
+        if self._dispatcher is None:
+            return True
+        self._stopping.set()
+        self.queue.notifier.wake()
+        self._dispatcher.join()
+        self._dispatcher = None
+        assert self._pool is not None
+        if drain:
+            with self._cond:
+                self._cond.wait_for(lambda: self._inflight == 0, timeout)
+            self._pool.shutdown(wait=self._inflight == 0)
+        else:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        return self._inflight == 0
+
+    def __enter__(self) -> "TaskExecutor":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown()
+
+    # ------------------------------------------------------------------#
+    # Internals                                                          #
+    # ------------------------------------------------------------------#
+    def _free_slots(self) -> Dict[str, int]:
+        free = self.max_workers - self._inflight
+        if free <= 0:
+            return {}
+        slots = {}
+        for task_type, reg in self._handlers.items():
+            cap = free if reg.max_concurrency is None else min(free, reg.max_concurrency - reg.running)
+            if cap > 0:
+                slots[task_type] = cap
+        return slots
+
+    def _dispatch_loop(self) -> None:
+        next_heartbeat = time.monotonic() + self.lease_seconds / 3
+        while not self._stopping.is_set():
+            if time.monotonic() >= next_heartbeat:
+                self.queue.heartbeat(self.lease_seconds, self.worker_id)
+                next_heartbeat = time.monotonic() + self.lease_seconds / 3
+            with self._cond:
+                slots = self._free_slots()
+                if not slots:
+                    self._cond.wait(self.poll_timeout)
+                    continue
+                free = self.max_workers - self._inflight
+            try:
+                tasks = self.queue.fetch_batch(
+                    free,
+                    self.lease_seconds,
+                    self.worker_id,
+                    timeout=self.poll_timeout,
+                    types=slots,
+                )
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Claiming tasks failed")
+                self._stopping.wait(self.poll_timeout)
+                continue
+            for task in tasks:
+                self._submit(task)
+
+    def _submit(self, task: Dict[str, Any]) -> None:
+        reg = self._handlers[task["type"]]
+        with self._cond:
+            reg.running += 1
+            self._inflight += 1
+        if TASK_QUEUE_WAIT is not None:
+            TASK_QUEUE_WAIT.labels(type=task["type"]).observe(max(time.time() - task["not_before"], 0.0))
+        assert self._pool is not None
+        future = self._pool.submit(reg.handler, task)
+        future.add_done_callback(partial(self._finish, task, reg, time.perf_counter()))
+
+    def _finish(self, task: Dict[str, Any], reg: _Registration, started: float, future: Future) -> None:
+        elapsed = time.perf_counter() - started
+        try:
+            if future.cancelled():
+                status = "cancelled"
+                self.queue.mark_retry(task["id"], "cancelled", delay=0)
+            elif future.exception() is not None:
+                exc = future.exception()
+                status = "retry" if task["attempts"] + 1 < self.max_attempts else "failed"
+                if status == "retry":
+                    self.queue.mark_retry(task["id"], type(exc).__name__)
+                else:
+                    self.queue.mark_failed(task["id"], type(exc).__name__)
+                logger.error("Task %s (%s) failed: %r", task["id"], task["type"], exc)
+            else:
+                status = "success"
+                try:
+                    self.queue.mark_success(task["id"], future.result())
+                except (TypeError, ValueError) as exc:  # not JSON-serialisable or too large
+                    status = "failed"
+                    self.queue.mark_failed(task["id"], f"unstorable result: {exc}")
+        except Exception:  # pylint: disable=broad-except
+            status = "error"
+            logger.exception("Recording result of task %s failed", task["id"])
+        finally:
+            if TASK_RUN_DURATION is not None:
+                TASK_RUN_DURATION.labels(type=task["type"], status=status).observe(elapsed)
+            with self._cond:
+                reg.running -= 1
+                self._inflight -= 1
+                self._cond.notify_all()
+            # a per-type slot opened up – re-evaluate a dispatcher blocked in fetch_batch
+            self.queue.notifier.wake()
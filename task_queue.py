@@ -8,102 +8,718 @@ Status Lifecycle:
 - **success**: finished without error
 - **failed**: unrecoverable error, see *fail_reason*
 - **retry**: transient error, will be re‑scheduled
+
+Claimed tasks are held under a *lease*: every claim records the claiming
+``worker_id`` and a ``lease_expires`` timestamp. Workers extend their leases
+via :meth:`TaskQueue.renew_lease` / :meth:`TaskQueue.heartbeat`; rows whose
+lease ran out (e.g. because the worker crashed) are put back into *retry*
+automatically on the next claim.
+
+Scheduling: claims take the highest ``priority`` first (interactive work
+such as ``synth`` outranks bulk ``fine_tune``/``review`` jobs, see
+:data:`TYPE_PRIORITIES`) and, within a priority level, alternate between task
+types so a flood of one type cannot starve the others. A task is not handed
+out before its ``not_before`` timestamp; :meth:`TaskQueue.mark_retry` pushes
+it back with exponential backoff based on the stored ``attempts`` counter.
+
+Tasks may carry an idempotency ``dedup_key`` (see :func:`make_dedup_key`):
+re-submitting work with an existing key returns the id of the existing row
+instead of inserting a duplicate.
+
+Consumers do not need to poll: ``fetch_batch``/``fetch_next`` accept a
+*timeout* and block until a producer signals new work through the queue's
+:class:`TaskNotifier` – a condition variable for producers in the same
+process plus Unix datagram sockets for producers in other processes.
+
+Results and history: ``mark_success(task_id, result)`` stores a JSON result
+(at most :data:`MAX_RESULT_BYTES`) in the ``task_results`` side table.
+:meth:`TaskQueue.archive_finished` moves finished rows older than a TTL –
+together with their result – zlib-compressed into ``tasks_archive`` (in the
+same file or a separate ``archive_path``) and :meth:`TaskQueue.compact`
+returns the freed pages via incremental VACUUM; :class:`TaskArchiver` runs
+both periodically so the hot table stays small. Archived rows release their
+``dedup_key``.
+
+Storage modes:
+- **tuned** (default): WAL journaling, ``synchronous=NORMAL``, a busy
+  timeout and one connection per thread/process, so any number of worker
+  threads and processes can share the same database file.
+- **legacy** (``tuned=False``): a single connection in the default rollback
+  journal mode shared by all threads. Always used for ``:memory:``.
 """
 
 from __future__ import annotations
 
+import contextlib
+import hashlib
 import json
+import os
+import socket
 import sqlite3
+import tempfile
+import threading
+import time
+import zlib
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
 
 DB_PATH = Path(__file__).parent.parent / "tasks.db"
+DEFAULT_LEASE_SECONDS = 300.0
+BUSY_TIMEOUT_SECONDS = 30.0
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 600.0
+
+MAX_RESULT_BYTES = 1 << 20
+ARCHIVE_BATCH_SIZE = 1000
+
+PRIORITY_INTERACTIVE = 100
+PRIORITY_NORMAL = 0
+PRIORITY_BULK = -100
+
+# default priority per task type, used when enqueue() gets no explicit one
+TYPE_PRIORITIES: Dict[str, int] = {
+    "synth": PRIORITY_INTERACTIVE,
+    "fine_tune": PRIORITY_BULK,
+    "review": PRIORITY_BULK,
+}
+
+# columns added after the initial schema – (name, DDL type)
+_MIGRATED_COLUMNS = (
+    ("fail_reason", "TEXT"),
+    ("worker_id", "TEXT"),
+    ("lease_expires", "REAL"),
+    ("dedup_key", "TEXT"),
+    ("priority", "INTEGER NOT NULL DEFAULT 0"),
+    ("not_before", "REAL NOT NULL DEFAULT 0"),
+    ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("finished_at", "REAL"),
+)
+
+_FINISHED = ('success', 'failed')
+
+_INSERT_TASK = (
+    "INSERT INTO tasks (type, payload, dedup_key, priority, not_before) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT DO NOTHING"
+)
+
+# backoff for the n-th retry: base * 2**attempts, capped – evaluated in SQL
+_BACKOFF_SQL = f"MIN({RETRY_MAX_DELAY}, {RETRY_BASE_DELAY} * (1 << MIN(attempts, 30)))"
+
+# a task as accepted by TaskQueue.enqueue_many
+TaskSpec = Union[Mapping[str, Any], Sequence[Any]]
+
+
+def make_dedup_key(task_type: str, payload: Mapping[str, Any]) -> str:
+    """Stable idempotency key for *task_type* + *payload* (key order agnostic)."""
+    canonical = json.dumps([task_type, payload], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class TaskNotifier:
+    """Wake-up channel shared by every :class:`TaskQueue` on one database.
+
+    Within a process producers bump a generation counter guarded by a
+    :class:`threading.Condition`. Across processes every listening process
+    binds a datagram socket in a per-database directory below the temp dir;
+    producers send one byte to each of them. Waiters compare against the
+    generation they saw *before* looking at the table, so a notification
+    racing with the claim is never lost.
+    """
+
+    _registry: Dict[str, "TaskNotifier"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, channel_dir: Path | None = None) -> None:
+        self.channel_dir = channel_dir
+        self._init_process_state()
+
+    @classmethod
+    def for_path(cls, db_path: Path | str) -> "TaskNotifier":
+        """Process-wide notifier for *db_path* (private one for ``:memory:``)."""
+        if str(db_path) == ":memory:":
+            return cls()
+        key = os.path.abspath(db_path)
+        with cls._registry_lock:
+            notifier = cls._registry.get(key)
+            if notifier is None:
+                digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+                notifier = cls(Path(tempfile.gettempdir()) / f"codepipeline-tq-{digest}")
+                cls._registry[key] = notifier
+            return notifier
+
+    def token(self) -> int:
+        """Current generation; pass it to :meth:`wait` after checking for work."""
+        self._ensure_listener()
+        return self._generation
+
+    def wait(self, token: int, timeout: float | None = None) -> bool:
+        """Block until a notification newer than *token* arrives."""
+        self._ensure_listener()
+        with self._cond:
+            return self._cond.wait_for(lambda: self._generation != token, timeout)
+
+    def notify(self) -> None:
+        """Wake waiters in this process and in every listening process."""
+        self.wake()
+        if self.channel_dir is None or not hasattr(socket, "AF_UNIX"):
+            return
+        try:
+            entries = list(os.scandir(self.channel_dir))
+        except FileNotFoundError:
+            return  # nobody has ever listened
+        own = self._sock_path
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for entry in entries:
+                if entry.path == own or not entry.name.endswith(".sock"):
+                    continue
+                try:
+                    sender.sendto(b"\x01", entry.path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # listener died without cleaning up
+                    with contextlib.suppress(OSError):
+                        os.unlink(entry.path)
+                except OSError:
+                    pass  # receive buffer full – a wakeup is already queued
+
+    def wake(self) -> None:
+        """Wake waiters in this process only."""
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------#
+    # Internals                                                          #
+    # ------------------------------------------------------------------#
+    def _init_process_state(self) -> None:
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._sock: socket.socket | None = None
+        self._sock_path: str | None = None
+
+
+    def _ensure_listener(self) -> None:
+        if self._pid != os.getpid():  # forked: threads and sockets did not survive
+            self._init_process_state()
+        if self._sock is not None or self.channel_dir is None or not hasattr(socket, "AF_UNIX"):
+            return
+        with self._cond:
+            if self._sock is not None:
+                return
+            try:
+                self.channel_dir.mkdir(mode=0o700, exist_ok=True)
+                path = str(self.channel_dir / f"{os.getpid()}-{id(self):x}.sock")
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(path)
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                sock.bind(path)
+            except OSError:
+                self.channel_dir = None  # no datagram sockets here – in-process only
+                return
+            self._sock, self._sock_path = sock, path
+        threading.Thread(target=self._listen, args=(sock,), name="task-notifier", daemon=True).start()
+
+    def _listen(self, sock: socket.socket) -> None:
+        while True:
+            try:
+                sock.recv(64)
+            except OSError:
+                return
+            self.wake()
 
 
 class TaskQueue:
     """Minimalistic persistent task queue."""
 
-    def __init__(self, db_path: Path = DB_PATH) -> None:
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+    def __init__(
+        self,
+        db_path: Path = DB_PATH,
+        worker_id: str | None = None,
+        *,
+        tuned: bool = True,
+        busy_timeout: float = BUSY_TIMEOUT_SECONDS,
+        archive_path: Path | None = None,
+    ) -> None:
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self._archive = "archive" if archive_path is not None else "main"
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.busy_timeout = busy_timeout
+        self.tuned = tuned and str(db_path) != ":memory:"
+        self._local = threading.local()
+        self._conns: List[Tuple[sqlite3.Connection, int]] = []
+        self._conns_lock = threading.Lock()
+        if self.tuned:
+            # every thread owns its connection – SQLite does the locking
+            self._lock: Any = contextlib.nullcontext()
+        else:
+            self._lock = threading.RLock()
+            self._shared_conn = self._connect()
+        self.notifier = TaskNotifier.for_path(db_path)
         self._init_db()
 
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection for the calling thread (re-opened after ``fork``)."""
+        if not self.tuned:
+            return self._shared_conn
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            local.conn = self._connect()
+            local.pid = os.getpid()
+        return local.conn
+
     # ---------------------------------------------------------------------#
     # Public API                                                           #
     # ---------------------------------------------------------------------#
-    def enqueue(self, task_type: str, payload: Dict[str, Any]) -> int:
-        """Insert new task and return its autoincrement id."""
-        with self.conn:
-            cur = self.conn.execute(
-                "INSERT INTO tasks (type, payload) VALUES (?, ?)",
-                (task_type, json.dumps(payload)),
-            )
-            return int(cur.lastrowid)
+    def enqueue(
+        self,
+        task_type: str,
+        payload: Dict[str, Any],
+        *,
+        dedup_key: str | None = None,
+        priority: int | None = None,
+        delay: float = 0.0,
+    ) -> int:
+        """Insert new task and return its autoincrement id.
+
+        If *dedup_key* is given and a task with the same key already exists,
+        nothing is inserted and the id of the existing task is returned.
+        *priority* defaults to the :data:`TYPE_PRIORITIES` entry of the type;
+        *delay* postpones the earliest execution by that many seconds.
+        """
+        row = self._task_row(
+            {"type": task_type, "payload": payload, "dedup_key": dedup_key, "priority": priority, "delay": delay}
+        )
+        with self._lock, self.conn:
+            cur = self.conn.execute(_INSERT_TASK, row)
+            task_id = int(cur.lastrowid) if cur.rowcount else self._ids_for_keys([dedup_key])[dedup_key]
+        if cur.rowcount:
+            self.notifier.notify()
+        return task_id
+
+    def enqueue_many(self, tasks: Iterable[TaskSpec]) -> List[int]:
+        """Insert many tasks in a single transaction.
+
+        Each task is either a mapping with ``type``, ``payload`` and the
+        optional ``dedup_key``, ``priority`` and ``delay`` (as for
+        :meth:`enqueue`) or a ``(type, payload[, dedup_key])`` tuple.
+        Tasks whose key already exists – in the table or earlier in the same
+        batch – collapse onto that row. Returns one id per input task, in
+        input order.
+        """
+        rows = [self._task_row(task) for task in tasks]
+        if not rows:
+            return []
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            # we hold the write lock: every id above the current maximum is ours
+            last_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM tasks").fetchone()[0]
+            self.conn.executemany(_INSERT_TASK, rows)
+            inserted = self.conn.execute(
+                "SELECT id, dedup_key FROM tasks WHERE id > ? ORDER BY id", (last_id,)
+            ).fetchall()
+            key_ids = {row["dedup_key"]: row["id"] for row in inserted if row["dedup_key"] is not None}
+            new_keys = set(key_ids)
+            key_ids.update(self._ids_for_keys({row[2] for row in rows if row[2] is not None} - new_keys))
+        if inserted:
+            self.notifier.notify()
+
+        fresh = iter(row["id"] for row in inserted)
+        seen: set[str] = set()
+        ids: List[int] = []
+        for key in (row[2] for row in rows):
+            if key is None or (key in new_keys and key not in seen):
+                ids.append(next(fresh))
+                if key is not None:
+                    seen.add(key)
+            else:
+                ids.append(key_ids[key])
+        return ids
+
+    def fetch_next(
+        self,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        worker_id: str | None = None,
+        *,
+        timeout: float | None = 0.0,
+        types: Mapping[str, int] | None = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Reserve and return the next executable task (or ``None``)."""
+        tasks = self.fetch_batch(1, lease_seconds, worker_id, timeout=timeout, types=types)
+        return tasks[0] if tasks else None
 
-    def fetch_next(self) -> Optional[Dict[str, Any]]:
-        """Reserve and return the next executable task.
+    def fetch_batch(
+        self,
+        n: int,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        worker_id: str | None = None,
+        *,
+        timeout: float | None = 0.0,
+        types: Mapping[str, int] | None = None,
+    ) -> List[Dict[str, Any]]:
+        """Atomically claim up to *n* executable tasks under a lease.
 
-        A simple *SELECT … FOR UPDATE* is not available in SQLite. We
-        therefore select a candidate id and immediately mark it
-        *in_progress* within the same transaction. Concurrent calls will
-        race but only one transaction can commit the *UPDATE*.
+        SQLite has no *SELECT … FOR UPDATE*; instead the claim runs in a
+        ``BEGIN IMMEDIATE`` transaction which takes the database write lock
+        up front. Selecting the candidates and marking them *in_progress*
+        therefore cannot interleave with another claimer, so a call never
+        comes back empty-handed while claimable rows exist. Expired leases
+        are re-queued within the same transaction.
+
+        Candidates are ordered by priority, then round-robin across task
+        types, then FIFO; rows whose ``not_before`` lies in the future are
+        skipped.
+
+        With a *timeout* other than ``0`` the call blocks until at least one
+        task could be claimed, a notification-driven wait instead of a poll
+        loop; ``None`` waits forever. Returns ``[]`` on timeout.
+
+        *types* restricts the claim to the given task types, taking at most
+        ``types[type]`` tasks of each – used by consumers with per-type
+        concurrency caps.
         """
+        if n <= 0:
+            return []
+        if timeout == 0:
+            return self._claim(n, lease_seconds, worker_id, types)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            token = self.notifier.token()
+            tasks = self._claim(n, lease_seconds, worker_id, types)
+            if tasks:
+                return tasks
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return []
+            due = self._next_due(types)
+            if due is not None:
+                due = max(due - time.time(), 0.01)
+                remaining = due if remaining is None else min(remaining, due)
+            self.notifier.wait(token, remaining)
+
+    def notify(self) -> None:
+        """Wake up consumers blocked in :meth:`fetch_batch` (all processes)."""
+        self.notifier.notify()
 
-        with self.conn:  # implicit BEGIN…COMMIT
+    def renew_lease(
+        self,
+        task_id: int,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+        worker_id: str | None = None,
+    ) -> bool:
+        """Extend the lease of a claimed task.
+
+        Returns ``False`` if the task is no longer held by *worker_id* (the
+        lease expired and the task was handed to someone else).
+        """
+        with self._lock, self.conn:
             cur = self.conn.execute(
-                "SELECT id, type, payload FROM tasks "
-                "WHERE status IN ('pending', 'retry') "
-                "ORDER BY id LIMIT 1"
+                "UPDATE tasks SET lease_expires = ? "
+                "WHERE id = ? AND status = 'in_progress' AND worker_id = ?",
+                (time.time() + lease_seconds, task_id, worker_id or self.worker_id),
             )
-            row = cur.fetchone()
-            if not row:
-                return None
-            task_id = row["id"]
-            # attempt to reserve; rowcount==0 means lost race, retry
-            upd = self.conn.execute(
-                "UPDATE tasks SET status = 'in_progress' WHERE id = ? AND status IN ('pending', 'retry')",
-                (task_id,),
+            return cur.rowcount > 0
+
+    def heartbeat(self, lease_seconds: float = DEFAULT_LEASE_SECONDS, worker_id: str | None = None) -> int:
+        """Extend all leases held by *worker_id*; returns the number renewed."""
+        with self._lock, self.conn:
+            cur = self.conn.execute(
+                "UPDATE tasks SET lease_expires = ? WHERE status = 'in_progress' AND worker_id = ?",
+                (time.time() + lease_seconds, worker_id or self.worker_id),
             )
-            if upd.rowcount == 0:
-                return None  # someone else reserved
-            return {
-                "id": task_id,
-                "type": row["type"],
-                "payload": json.loads(row["payload"] or "{}"),
-            }
+            return cur.rowcount
+
+    def requeue_expired(self) -> int:
+        """Move tasks with an expired lease back to *retry*."""
+        with self._lock, self.conn:
+            return self._requeue_expired(time.time())
 
-    def mark_success(self, task_id: int) -> None:
-        self._set_status(task_id, "success")
+    def mark_success(self, task_id: int, result: Any = None) -> None:
+        """Finish a task, optionally storing a JSON-serialisable *result*.
+
+        Raises ``ValueError`` if the encoded result exceeds
+        :data:`MAX_RESULT_BYTES`; the task status is left untouched then.
+        """
+        if result is None:
+            self._set_status(task_id, "success")
+            return
+        encoded = json.dumps(result)
+        if len(encoded.encode("utf-8")) > MAX_RESULT_BYTES:
+            raise ValueError(f"Result of task {task_id} exceeds {MAX_RESULT_BYTES} bytes")
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO task_results (task_id, result) VALUES (?, ?)", (task_id, encoded)
+            )
+            self._write_status(task_id, "success")
+
+    def get_result(self, task_id: int) -> Any:
+        """Stored result of *task_id* (archived tasks included), else ``None``."""
+        with self._lock:
+            row = self.conn.execute("SELECT result FROM task_results WHERE task_id = ?", (task_id,)).fetchone()
+            if row is not None:
+                return json.loads(row["result"])
+            row = self.conn.execute(
+                f"SELECT data FROM {self._archive}.tasks_archive WHERE id = ?", (task_id,)
+            ).fetchone()
+        result = json.loads(zlib.decompress(row["data"])).get("result") if row is not None else None
+        return json.loads(result) if result is not None else None
 
     def mark_failed(self, task_id: int, reason: str) -> None:
         self._set_status(task_id, "failed", reason)
 
-    def mark_retry(self, task_id: int, reason: str = "") -> None:
-        self._set_status(task_id, "retry", reason)
+    def mark_retry(self, task_id: int, reason: str = "", *, delay: float | None = None) -> None:
+        """Re-schedule a task after a transient error.
+
+        Without an explicit *delay* the task waits ``RETRY_BASE_DELAY *
+        2**attempts`` seconds (capped at ``RETRY_MAX_DELAY``) so a flaky task
+        cannot hot-loop ahead of everything else.
+        """
+        backoff = _BACKOFF_SQL if delay is None else "?"
+        params: Tuple[Any, ...] = (time.time(),) if delay is None else (time.time(), delay)
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"UPDATE tasks SET status = 'retry', fail_reason = ?, worker_id = NULL, lease_expires = NULL, "
+                f"not_before = ? + {backoff}, attempts = attempts + 1 WHERE id = ?",
+                (reason, *params, task_id),
+            )
+        # waiters recompute when the retried task becomes due
+        self.notifier.notify()
 
     # Legacy alias
     def mark_done(self, task_id: int) -> None:
         self.mark_success(task_id)
 
     def get_status(self, task_id: int) -> str:
-        cur = self.conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,))
-        row = cur.fetchone()
+        with self._lock:
+            cur = self.conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,))
+            row = cur.fetchone()
         return row["status"] if row else ""
 
+    def archive_finished(self, ttl_seconds: float, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """Move tasks finished more than *ttl_seconds* ago into the archive.
+
+        Works in batches of *batch_size* rows per transaction so claimers
+        are never blocked for long. Returns the number of archived tasks.
+
+        SQLite commits a transaction spanning an ATTACHed database atomically
+        only in rollback-journal mode, not in WAL. Each batch is therefore
+        first committed to the archive on its own, then deleted from the
+        main database. A crash in between leaves the rows in both places,
+        and the next run simply replaces them in the archive.
+        """
+        cutoff = time.time() - ttl_seconds
+        archived = 0
+        while True:
+            with self._lock:
+                with self.conn:
+                    rows = self.conn.execute(
+                        "SELECT t.*, r.result FROM tasks t LEFT JOIN task_results r ON r.task_id = t.id "
+                        f"WHERE t.status IN {_FINISHED} AND t.finished_at < ? ORDER BY t.finished_at LIMIT ?",
+                        (cutoff, batch_size),
+                    ).fetchall()
+                    if not rows:
+                        return archived
+                    self.conn.executemany(
+                        f"INSERT OR REPLACE INTO {self._archive}.tasks_archive (id, type, status, finished_at, data) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [
+                            (row["id"], row["type"], row["status"], row["finished_at"],
+                             zlib.compress(json.dumps(dict(row)).encode("utf-8")))
+                            for row in rows
+                        ],
+                    )
+                ids = [(row["id"],) for row in rows]
+                with self.conn:
+                    self.conn.executemany("DELETE FROM task_results WHERE task_id = ?", ids)
+                    self.conn.executemany("DELETE FROM tasks WHERE id = ?", ids)
+            archived += len(rows)
+
+    def compact(self, max_pages: int | None = None) -> None:
+        """Return free pages to the filesystem via incremental VACUUM.
+
+        Databases created before incremental auto-vacuum was enabled are
+        converted by a one-off full VACUUM on the first call.
+        """
+        with self._lock:
+            conn = self.conn
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+                return
+            pages = "" if max_pages is None else f"({int(max_pages)})"
+            conn.execute(f"PRAGMA incremental_vacuum{pages}").fetchall()
+
     def close(self) -> None:
-        self.conn.close()
+        """Close every connection this queue opened in the current process."""
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        pid = os.getpid()
+        for conn, owner in conns:
+            if owner == pid:
+                conn.close()
+        self._local = threading.local()
 
     # ------------------------------------------------------------------#
     # Internals                                                          #
     # ------------------------------------------------------------------#
     def _set_status(self, task_id: int, status: str, reason: str | None = None) -> None:
-        with self.conn:
-            self.conn.execute(
-                "UPDATE tasks SET status = ?, fail_reason = ? WHERE id = ?",
-                (status, reason, task_id),
+        with self._lock, self.conn:
+            self._write_status(task_id, status, reason)
+
+    def _write_status(self, task_id: int, status: str, reason: str | None = None) -> None:
+        finished_at = time.time() if status in _FINISHED else None
+        self.conn.execute(
+            "UPDATE tasks SET status = ?, fail_reason = ?, worker_id = NULL, lease_expires = NULL, "
+            "finished_at = ? WHERE id = ?",
+            (status, reason, finished_at, task_id),
+        )
+
+    @staticmethod
+    def _task_row(task: TaskSpec) -> Tuple[str, str, str | None, int, float]:
+        if isinstance(task, Mapping):
+            task_type, payload, key = task["type"], task.get("payload", {}), task.get("dedup_key")
+            priority, delay = task.get("priority"), task.get("delay") or 0.0
+        else:
+            task_type, payload, *rest = task
+            key, priority, delay = (rest[0] if rest else None), None, 0.0
+        if priority is None:
+            priority = TYPE_PRIORITIES.get(task_type, PRIORITY_NORMAL)
+        return task_type, json.dumps(payload), key, priority, time.time() + delay
+
+    def _ids_for_keys(self, keys: Iterable[str]) -> Dict[str, int]:
+        keys = list(keys)
+        found: Dict[str, int] = {}
+        for i in range(0, len(keys), 500):  # stay below SQLite's host parameter limit
+            chunk = keys[i:i + 500]
+            cur = self.conn.execute(
+                f"SELECT id, dedup_key FROM tasks WHERE dedup_key IN ({', '.join('?' * len(chunk))})",
+                chunk,
             )
+            found.update({row["dedup_key"]: row["id"] for row in cur})
+        return found
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        if self.archive_path is not None:
+            conn.execute("ATTACH DATABASE ? AS archive", (str(self.archive_path),))
+        if self.tuned:
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        with self._conns_lock:
+            self._conns.append((conn, os.getpid()))
+        return conn
+
+    def _requeue_expired(self, now: float) -> int:
+        # visible again right away; the attempt still counts towards backoff
+        cur = self.conn.execute(
+            "UPDATE tasks SET status = 'retry', fail_reason = 'lease expired', "
+            "worker_id = NULL, lease_expires = NULL, attempts = attempts + 1 "
+            "WHERE status = 'in_progress' AND lease_expires < ?",
+            (now,),
+        )
+        return cur.rowcount
+
+    def _claim(
+        self,
+        n: int,
+        lease_seconds: float,
+        worker_id: str | None,
+        types: Mapping[str, int] | None = None,
+    ) -> List[Dict[str, Any]]:
+        worker = worker_id or self.worker_id
+        now = time.time()
+        expires = now + lease_seconds
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._requeue_expired(now)
+            rows = self._select_ready(n, now, types)
+            self.conn.executemany(
+                "UPDATE tasks SET status = 'in_progress', worker_id = ?, lease_expires = ? WHERE id = ?",
+                [(worker, expires, row["id"]) for row in rows],
+            )
+        return [
+            {
+                "id": row["id"],
+                "type": row["type"],
+                "payload": json.loads(row["payload"] or "{}"),
+                "priority": row["priority"],
+                "attempts": row["attempts"],
+                "not_before": row["not_before"],
+                "worker_id": worker,
+                "lease_expires": expires,
+            }
+            for row in rows
+        ]
+
+    def _next_due(self, types: Mapping[str, int] | None = None) -> float | None:
+        """Earliest moment a delayed task or an expired lease becomes claimable.
+
+        With *types* only task types with a free slot count; ``None`` means
+        nothing claimable is scheduled and the caller waits for a notification.
+        """
+        where, params = "", ()
+        if types is not None:
+            free = [t for t, slots in types.items() if slots > 0]
+            if not free:
+                return None
+            where = f" AND type IN ({', '.join('?' * len(free))})"
+            params = tuple(free)
+        with self._lock:
+            row = self.conn.execute(
+                f"SELECT (SELECT MIN(not_before) FROM tasks WHERE status IN ('pending', 'retry'){where}), "
+                f"(SELECT MIN(lease_expires) FROM tasks WHERE status = 'in_progress'{where})",
+                params * 2,
+            ).fetchone()
+        times = [t for t in row if t is not None]
+        return min(times) if times else None
+
+    def _select_ready(self, n: int, now: float, types: Mapping[str, int] | None = None) -> List[sqlite3.Row]:
+        """Pick up to *n* ready rows: priority first, then fair across types."""
+        candidates = []
+        for task_type in self._ready_types():
+            limit = n if types is None else min(n, types.get(task_type, 0))
+            if limit <= 0:
+                continue
+            rows = self.conn.execute(
+                "SELECT id, type, payload, priority, attempts, not_before FROM tasks "
+                "WHERE status IN ('pending', 'retry') AND type = ? AND not_before <= ? "
+                "ORDER BY priority DESC, id LIMIT ?",
+                (task_type, now, limit),
+            ).fetchall()
+            rank, prev = 0, None
+            for row in rows:  # rank within the (type, priority) lane
+                rank = rank + 1 if row["priority"] == prev else 0
+                prev = row["priority"]
+                candidates.append((-row["priority"], rank, row["id"], row))
+        candidates.sort(key=lambda c: c[:3])
+        return [c[3] for c in candidates[:n]]
+
+    def _ready_types(self) -> List[str]:
+        # loose index scan over idx_tasks_ready: one O(log n) probe per type
+        types: List[str] = []
+        while True:
+            if types:
+                row = self.conn.execute(
+                    "SELECT MIN(type) FROM tasks WHERE status IN ('pending', 'retry') AND type > ?",
+                    (types[-1],),
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT MIN(type) FROM tasks WHERE status IN ('pending', 'retry')"
+                ).fetchone()
+            if row[0] is None:
+                return types
+            types.append(row[0])
 
     def _init_db(self) -> None:
+        # only effective before the first table exists, i.e. for new files
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        if self.tuned:
+            # persistent per database file; readers no longer block the writer
+            self.conn.execute("PRAGMA journal_mode = WAL")
         self.conn.execute(
             """CREATE TABLE IF NOT EXISTS tasks (
                 id          INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -111,14 +727,106 @@ class TaskQueue:
                 status      TEXT    NOT NULL DEFAULT 'pending',
                 payload     TEXT,
                 fail_reason TEXT,
-                ts          TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                ts          TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                worker_id   TEXT,
+                lease_expires REAL,
+                dedup_key   TEXT,
+                priority    INTEGER NOT NULL DEFAULT 0,
+                not_before  REAL    NOT NULL DEFAULT 0,
+                attempts    INTEGER NOT NULL DEFAULT 0,
+                finished_at REAL
             );"""
         )
-        # ensure fail_reason exists (for older versions)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS task_results (
+                task_id     INTEGER PRIMARY KEY,
+                result      TEXT    NOT NULL
+            );"""
+        )
+        self.conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {self._archive}.tasks_archive (
+                id          INTEGER PRIMARY KEY,
+                type        TEXT    NOT NULL,
+                status      TEXT    NOT NULL,
+                finished_at REAL,
+                data        BLOB    NOT NULL
+            );"""
+        )
+        # ensure newer columns exist (for older versions)
         cols = {c[1] for c in self.conn.execute("PRAGMA table_info(tasks)")}
-        if "fail_reason" not in cols:
+        for name, ddl in _MIGRATED_COLUMNS:
+            if name in cols:
+                continue
             try:
-                self.conn.execute("ALTER TABLE tasks ADD COLUMN fail_reason TEXT;")
+                self.conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {ddl};")
             except sqlite3.OperationalError:
-                pass
+                continue
+            if name == "finished_at":
+                # best guess for history written before the column existed
+                self.conn.execute(
+                    "UPDATE tasks SET finished_at = CAST(strftime('%s', ts) AS REAL) "
+                    f"WHERE status IN {_FINISHED}"
+                )
+        # claims only ever look at claimable / leased rows; keep those lookups
+        # independent of how much finished history the table holds
+        self.conn.execute("DROP INDEX IF EXISTS idx_tasks_claimable")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks(type, priority DESC, id) "
+            "WHERE status IN ('pending', 'retry')"
+        )
+        self.conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_dedup ON tasks(dedup_key) "
+            "WHERE dedup_key IS NOT NULL"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks(lease_expires) "
+            "WHERE status = 'in_progress'"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tasks_finished ON tasks(finished_at) "
+            f"WHERE status IN {_FINISHED}"
+        )
         self.conn.commit()
+
+
+class TaskArchiver:
+    """Background thread that archives old finished tasks and compacts the file."""
+
+    def __init__(
+        self,
+        queue: TaskQueue,
+        ttl_seconds: float = 7 * 24 * 3600,
+        interval: float = 3600.0,
+        vacuum_pages: int | None = 1000,
+    ) -> None:
+        self.queue = queue
+        self.ttl_seconds = ttl_seconds
+        self.interval = interval
+        self.vacuum_pages = vacuum_pages
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def run_once(self) -> int:
+        archived = self.queue.archive_finished(self.ttl_seconds)
+        if archived:
+            self.queue.compact(self.vacuum_pages)
+        return archived
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="task-archiver", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except sqlite3.Error:
+                continue  # e.g. busy – try again next interval
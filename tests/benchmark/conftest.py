@@ -0,0 +1,74 @@
+"""Shared scaffolding for the benchmarks in this directory.
+
+Every ``test_*_bench.py`` is both a pytest module and a script::
+
+    python tests/benchmark/test_datastore_bench.py --rows 100000
+
+Under pytest only the ``test_*`` entry points run, and only if
+*pytest-benchmark* is installed; otherwise they are reported as skipped.
+Run as a script, a module prints its comparison table and imports the
+helpers below directly (the script's directory is on ``sys.path``).
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import pytest
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+
+def pytest_collection_modifyitems(config, items) -> None:
+    if config.pluginmanager.hasplugin("benchmark"):
+        return
+    skip = pytest.mark.skip(reason="pytest-benchmark not installed")
+    for item in items:
+        if BENCH_DIR in Path(item.path).resolve().parents:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def closing():
+    """Register objects with a ``close()`` method; they are closed after the test, newest first."""
+    resources: list = []
+
+    def register(resource):
+        resources.append(resource)
+        return resource
+
+    yield register
+    for resource in reversed(resources):
+        resource.close()
+
+
+# ---------------------------------------------------------------------------#
+# script helpers                                                             #
+# ---------------------------------------------------------------------------#
+def bench_parser(doc: str) -> argparse.ArgumentParser:
+    """Argument parser described by the first line of the module docstring."""
+    return argparse.ArgumentParser(description=doc.splitlines()[0])
+
+
+def timed(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> tuple[Any, float]:
+    """``(result, seconds)`` of a single call."""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+@contextmanager
+def scratch_dir(prefix: str) -> Iterator[Path]:
+    """Temporary directory for benchmark databases, removed afterwards."""
+    with tempfile.TemporaryDirectory(prefix=prefix) as tmp:
+        yield Path(tmp)
@@ -0,0 +1,111 @@
+"""Broker routing simulation benchmark.
+
+Fake providers sleep for a simulated latency. In the ``tail`` scenario the
+*primary* (listed first) is usually fast but 2% of its calls stall, the
+*secondary* is steady; in ``slow-primary`` the primary is alive but
+consistently slower than the secondary. Three routers are compared on the
+same request sequence – strict list order (the previous behaviour),
+latency-aware routing, and latency-aware routing with hedging after the
+p95 deadline::
+
+    python tests/benchmark/test_broker_bench.py --requests 2000
+
+Under pytest (requires *pytest-benchmark*) a short run of the hedged broker
+is measured and its p99 is checked against the ordered baseline.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+
+from conftest import bench_parser, percentile, timed
+
+from codepipeline.provider_broker import Broker, Provider
+
+
+class SimulatedProvider(Provider):
+    """Sleeps ``base`` seconds, or ``tail`` seconds with probability ``tail_rate``."""
+
+    def __init__(self, base: float, tail: float = 0.0, tail_rate: float = 0.0, seed: int = 0) -> None:
+        self.base = base
+        self.tail = tail
+        self.tail_rate = tail_rate
+        self._rng = random.Random(seed)
+
+    def generate(self, prompt: str) -> str:
+        slow = self._rng.random() < self.tail_rate
+        time.sleep(self.tail if slow else self.base)
+        return prompt
+
+
+def _providers(scale: float, scenario: str = "tail") -> list[Provider]:
+    if scenario == "slow-primary":
+        return [SimulatedProvider(0.020 * scale, seed=1), SimulatedProvider(0.004 * scale, seed=2)]
+    return [
+        SimulatedProvider(0.002 * scale, tail=0.060 * scale, tail_rate=0.02, seed=1),
+        SimulatedProvider(0.008 * scale, seed=2),
+    ]
+
+
+class _Ordered:
+    """The old broker behaviour: always the first provider that does not fail."""
+
+    def __init__(self, providers: list[Provider]) -> None:
+        self.providers = providers
+
+    def generate(self, prompt: str) -> str:
+        for provider in self.providers:
+            try:
+                return provider.generate(prompt)
+            except Exception:
+                continue
+        raise RuntimeError("All providers failed")
+
+    def close(self) -> None:
+        pass
+
+
+def _run(router, requests: int, warmup: int = 0) -> list[float]:
+    for i in range(warmup):  # fill the latency window before measuring
+        router.generate(f"warmup-{i}")
+    latencies = [timed(router.generate, f"req-{i}")[1] for i in range(requests)]
+    router.close()
+    return latencies
+
+
+def main() -> None:
+    parser = bench_parser(__doc__)
+    parser.add_argument("--requests", type=int, default=2_000)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for all simulated latencies")
+    parser.add_argument("--scenario", choices=["tail", "slow-primary"], default="tail")
+    args = parser.parse_args()
+
+    def providers() -> list[Provider]:
+        return _providers(args.scale, args.scenario)
+
+    routers = {
+        "ordered": lambda: _Ordered(providers()),
+        "latency-aware": lambda: Broker(providers()),
+        "hedged": lambda: Broker(providers(), hedge=True),
+    }
+    print(f"{'router':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, make in routers.items():
+        lat = _run(make(), args.requests)
+        print(
+            f"{name:<14} {percentile(lat, 0.5) * 1e3:>8.2f} {percentile(lat, 0.95) * 1e3:>8.2f} "
+            f"{percentile(lat, 0.99) * 1e3:>8.2f} {max(lat) * 1e3:>8.2f}"
+        )
+
+
+# ---------------------------------------------------------------------------#
+# pytest-benchmark entry points                                              #
+# ---------------------------------------------------------------------------#
+def test_hedged_broker_cuts_p99(benchmark):
+    baseline = percentile(_run(_Ordered(_providers(1.0)), 300), 0.99)
+    lat = benchmark.pedantic(lambda: _run(Broker(_providers(1.0), hedge=True), 300, warmup=100), rounds=1, iterations=1)
+    assert percentile(lat, 0.99) < baseline / 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Circuit breaker overhead benchmark.
+
+Measures the per-call overhead of wrapping a no-op function in a CLOSED
+breaker (the hot path on every provider call), as the difference to
+calling the function directly. Run as a script for a table::
+
+    python tests/benchmark/test_circuit_bench.py --calls 1000000
+
+Under pytest (requires *pytest-benchmark*) ``SlidingWindowBreaker.call`` is
+measured and its overhead is checked to stay below 1 µs per call.
+"""
+
+from __future__ import annotations
+
+import timeit
+
+from conftest import bench_parser
+
+from codepipeline.circuit import CircuitBreaker, SlidingWindowBreaker
+
+
+def _noop() -> None:
+    return None
+
+
+def _overhead(stmt, calls: int, repeat: int = 5) -> float:
+    """Best per-call overhead in seconds of *stmt* over a direct ``_noop()`` call."""
+    base = min(timeit.repeat(_noop, number=calls, repeat=repeat)) / calls
+    return min(timeit.repeat(stmt, number=calls, repeat=repeat)) / calls - base
+
+
+def main() -> None:
+    parser = bench_parser(__doc__)
+    parser.add_argument("--calls", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    count = CircuitBreaker()
+    window = SlidingWindowBreaker()
+    decorated = window(_noop)
+    modes = {
+        "CircuitBreaker.call": lambda: count.call(_noop),
+        "SlidingWindow.call": lambda: window.call(_noop),
+        "SlidingWindow decorator": decorated,
+    }
+    print(f"{'mode':<26} {'overhead ns/call':>17}")
+    for name, stmt in modes.items():
+        print(f"{name:<26} {_overhead(stmt, args.calls) * 1e9:>17.0f}")
+
+
+# ---------------------------------------------------------------------------#
+# pytest-benchmark entry points                                              #
+# ---------------------------------------------------------------------------#
+def test_closed_breaker_overhead(benchmark):
+    breaker = SlidingWindowBreaker()
+    benchmark(breaker.call, _noop)
+    assert breaker.state == "closed"
+    assert _overhead(lambda: breaker.call(_noop), 200_000) < 1e-6
+
+
+if __name__ == "__main__":
+    main()
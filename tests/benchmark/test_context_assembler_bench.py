@@ -0,0 +1,74 @@
+"""Context assembly retrieval benchmark.
+
+Compares the pure-Python scan (``{id: embedding}`` dict without NumPy),
+the dict adapter (converts on every call), a prebuilt
+:class:`EmbeddingIndex` and batched queries::
+
+    python tests/benchmark/test_context_assembler_bench.py --snippets 200000 --dim 384
+
+Under pytest (requires *pytest-benchmark*) a single top-k query against a
+prebuilt 50k-snippet index is measured.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from conftest import bench_parser, timed
+
+from codepipeline import context_assembler
+from codepipeline.context_assembler import EmbeddingIndex, assemble_context, assemble_context_batch
+
+
+def _corpus(snippets: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(size=(snippets, dim)).astype(np.float32)
+    ids = [f"s{i}" for i in range(snippets)]
+    return ids, matrix, {sid: f"def f_{sid}(): ..." for sid in ids}, rng
+
+
+def main() -> None:
+    parser = bench_parser(__doc__)
+    parser.add_argument("--snippets", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    ids, matrix, snippets, rng = _corpus(args.snippets, args.dim)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    as_dict = dict(zip(ids, matrix.tolist()))
+    query = queries[0].tolist()
+
+    numpy, context_assembler.np = context_assembler.np, None
+    try:
+        _, pure = timed(assemble_context, query, as_dict, snippets, args.top_k)
+    finally:
+        context_assembler.np = numpy
+    _, adapter = timed(assemble_context, query, as_dict, snippets, args.top_k)
+    index, build = timed(EmbeddingIndex, ids, matrix)
+    _, single = timed(lambda: [assemble_context(q, index, snippets, args.top_k) for q in queries])
+    _, batched = timed(assemble_context_batch, queries, index, snippets, args.top_k)
+    single /= args.queries
+    batched /= args.queries
+
+    print(f"{'mode':<24} {'ms/query':>10}")
+    print(f"{'pure python (dict)':<24} {pure * 1e3:>10.1f}")
+    print(f"{'dict adapter':<24} {adapter * 1e3:>10.1f}")
+    print(f"{'index build (once)':<24} {build * 1e3:>10.1f}")
+    print(f"{'EmbeddingIndex':<24} {single * 1e3:>10.1f}")
+    print(f"{'EmbeddingIndex batch':<24} {batched * 1e3:>10.1f}")
+
+
+# ---------------------------------------------------------------------------#
+# pytest-benchmark entry points                                              #
+# ---------------------------------------------------------------------------#
+def test_index_top_k_latency(benchmark):
+    ids, matrix, snippets, rng = _corpus(50_000, 384)
+    index = EmbeddingIndex(ids, matrix)
+    query = rng.normal(size=384).astype(np.float32)
+    context = benchmark(assemble_context, query, index, snippets, 8)
+    assert context.count("\n") == 8
+
+
+if __name__ == "__main__":
+    main()
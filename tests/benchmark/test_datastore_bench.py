@@ -0,0 +1,74 @@
+"""DataStore insert benchmark.
+
+Under pytest (requires *pytest-benchmark*) this measures the per-call cost
+of ``create_iteration`` with and without a persistent connection. Run as a
+script for the 100k-insert comparison::
+
+    python tests/benchmark/test_datastore_bench.py --rows 100000
+"""
+
+from __future__ import annotations
+
+import pytest
+from conftest import bench_parser, scratch_dir, timed
+
+from codepipeline.datastore import DataStore
+
+
+def _iteration(i: int) -> dict:
+    return {
+        "timestamp": "2025-01-01T00:00:00",
+        "patch": f"patch-{i}",
+        "score": 0.5,
+        "status": "ok",
+        "coverage_delta": 0.1,
+        "performance": 0.2,
+        "cost": 0.3,
+    }
+
+
+def _per_call(store: DataStore, rows: int) -> None:
+    for i in range(rows):
+        it = _iteration(i)
+        store.create_iteration(
+            it["timestamp"], it["patch"], it["score"], it["status"],
+            it["coverage_delta"], it["performance"], it["cost"],
+        )
+
+
+def main() -> None:
+    parser = bench_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with scratch_dir("ds-bench-") as tmp:
+        runs = [
+            ("per-call connection", lambda s: _per_call(s, args.rows), False),
+            ("persistent connection", lambda s: _per_call(s, args.rows), True),
+            ("create_iterations_bulk", lambda s: s.create_iterations_bulk(map(_iteration, range(args.rows))), True),
+        ]
+        print(f"{'mode':<24} {'total s':>9} {'us/insert':>10}")
+        for name, run, persistent in runs:
+            store = DataStore(tmp / f"{name.replace(' ', '_')}.db", persistent=persistent)
+            _, elapsed = timed(run, store)
+            store.close()
+            print(f"{name:<24} {elapsed:>9.2f} {elapsed / args.rows * 1e6:>10.1f}")
+
+
+# ---------------------------------------------------------------------------#
+# pytest-benchmark entry points                                              #
+# ---------------------------------------------------------------------------#
+@pytest.mark.parametrize("persistent", [False, True], ids=["per_call", "persistent"])
+def test_create_iteration_latency(benchmark, tmp_path, closing, persistent):
+    store = closing(DataStore(tmp_path / "it.db", persistent=persistent))
+    benchmark(store.create_iteration, "2025-01-01T00:00:00", "patch", 0.5, "ok")
+
+
+def test_create_iterations_bulk_latency(benchmark, tmp_path, closing):
+    store = closing(DataStore(tmp_path / "it.db"))
+    batch = [_iteration(i) for i in range(1_000)]
+    benchmark(store.create_iterations_bulk, batch)
+
+
+if __name__ == "__main__":
+    main()
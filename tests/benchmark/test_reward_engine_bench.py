@@ -0,0 +1,66 @@
+"""RewardEngine batch-scoring benchmark.
+
+Under pytest (requires *pytest-benchmark*) this measures ``evaluate_all``
+on a 10k-patch store. Run as a script to re-score a larger store and compare
+against per-patch ``evaluate`` calls (the metrics pusher is never started,
+so no Pushgateway traffic is measured)::
+
+    python tests/benchmark/test_reward_engine_bench.py --patches 100000
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from conftest import bench_parser, scratch_dir, timed
+
+from codepipeline.metrics_pusher import MetricsPusher
+from codepipeline.reward_engine import RewardEngine
+
+
+def _engine(db_path: Path, patches: int) -> RewardEngine:
+    engine = RewardEngine(db_path, pusher=MetricsPusher("localhost:1", "reward_engine"))
+    engine.store.create_iterations_bulk(
+        {
+            "timestamp": "2025-01-01T00:00:00",
+            "patch": f"patch-{i}",
+            "score": 0.0,
+            "status": "ok",
+            "coverage_delta": i % 7,
+            "performance": i % 11,
+            "cost": i % 13,
+        }
+        for i in range(patches)
+    )
+    return engine
+
+
+def main() -> None:
+    parser = bench_parser(__doc__)
+    parser.add_argument("--patches", type=int, default=100_000)
+    parser.add_argument("--sample", type=int, default=1_000, help="patches scored one by one for the baseline")
+    args = parser.parse_args()
+
+    with scratch_dir("re-bench-") as tmp:
+        engine = _engine(tmp / "it.db", args.patches)
+        _, elapsed = timed(lambda: [engine.evaluate(f"patch-{i}") for i in range(args.sample)])
+        per_call = elapsed / args.sample
+        _, batch = timed(engine.evaluate_all)
+        engine.close()
+
+        print(f"{'mode':<16} {'total s':>9} {'us/patch':>9}")
+        print(f"{'evaluate':<16} {per_call * args.patches:>9.2f} {per_call * 1e6:>9.1f}  (extrapolated)")
+        print(f"{'evaluate_all':<16} {batch:>9.2f} {batch / args.patches * 1e6:>9.1f}")
+
+
+# ---------------------------------------------------------------------------#
+# pytest-benchmark entry points                                              #
+# ---------------------------------------------------------------------------#
+def test_evaluate_all_latency(benchmark, tmp_path, closing):
+    engine = closing(_engine(tmp_path / "it.db", 10_000))
+    scores = benchmark(engine.evaluate_all)
+    assert len(scores) == 10_000
+
+
+if __name__ == "__main__":
+    main()
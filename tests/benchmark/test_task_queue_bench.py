@@ -0,0 +1,126 @@
+"""TaskQueue throughput benchmark.
+
+Under pytest (``pytest tests/benchmark``, requires *pytest-benchmark*) this
+measures enqueue/claim latency on a small table. Run as a script for the
+multi-process throughput table::
+
+    python tests/benchmark/test_task_queue_bench.py --rows 1000000 --workers 1,8,32
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import shutil
+import time
+from pathlib import Path
+
+from conftest import bench_parser, scratch_dir
+
+from codepipeline.task_queue import TaskQueue
+
+
+def _seed(db_path: Path, rows: int, tuned: bool = True) -> None:
+    q = TaskQueue(db_path, tuned=tuned)
+    payload = {"prompt": "x" * 64}
+    for start in range(0, rows, 100_000):
+        q.enqueue_many(("bench", payload) for _ in range(min(100_000, rows - start)))
+    q.close()
+
+
+def _claim_worker(db_path: str, batch: int, tuned: bool, start, counts) -> None:
+    q = TaskQueue(Path(db_path), tuned=tuned)
+    start.wait()
+    claimed = 0
+    while True:
+        tasks = q.fetch_batch(batch, lease_seconds=600)
+        if not tasks:
+            break
+        for task in tasks:
+            q.mark_success(task["id"])
+        claimed += len(tasks)
+    counts.put(claimed)
+    q.close()
+
+
+def _enqueue_worker(db_path: str, n: int, tuned: bool, start, counts) -> None:
+    q = TaskQueue(Path(db_path), tuned=tuned)
+    start.wait()
+    for i in range(n):
+        q.enqueue("bench", {"i": i})
+    counts.put(n)
+    q.close()
+
+
+def _run(target, args, workers: int) -> tuple[int, float]:
+    ctx = mp.get_context("spawn")
+    start, counts = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=target, args=(*args, start, counts)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    time.sleep(0.5)  # let interpreters come up before the clock starts
+    t0 = time.perf_counter()
+    start.set()
+    total = sum(counts.get() for _ in procs)
+    elapsed = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    return total, elapsed
+
+
+def main() -> None:
+    parser = bench_parser(__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="pending rows in the table")
+    parser.add_argument("--claim", type=int, default=100_000, help="rows to drain per run (<= rows)")
+    parser.add_argument("--enqueue", type=int, default=20_000, help="tasks enqueued per run")
+    parser.add_argument("--batch", type=int, default=100, help="fetch_batch size")
+    parser.add_argument("--workers", default="1,8,32")
+    parser.add_argument("--legacy", action="store_true", help="benchmark tuned=False storage")
+    args = parser.parse_args()
+    tuned = not args.legacy
+
+    with scratch_dir("tq-bench-") as tmp:
+        template = tmp / "template.db"
+        _seed(template, args.rows, tuned)
+        print(f"{'workers':>7} {'enqueue/s':>12} {'claim/s':>12}")
+        for workers in (int(w) for w in args.workers.split(",")):
+            db = tmp / f"run-{workers}.db"
+            shutil.copy(template, db)
+            # leave `args.claim` claimable rows on top of the finished history
+            q = TaskQueue(db, tuned=tuned)
+            with q.conn:
+                q.conn.execute(
+                    "UPDATE tasks SET status = 'success' WHERE id <= ?",
+                    (max(args.rows - args.claim, 0),),
+                )
+            q.close()
+            per_worker = max(args.enqueue // workers, 1)
+            n_enq, t_enq = _run(_enqueue_worker, (str(db), per_worker, tuned), workers)
+            n_claim, t_claim = _run(_claim_worker, (str(db), args.batch, tuned), workers)
+            print(f"{workers:>7} {n_enq / t_enq:>12,.0f} {n_claim / t_claim:>12,.0f}")
+            for f in tmp.glob(f"run-{workers}.db*"):
+                f.unlink()
+
+
+# ---------------------------------------------------------------------------#
+# pytest-benchmark entry points                                              #
+# ---------------------------------------------------------------------------#
+def test_enqueue_latency(benchmark, tmp_path, closing):
+    q = closing(TaskQueue(tmp_path / "tasks.db"))
+    benchmark(q.enqueue, "bench", {"prompt": "x" * 64})
+
+
+def test_enqueue_many_latency(benchmark, tmp_path, closing):
+    q = closing(TaskQueue(tmp_path / "tasks.db"))
+    batch = [("bench", {"prompt": "x" * 64}) for _ in range(1_000)]
+    benchmark(q.enqueue_many, batch)
+
+
+def test_claim_latency(benchmark, tmp_path, closing):
+    db = tmp_path / "tasks.db"
+    _seed(db, 50_000)
+    q = closing(TaskQueue(db))
+    benchmark.pedantic(q.fetch_batch, args=(10,), rounds=1_000)
+
+
+if __name__ == "__main__":
+    main()
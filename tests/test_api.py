@@ -11,12 +11,51 @@ if 'secrets' in sys.modules:
 
 from fastapi.testclient import TestClient
 from codepipeline.api.app import app
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 client = TestClient(app)
 
-@patch("codepipeline.api.app._gw.chat", return_value="print('x')\n")
+@patch("codepipeline.api.app._agw.chat", new_callable=AsyncMock, return_value="print('x')\n")
 def test_synth_endpoint(mock_chat):
     resp = client.post("/synth", json={"prompt":"x"})
     assert resp.status_code == 200
-    assert resp.json()["code"] == "print('x')\n"
\ No newline at end of file
+    assert resp.json()["code"] == "print('x')\n"
+    mock_chat.assert_awaited_once()
+
+def test_synth_does_not_block_event_loop():
+    import asyncio
+    import time
+
+    prompt = "Please write a step by step function: given an input list, return the expected output. " * 3
+
+    async def slow_chat(messages, **kwargs):
+        await asyncio.sleep(0.5)
+        return "ok"
+
+    async def run():
+        import httpx
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            synth = asyncio.create_task(ac.post("/synth", json={"prompt": prompt}))
+            await asyncio.sleep(0.05)
+            t0 = time.perf_counter()
+            assert (await ac.get("/livez")).status_code == 200
+            probe = time.perf_counter() - t0
+            assert (await synth).json()["code"] == "ok"
+        return probe
+
+    with patch("codepipeline.api.app._agw.chat", new=slow_chat):
+        assert asyncio.run(run()) < 0.4
+
+
+def test_synth_stream_sse():
+    async def fake_stream(messages, **kwargs):
+        for delta in ["def f():\n", "    return 1\n"]:
+            yield delta
+
+    prompt = "Please write a step by step function: given an input list, return the expected output. " * 3
+    with patch("codepipeline.api.app._agw.chat_stream", new=fake_stream):
+        resp = client.post("/synth/stream", json={"prompt": prompt})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    assert resp.text == 'data: "def f():\\n"\n\ndata: "    return 1\\n"\n\nevent: done\ndata: \n\n'
@@ -13,4 +13,69 @@ def test_circuit_opens_and_resets(monkeypatch):
     with pytest.raises(RuntimeError): cb.call(lambda: None)
     # wait and succeed
     import time; time.sleep(0.11)
-    assert cb.call(lambda: "ok")=="ok"
\ No newline at end of file
+    assert cb.call(lambda: "ok")=="ok"
+def test_registry_isolates_breakers_per_key():
+    from codepipeline.circuit import BreakerRegistry, CircuitOpenError
+    reg=BreakerRegistry(fail_max=1, reset_timeout=60)
+    anthropic=reg.get("anthropic","claude","/v1/messages")
+    assert reg.get("anthropic","claude","/v1/messages") is anthropic
+    with pytest.raises(ValueError): anthropic.call(lambda: (_ for _ in ()).throw(ValueError("down")))
+    assert not anthropic.available()
+    with pytest.raises(CircuitOpenError): anthropic.call(lambda: "x")
+    assert reg.get("openai","gpt-4o-mini","/v1/chat/completions").call(lambda: "ok")=="ok"
+    assert reg.states()=={"anthropic:claude:/v1/messages":"open","openai:gpt-4o-mini:/v1/chat/completions":"closed"}
+
+def test_sliding_window_opens_on_failure_rate(monkeypatch):
+    from codepipeline.circuit import SlidingWindowBreaker, CircuitOpenError
+    now={"t":1000.0}
+    monkeypatch.setattr("codepipeline.circuit.time.monotonic", lambda: now["t"])
+    cb=SlidingWindowBreaker(failure_rate=0.5, window=10, min_calls=4, reset_timeout=60)
+    def fail(): raise ValueError("boom")
+    with pytest.raises(ValueError): cb.call(fail)
+    with pytest.raises(ValueError): cb.call(fail)
+    assert cb.state=="closed"  # below min_calls
+    now["t"]+=11  # both failures leave the window
+    for _ in range(3): cb.call(lambda: None)
+    with pytest.raises(ValueError): cb.call(fail)
+    assert cb.counts()==(4,1) and cb.state=="closed"  # 25% < 50%
+    for _ in range(2):
+        with pytest.raises(ValueError): cb.call(fail)
+    assert cb.state=="open"
+    with pytest.raises(CircuitOpenError): cb.call(lambda: None)
+
+def test_half_open_admits_limited_probes(monkeypatch):
+    from codepipeline.circuit import SlidingWindowBreaker, CircuitOpenError
+    cb=SlidingWindowBreaker(min_calls=1, reset_timeout=0.05, half_open_probes=2)
+    with pytest.raises(ValueError): cb.call(lambda: (_ for _ in ()).throw(ValueError("boom")))
+    import time; time.sleep(0.06)
+    cb.before_call(); cb.before_call()  # two probes in flight
+    with pytest.raises(CircuitOpenError): cb.before_call()
+    cb.record_success()
+    assert cb.state=="half_open"
+    cb.record_success()
+    assert cb.state=="closed" and cb.counts()==(0,0)
+
+def test_async_call_and_decorator_forms():
+    import asyncio
+    from codepipeline.circuit import SlidingWindowBreaker, CircuitOpenError
+    cb=SlidingWindowBreaker(min_calls=2, reset_timeout=60)
+
+    @cb
+    def add(a, b): return a+b
+
+    @cb
+    async def fetch(fail=False):
+        await asyncio.sleep(0)
+        if fail: raise ValueError("down")
+        return "ok"
+
+    assert add(1, 2)==3 and add.__name__=="add"
+    assert asyncio.run(fetch())=="ok"
+    for _ in range(2):
+        with pytest.raises(ValueError): asyncio.run(fetch(fail=True))
+    with pytest.raises(CircuitOpenError): asyncio.run(cb.async_call(fetch.__wrapped__))
+    with pytest.raises(CircuitOpenError): add(1, 2)
+
+def test_breaker_base_is_abstract():
+    from codepipeline.circuit import Breaker
+    with pytest.raises(TypeError): Breaker(30.0,1,("global","",""))
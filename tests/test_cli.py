@@ -3,11 +3,47 @@ from codepipeline.cli import app
 from unittest.mock import patch, MagicMock
 import pathlib, json, os, tempfile
 
+PROMPT = "Please write a step by step function: given an input list, return the expected output. " * 3
+
 def test_synth_cli(monkeypatch):
     runner = CliRunner()
     fake = MagicMock(return_value="print('hi')\n")
     monkeypatch.setattr("codepipeline.cli._gw.chat", fake)
     with runner.isolated_filesystem():
-        result = runner.invoke(app, ["synth", "--prompt", "hello", "--target", "app.py"])
+        result = runner.invoke(app, ["--prompt", PROMPT, "--target", "app.py", "--no-stream"])
+        assert result.exit_code == 0
+        assert pathlib.Path("app.py").read_text() == "print('hi')\n"
+
+def test_synth_cli_streams_to_target(monkeypatch):
+    runner = CliRunner()
+    seen = []
+
+    def fake_stream(messages, **kwargs):
+        for delta in ["print(", "'hi'", ")\n"]:
+            assert not pathlib.Path("app.py").exists()  # target only appears once complete
+            [partial] = pathlib.Path(".").glob(".app.py.*.part")
+            seen.append(partial.read_text())  # earlier deltas already on disk
+            yield delta
+
+    monkeypatch.setattr("codepipeline.cli._gw.chat_stream", fake_stream)
+    with runner.isolated_filesystem():
+        result = runner.invoke(app, ["--prompt", PROMPT, "--target", "app.py"])
         assert result.exit_code == 0
-        assert pathlib.Path("app.py").read_text() == "print('hi')\n"
\ No newline at end of file
+        assert pathlib.Path("app.py").read_text() == "print('hi')\n"
+        assert seen == ["", "print(", "print('hi'"]
+        assert list(pathlib.Path(".").glob("*.part")) == []
+
+def test_synth_cli_failed_stream_keeps_target(monkeypatch):
+    runner = CliRunner()
+
+    def fake_stream(messages, **kwargs):
+        yield "print("
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr("codepipeline.cli._gw.chat_stream", fake_stream)
+    with runner.isolated_filesystem():
+        pathlib.Path("app.py").write_text("old = 1\n")
+        result = runner.invoke(app, ["--prompt", PROMPT, "--target", "app.py"])
+        assert result.exit_code != 0
+        assert pathlib.Path("app.py").read_text() == "old = 1\n"
+        assert list(pathlib.Path(".").glob(".app.py.*")) == []
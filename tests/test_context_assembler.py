@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from codepipeline import context_assembler
+from codepipeline.context_assembler import EmbeddingIndex, assemble_context, assemble_context_batch
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    emb = {f"s{i}": rng.normal(size=16).tolist() for i in range(200)}
+    emb["zero"] = [0.0] * 16
+    snippets = {sid: f"# snippet {sid}" for sid in emb}
+    return emb, snippets, rng.normal(size=(3, 16))
+
+
+def test_matrix_path_matches_pure_python(corpus, monkeypatch):
+    emb, snippets, queries = corpus
+    for q in queries:
+        fast = assemble_context(q.tolist(), emb, snippets, top_k=5, token_limit=10_000)
+        monkeypatch.setattr(context_assembler, "np", None)
+        slow = assemble_context(q.tolist(), emb, snippets, top_k=5, token_limit=10_000)
+        monkeypatch.undo()
+        assert fast == slow and fast.count("\n") == 5
+
+
+def test_top_k_scores_and_batch(corpus):
+    emb, snippets, queries = corpus
+    index = EmbeddingIndex.from_dict(emb)
+    assert index.matrix.dtype == np.float32 and len(index) == 201
+    hits = index.top_k(emb["s7"], 3)
+    assert hits[0][0] == "s7" and hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+    for batch_hits, q in zip(index.top_k_batch(queries, 4), queries):
+        single = index.top_k(q, 4)
+        assert [sid for sid, _ in batch_hits] == [sid for sid, _ in single]
+        assert [s for _, s in batch_hits] == pytest.approx([s for _, s in single], abs=1e-5)
+    everything = index.top_k(queries[0], 500)
+    assert len(everything) == 201 and dict(everything)["zero"] == 0.0
+    contexts = assemble_context_batch(queries, index, snippets, top_k=4, token_limit=30)
+    assert contexts == [assemble_context(q.tolist(), index, snippets, top_k=4, token_limit=30) for q in queries]
+    assert all(c.count("\n") == 2 for c in contexts)  # token_limit stops after two snippets
+
+
+def test_index_shape_is_validated():
+    with pytest.raises(ValueError):
+        EmbeddingIndex(["a", "b"], [[1.0, 0.0]])
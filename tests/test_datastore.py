@@ -0,0 +1,180 @@
+import pytest
+from codepipeline.datastore import DataStore
+
+def _it(i, **kw):
+    row = {'timestamp': f'2025-01-01 00:00:{i % 60:02d}', 'patch': f'patch-{i}', 'score': float(i), 'status': 'ok'}
+    row.update(kw)
+    return row
+
+@pytest.mark.parametrize('persistent', [True, False])
+def test_crud_roundtrip(tmp_path, persistent):
+    store = DataStore(tmp_path / 'it.db', persistent=persistent)
+    it_id = store.create_iteration('2025-01-01', 'p1', 0.5, 'ok', coverage_delta=1.0)
+    assert store.get_iteration(it_id)['coverage_delta'] == 1.0
+    assert store.update_iteration(it_id, score=0.9)
+    assert store.get_iteration(it_id)['score'] == 0.9
+    assert store.delete_iteration(it_id)
+    assert store.get_iteration(it_id) is None
+    store.close()
+
+def test_create_iterations_bulk(tmp_path):
+    store = DataStore(tmp_path / 'it.db')
+    first = store.create_iteration('2025-01-01', 'p0', 0.0, 'ok')
+    ids = store.create_iterations_bulk(_it(i, cost=2.0) for i in range(1, 101))
+    assert ids == list(range(first + 1, first + 101))
+    assert store.get_iteration(ids[41])['patch'] == 'patch-42'
+    assert store.get_iteration(ids[-1])['cost'] == 2.0
+    assert store.create_iterations_bulk([]) == []
+    assert len(store.list_iterations()) == 101
+    store.close()
+
+def test_get_by_patch_uses_hash_index(tmp_path):
+    store = DataStore(tmp_path / 'it.db')
+    store.create_iterations_bulk(_it(i) for i in range(50))
+    entry = store.get_by_patch('patch-7', columns=('score',))
+    assert entry == {'id': 8, 'score': 7.0}
+    assert store.get_by_patch('missing') is None
+    store.update_iteration(8, patch='renamed')
+    assert store.get_by_patch('renamed')['id'] == 8
+    with store._connection() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM iterations WHERE patch_hash = ? AND patch = ?", ('x', 'x')
+        ).fetchall()
+    assert 'idx_iterations_patch_hash' in str(plan)
+    with pytest.raises(ValueError):
+        store.get_by_patch('patch-1', columns=('score; DROP TABLE iterations',))
+    store.close()
+
+def test_iter_iterations_pages_and_projects(tmp_path):
+    store = DataStore(tmp_path / 'it.db')
+    store.create_iterations_bulk(_it(i) for i in range(25))
+    store.delete_iteration(10)
+    rows = list(store.iter_iterations(batch_size=4, columns=('score', 'cost')))
+    assert len(rows) == 24
+    assert all(set(r) == {'id', 'score', 'cost'} for r in rows)
+    assert [r['id'] for r in rows] == [i for i in range(1, 26) if i != 10]
+    store.close()
+
+def test_existing_database_gets_patch_hash(tmp_path):
+    import sqlite3
+    from codepipeline import datastore
+    db = tmp_path / 'old.db'
+    with sqlite3.connect(db) as conn:
+        conn.execute(datastore.DB_SCHEMA.replace(',\n    patch_hash TEXT', ''))
+        conn.execute("INSERT INTO iterations (timestamp, patch, score, status) VALUES ('t', 'old', 1.0, 'ok')")
+    store = DataStore(db)
+    assert store.get_by_patch('old')['score'] == 1.0
+    store.close()
+
+def test_streaming_exports(tmp_path):
+    import csv, json
+    store = DataStore(tmp_path / 'it.db')
+    assert not store.export_to_csv(tmp_path / 'empty.csv')
+    assert store.export_to_json(tmp_path / 'empty.json')
+    assert json.loads((tmp_path / 'empty.json').read_text()) == []
+    store.create_iterations_bulk(_it(i, patch=f'pätch-{i}') for i in range(12))
+    expected = store.list_iterations()
+    assert store.export(tmp_path / 'it.json', 'json')
+    assert json.loads((tmp_path / 'it.json').read_text(encoding='utf-8')) == expected
+    assert store.export(tmp_path / 'it.ndjson', 'ndjson', columns=('score',))
+    lines = (tmp_path / 'it.ndjson').read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == [{'id': r['id'], 'score': r['score']} for r in expected]
+    assert store.export_to_csv(tmp_path / 'it.csv')
+    with open(tmp_path / 'it.csv', newline='', encoding='utf-8') as fh:
+        assert [r['patch'] for r in csv.DictReader(fh)] == [r['patch'] for r in expected]
+    with pytest.raises(ValueError):
+        store.export(tmp_path / 'it.xml', 'xml')
+    store.close()
+
+def test_parquet_export(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    store = DataStore(tmp_path / 'it.db')
+    store.create_iterations_bulk(_it(i) for i in range(10))
+    assert store.export_to_parquet(tmp_path / 'it.parquet', columns=('score', 'status'), batch_size=3)
+    table = pq.read_table(tmp_path / 'it.parquet')
+    assert table.column_names == ['id', 'score', 'status']
+    assert table.num_rows == 10
+    store.close()
+
+def _expected(values):
+    import statistics
+    return statistics.fmean(values), statistics.variance(values)
+
+def test_kpi_summary_tracks_writes(tmp_path):
+    from datetime import datetime, timedelta, timezone
+    store = DataStore(tmp_path / 'it.db')
+    now = datetime.now(timezone.utc)
+    recent = [(now - timedelta(minutes=5 * i)).isoformat() for i in range(5)]
+    old = ['2020-01-01T00:00:00'] * 5
+    ids = store.create_iterations_bulk(
+        _it(i, timestamp=ts, score=float(i), cost=i * 0.5, status='ok' if i % 2 else 'failed')
+        for i, ts in enumerate(recent + old)
+    )
+    store.delete_iteration(ids[3])
+    store.update_iteration(ids[4], score=40.0, status='ok')
+    scores = [0.0, 1.0, 2.0, 40.0, 5.0, 6.0, 7.0, 8.0, 9.0]
+
+    summary = store.kpi_summary(last_n=3)
+    assert summary['count'] == 9
+    assert summary['status_counts'] == {'failed': 4, 'ok': 5}
+    mean, variance = _expected(scores)
+    assert summary['metrics']['score']['n'] == 9
+    assert summary['metrics']['score']['mean'] == pytest.approx(mean)
+    assert summary['metrics']['score']['variance'] == pytest.approx(variance)
+    mean, variance = _expected([0.0, 1.0, 2.0, 40.0])
+    assert summary['last_24h']['score']['mean'] == pytest.approx(mean)
+    assert summary['last_24h']['score']['variance'] == pytest.approx(variance)
+    mean, variance = _expected([7.0, 8.0, 9.0])
+    assert summary['last_n']['score']['mean'] == pytest.approx(mean)
+    assert summary['last_n']['score']['variance'] == pytest.approx(variance)
+    assert summary['metrics']['cost']['mean'] == pytest.approx(sum(s * 0.5 for s in range(10) if s != 3) / 9)
+    store.close()
+
+def test_kpis_rebuilt_for_existing_database(tmp_path):
+    import sqlite3
+    db = tmp_path / 'legacy.db'
+    with sqlite3.connect(db) as conn:
+        conn.execute(
+            'CREATE TABLE iterations (id INTEGER PRIMARY KEY, timestamp DATETIME NOT NULL, patch TEXT NOT NULL, '
+            'score REAL NOT NULL, coverage_delta REAL DEFAULT 0.0, performance REAL DEFAULT 0.0, '
+            'cost REAL DEFAULT 0.0, status TEXT NOT NULL)'
+        )
+        conn.executemany(
+            "INSERT INTO iterations (timestamp, patch, score, status) VALUES ('2025-01-01', ?, ?, 'ok')",
+            [(f'p{i}', float(i)) for i in range(6)]
+        )
+    store = DataStore(db)
+    summary = store.kpi_summary()
+    assert summary['status_counts'] == {'ok': 6}
+    assert summary['metrics']['score']['mean'] == pytest.approx(2.5)
+    assert summary['metrics']['score']['variance'] == pytest.approx(3.5)
+    store.create_iteration('2025-01-01', 'p6', 6.0, 'ok')
+    assert store.kpi_summary()['metrics']['score']['mean'] == pytest.approx(3.0)
+    store.close()
+
+def test_kpi_last_n_variance_is_stable_for_large_values(tmp_path):
+    store = DataStore(tmp_path / 'it.db')
+    store.create_iterations_bulk(_it(i, score=1e9 + i) for i in range(3))
+    assert store.kpi_summary(last_n=3)['last_n']['score']['variance'] == pytest.approx(1.0)
+    store.close()
+
+def test_stale_kpi_buckets_are_pruned_on_read(tmp_path):
+    import sqlite3
+    store = DataStore(tmp_path / 'it.db')
+    store.create_iterations_bulk(_it(i, timestamp='2020-01-01T00:00:00') for i in range(3))
+    with sqlite3.connect(tmp_path / 'it.db') as conn:
+        assert conn.execute("SELECT COUNT(*) FROM iteration_kpis WHERE bucket > ''").fetchone()[0] > 0
+    store.kpi_summary()
+    with sqlite3.connect(tmp_path / 'it.db') as conn:
+        assert conn.execute("SELECT COUNT(*) FROM iteration_kpis WHERE bucket > ''").fetchone()[0] == 0
+    assert store.kpi_summary()['metrics']['score']['n'] == 3
+    store.close()
+
+def test_get_many_by_patch_uses_chunks_and_oldest_entry(tmp_path):
+    store = DataStore(tmp_path / 'it.db')
+    store.create_iterations_bulk(_it(i) for i in range(10))
+    store.create_iteration('2025-01-02', 'patch-4', 99.0, 'ok')
+    found = store.get_many_by_patch(['patch-7', 'patch-4', 'missing', 'patch-7'], columns=('score',), chunk_size=2)
+    assert list(found) == ['patch-7', 'patch-4']
+    assert found['patch-4'] == {'id': 5, 'patch': 'patch-4', 'score': 4.0}
+    store.close()
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+
+from codepipeline.llm_cache import LRUCache, SQLiteCache, TieredCache, cache_key, default_cache
+
+
+def test_cache_key_covers_model_messages_and_kwargs():
+    msgs = [{"role": "user", "content": "hi"}]
+    assert cache_key("m", msgs, temperature=0, top_p=1) == cache_key("m", msgs, top_p=1, temperature=0)
+    assert cache_key("m", msgs) != cache_key("other", msgs)
+    assert cache_key("m", msgs) != cache_key("m", [{"role": "user", "content": "hi!"}])
+    assert cache_key("m", msgs, temperature=0) != cache_key("m", msgs, temperature=0.5)
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = LRUCache(max_entries=2, ttl=10)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"  # a is now most recent
+    cache.set("c", "3")
+    assert cache.get("b") is None and len(cache) == 2
+    now = time.time()
+    monkeypatch.setattr("codepipeline.llm_cache.time.time", lambda: now + 11)
+    assert cache.get("a") is None
+    assert cache.stats == {"hits": 1, "misses": 2}
+
+
+def test_sqlite_tier_persists_and_bounds_size(tmp_path):
+    disk = SQLiteCache(tmp_path / "c.db", max_entries=10)
+    for i in range(25):
+        disk.set(f"k{i}", f"v{i}")
+    assert disk.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] == 10
+    assert disk.get("k0") is None and disk.get("k24") == "v24"
+    disk.close()
+    assert SQLiteCache(tmp_path / "c.db").get("k20") == "v20"
+
+
+def test_sqlite_ttl(tmp_path, monkeypatch):
+    disk = SQLiteCache(tmp_path / "c.db", ttl=5)
+    disk.set("k", "v")
+    now = time.time()
+    monkeypatch.setattr("codepipeline.llm_cache.time.time", lambda: now + 6)
+    assert disk.get("k") is None
+    assert disk.conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] == 0
+
+
+def test_tiered_promotes_disk_hits(tmp_path):
+    SQLiteCache(tmp_path / "c.db").set("k", "v")
+    cache = TieredCache(LRUCache(), SQLiteCache(tmp_path / "c.db"))
+    assert cache.get("k") == "v"
+    assert cache.memory.get("k") == "v"
+    assert cache.disk.stats == {"hits": 1, "misses": 0}
+    assert cache.get("missing") is None
+
+
+def test_memory_hit_is_fast():
+    cache = TieredCache(LRUCache())
+    key = cache_key("m", [{"role": "user", "content": "x" * 2000}])
+    cache.set(key, "resp")
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        cache.get(key)
+    assert (time.perf_counter() - t0) / 1000 < 1e-4
+
+
+@pytest.mark.parametrize("value", [None, "0", "off"])
+def test_default_cache_disabled(monkeypatch, value):
+    if value is None:
+        monkeypatch.delenv("LLM_CACHE", raising=False)  # opt-in: off by default
+    else:
+        monkeypatch.setenv("LLM_CACHE", value)
+    assert default_cache() is None
+
+
+def test_default_cache_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("LLM_CACHE", "1")
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "sub" / "llm.db"))
+    monkeypatch.setenv("LLM_CACHE_TTL", "60")
+    cache = default_cache()
+    assert cache.disk.ttl == 60 and cache.memory.ttl == 60
+    cache.set("k", "v")
+    assert (tmp_path / "sub" / "llm.db").exists()
@@ -20,4 +20,266 @@ def test_gateway_injection():
     fake_client.chat.completions.create.return_value = fake_resp
     gw = LLMGateway(client=fake_client)
     assert gw.chat([{"role":"user","content":"hi"}]) == "hi"
-    fake_client.chat.completions.create.assert_called_once()
\ No newline at end of file
+    fake_client.chat.completions.create.assert_called_once()
+def test_gateway_cache_and_bypass():
+    from codepipeline.llm_cache import LRUCache
+    fake_client = MagicMock()
+    fake_client.chat.completions.create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="hi"))])
+    gw = LLMGateway(client=fake_client, cache=LRUCache())
+    msgs = [{"role": "user", "content": "hi"}]
+    assert gw.chat(msgs, temperature=0) == "hi"
+    assert gw.chat(msgs, temperature=0) == "hi"
+    assert fake_client.chat.completions.create.call_count == 1
+    gw.chat(msgs, temperature=0.7)  # different sampling kwargs -> different key
+    gw.chat(msgs, temperature=0, cache=False)  # bypass
+    assert fake_client.chat.completions.create.call_count == 3
+
+def test_async_gateway_retries_and_caches():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from codepipeline.llm_cache import LRUCache
+    from codepipeline.llm_gateway import AsyncLLMGateway, async_retry
+
+    fake_client = MagicMock()
+    fake_client.chat.completions.create = AsyncMock(
+        side_effect=[RuntimeError("boom"), MagicMock(choices=[MagicMock(message=MagicMock(content="hi"))])]
+    )
+    gw = AsyncLLMGateway(client=fake_client, cache=LRUCache())
+    gw._complete = async_retry(times=3, delay=0)(AsyncLLMGateway._complete.__wrapped__).__get__(gw)
+    msgs = [{"role": "user", "content": "hi"}]
+    assert asyncio.run(gw.chat(msgs)) == "hi"
+    assert asyncio.run(gw.chat(msgs)) == "hi"
+    assert fake_client.chat.completions.create.await_count == 2
+
+def test_gateway_coalesces_concurrent_identical_calls():
+    import threading, time
+    fake_client = MagicMock()
+
+    def slow_create(**kwargs):
+        time.sleep(0.1)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content="hi"))])
+
+    fake_client.chat.completions.create.side_effect = slow_create
+    gw = LLMGateway(client=fake_client)
+    msgs = [{"role": "user", "content": "same"}]
+    threads = [threading.Thread(target=gw.chat, args=(msgs,)) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fake_client.chat.completions.create.call_count == 1
+    assert gw._flight.coalesced == 4
+
+def _chunk(content):
+    return MagicMock(choices=[MagicMock(delta=MagicMock(content=content))])
+
+def test_chat_stream_yields_deltas_and_caches():
+    from codepipeline.llm_cache import LRUCache
+    fake_client = MagicMock()
+    fake_client.chat.completions.create.return_value = iter([_chunk(None), _chunk("a"), _chunk("b"), MagicMock(choices=[])])
+    gw = LLMGateway(client=fake_client, cache=LRUCache())
+    msgs = [{"role": "user", "content": "hi"}]
+    assert list(gw.chat_stream(msgs)) == ["a", "b"]
+    assert fake_client.chat.completions.create.call_args.kwargs["stream"] is True
+    assert list(gw.chat_stream(msgs)) == ["ab"]  # cache hit
+    assert gw.chat(msgs) == "ab"
+    assert fake_client.chat.completions.create.call_count == 1
+
+def test_async_chat_stream():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from codepipeline.llm_gateway import AsyncLLMGateway
+
+    async def chunks():
+        for c in ("x", "y"):
+            yield _chunk(c)
+
+    fake_client = MagicMock()
+    fake_client.chat.completions.create = AsyncMock(return_value=chunks())
+    gw = AsyncLLMGateway(client=fake_client)
+
+    async def collect():
+        return [d async for d in gw.chat_stream([{"role": "user", "content": "hi"}])]
+
+    assert asyncio.run(collect()) == ["x", "y"]
+
+def test_retry_honours_retry_after_and_jitter(monkeypatch):
+    from types import SimpleNamespace
+    sleeps = []
+    monkeypatch.setattr("codepipeline.llm_gateway.time.sleep", sleeps.append)
+    calls = {"n": 0}
+
+    @retry(times=4, delay=1.0, backoff=2.0)
+    def flaky():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            exc = RuntimeError("429")
+            exc.response = SimpleNamespace(status_code=429, headers={"retry-after": "7"})
+            raise exc
+        if calls["n"] < 4:
+            raise ValueError("boom")
+        return "ok"
+
+    assert flaky() == "ok"
+    assert sleeps[0] == 7.0
+    assert 1.0 <= sleeps[1] <= 2.0 and 2.0 <= sleeps[2] <= 4.0  # backoff 2, 4 with up to 50% jitter
+
+    sleeps.clear()
+    calls["n"] = 0
+
+    @retry(times=2, max_delay=5.0)
+    def throttled():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            exc = RuntimeError("429")
+            exc.response = SimpleNamespace(status_code=429, headers={"retry-after": "3600"})
+            raise exc
+        return "ok"
+
+    assert throttled() == "ok"
+    assert sleeps == [5.0]  # Retry-After capped at max_delay
+
+def test_gateway_applies_rate_limiter():
+    from codepipeline.rate_limit import RateLimiter
+    fake_client = MagicMock()
+    fake_client.chat.completions.create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="hi"))])
+    limiter = RateLimiter(tpm=60_000)
+    limiter.acquire = MagicMock(return_value=0.0)
+    gw = LLMGateway(client=fake_client, limiter=limiter)
+    gw.chat([{"role": "user", "content": "x" * 400}], max_tokens=50)
+    limiter.acquire.assert_called_once_with(4 + 100 + 50)
+
+def test_chat_batch_bounded_concurrency_and_per_item_errors():
+    import threading, time
+    from codepipeline.llm_gateway import BatchResult
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def create(model, messages, **kwargs):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.02)
+        with lock:
+            state["active"] -= 1
+        text = messages[-1]["content"]
+        if text == "bad":
+            raise ValueError("invalid request")
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=text.upper()))])
+
+    fake_client = MagicMock()
+    fake_client.chat.completions.create.side_effect = create
+    gw = LLMGateway(client=fake_client)
+    gw._complete = retry(times=1)(LLMGateway._complete.__wrapped__).__get__(gw)
+    reqs = [{"messages": [{"role": "user", "content": c}]} for c in ["a", "bad", "c", "d", "e", "f"]]
+    results = gw.chat_batch(reqs, max_concurrency=3)
+    assert all(isinstance(r, BatchResult) for r in results)
+    assert [r.content for r in results] == ["A", None, "C", "D", "E", "F"]
+    assert isinstance(results[1].error, ValueError) and not results[1].ok
+    assert state["peak"] <= 3
+    assert gw.chat_batch([]) == []
+
+def test_chat_batch_via_batch_api():
+    import json
+    from types import SimpleNamespace
+    from codepipeline.llm_cache import LRUCache, cache_key
+    uploaded = {}
+
+    def files_create(file, purpose):
+        uploaded["lines"] = [json.loads(l) for l in file[1].decode().splitlines()]
+        return SimpleNamespace(id="file-in")
+
+    def files_content(file_id):
+        out = []
+        for line in uploaded["lines"]:
+            text = line["body"]["messages"][-1]["content"]
+            if text == "bad":
+                out.append({"custom_id": line["custom_id"], "response": {"status_code": 400, "body": {"error": "nope"}}})
+            else:
+                body = {"choices": [{"message": {"content": text.upper()}}]}
+                out.append({"custom_id": line["custom_id"], "response": {"status_code": 200, "body": body}})
+        return SimpleNamespace(text="\n".join(json.dumps(o) for o in out))
+
+    fake_client = MagicMock()
+    fake_client.files.create.side_effect = files_create
+    fake_client.files.content.side_effect = files_content
+    fake_client.batches.create.return_value = SimpleNamespace(id="b1", status="in_progress")
+    fake_client.batches.retrieve.return_value = SimpleNamespace(
+        id="b1", status="completed", output_file_id="file-out", error_file_id=None
+    )
+    cache = LRUCache()
+    msgs = lambda c: [{"role": "user", "content": c}]
+    cache.set(cache_key("gpt-4o-mini", msgs("cached")), "FROM CACHE")
+    gw = LLMGateway(client=fake_client, cache=cache)
+    reqs = [{"messages": msgs(c), "semantic_threshold": 0.95} for c in ["x", "bad", "x", "cached", "y"]]
+    results = gw.chat_batch(reqs, use_batch_api=True, poll_interval=0)
+    assert [r.content for r in results] == ["X", None, "X", "FROM CACHE", "Y"]
+    assert isinstance(results[1].error, RuntimeError)
+    assert len(uploaded["lines"]) == 3  # duplicate and cached requests not submitted
+    assert uploaded["lines"][0]["url"] == "/v1/chat/completions"
+    assert set(uploaded["lines"][0]["body"]) == {"model", "messages"}  # gateway-only kwargs stripped
+    fake_client.batches.create.assert_called_once_with(
+        input_file_id="file-in", endpoint="/v1/chat/completions", completion_window="24h"
+    )
+    fake_client.chat.completions.create.assert_not_called()
+    assert cache.get(cache_key("gpt-4o-mini", msgs("y"))) == "Y"
+
+def test_chat_batch_api_timeout_marks_items():
+    from types import SimpleNamespace
+    fake_client = MagicMock()
+    fake_client.files.create.return_value = SimpleNamespace(id="f")
+    fake_client.batches.create.return_value = SimpleNamespace(id="b1", status="in_progress")
+    fake_client.batches.retrieve.return_value = SimpleNamespace(id="b1", status="in_progress")
+    gw = LLMGateway(client=fake_client)
+    results = gw.chat_batch([{"messages": [{"role": "user", "content": "x"}]}], use_batch_api=True,
+                            poll_interval=0.01, timeout=0.05)
+    assert isinstance(results[0].error, TimeoutError)
+    fake_client.batches.cancel.assert_called_once_with("b1")
+
+def test_gateway_circuit_breaker_fails_fast_per_model():
+    import pytest
+    from codepipeline.circuit import BreakerRegistry, CircuitOpenError
+    fake_client = MagicMock()
+    fake_client.chat.completions.create.side_effect = RuntimeError("boom")
+    reg = BreakerRegistry(fail_max=2, reset_timeout=60)
+    gw = LLMGateway(client=fake_client, breakers=reg)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            LLMGateway._complete.__wrapped__(gw, [{"role": "user", "content": "hi"}], model="m1")
+    with pytest.raises(CircuitOpenError):
+        gw.chat([{"role": "user", "content": "hi"}], model="m1", cache=False)  # not retried
+    assert fake_client.chat.completions.create.call_count == 2
+    assert reg.states() == {"openai:m1:/v1/chat/completions": "open"}
+    fake_client.chat.completions.create.side_effect = None
+    fake_client.chat.completions.create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="ok"))])
+    assert gw.chat([{"role": "user", "content": "hi"}], model="m2") == "ok"
+
+def test_rate_limited_probe_releases_half_open_slot(monkeypatch):
+    import time
+    import pytest
+    from types import SimpleNamespace
+    from codepipeline.circuit import BreakerRegistry
+    from codepipeline.llm_gateway import CHAT_COMPLETIONS_ENDPOINT, PROVIDER
+    from codepipeline.provider_broker import Broker, OpenAIProvider
+
+    throttled = RuntimeError("429")
+    throttled.response = SimpleNamespace(status_code=429, headers={})
+    fake_client = MagicMock()
+    fake_client.chat.completions.create.side_effect = [RuntimeError("boom"), throttled, MagicMock(
+        choices=[MagicMock(message=MagicMock(content="ok"))]
+    )]
+    reg = BreakerRegistry(fail_max=1, reset_timeout=60)
+    gw = LLMGateway(client=fake_client, breakers=reg)
+    call = LLMGateway._complete.__wrapped__
+    with pytest.raises(RuntimeError, match="boom"):
+        call(gw, [{"role": "user", "content": "hi"}], model="gpt-4o-mini")
+    breaker = reg.get(PROVIDER, "gpt-4o-mini", CHAT_COMPLETIONS_ENDPOINT)
+    now = time.time()
+    monkeypatch.setattr("codepipeline.circuit.time.time", lambda: now + 61)
+    with pytest.raises(RuntimeError, match="429"):
+        call(gw, [{"role": "user", "content": "hi"}], model="gpt-4o-mini")  # probe admitted, then throttled
+    assert breaker.state == "half_open"
+    assert call(gw, [{"role": "user", "content": "hi"}], model="gpt-4o-mini") == "ok"  # slot was released
+    assert breaker.state == "closed"
+    # the broker resolves the same breaker for the same target
+    assert Broker([OpenAIProvider()], breakers=reg).breakers.popitem()[1] is breaker
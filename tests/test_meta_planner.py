@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+
+from codepipeline.meta_planner import MetaPlanner
+
+
+class _LLM:
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def complete(self, prompt):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        if 'Patch \'bad' in prompt:
+            return 'not json'
+        if 'Patch \'boom' in prompt:
+            raise RuntimeError('rate limited')
+        cov = float(prompt.split('Coverage-Delta: ')[1].split('\n')[0])
+        return json.dumps([{'type': 'test', 'description': prompt.splitlines()[0], 'impact': cov, 'effort': 1}])
+
+
+def _planner(tmp_path, llm, **kw):
+    return MetaPlanner(tmp_path / 'it.db', 'owner', 'repo', llm, github_client=object(), **kw)
+
+
+def _add(planner, n, **kw):
+    planner.store.create_iterations_bulk(
+        {'timestamp': '2025-01-01', 'patch': f'p{i}', 'score': 0.0, 'status': 'ok', 'coverage_delta': float(i % 10), **kw}
+        for i in range(n)
+    )
+
+
+def test_generate_tasks_parallel_and_top_n(tmp_path):
+    llm = _LLM(delay=0.01)
+    planner = _planner(tmp_path, llm, max_workers=4)
+    _add(planner, 40)
+    planner.store.create_iteration('2025-01-01', 'bad', 0.0, 'ok')
+    planner.store.create_iteration('2025-01-01', 'boom', 0.0, 'ok')
+    tasks = planner.generate_tasks()
+    assert len(tasks) == 40
+    assert [t['score'] for t in tasks] == sorted((t['score'] for t in tasks), reverse=True)
+    assert 1 < llm.peak <= 4
+    top = planner.generate_tasks(top_n=3)
+    assert [t['description'] for t in top] == [t['description'] for t in tasks[:3]]
+    assert [t['score'] for t in top] == [9.0, 9.0, 9.0]
+    assert top[0]['description'].startswith('Iteration 10 ')  # früheste Iteration bei Gleichstand
+
+
+def test_unchanged_iterations_use_cache(tmp_path):
+    llm = _LLM()
+    planner = _planner(tmp_path, llm)
+    _add(planner, 10)
+    planner.store.create_iteration('2025-01-01', 'boom', 0.0, 'ok')
+    first = planner.generate_tasks()
+    assert llm.calls == 11
+    planner.store.update_iteration(3, coverage_delta=50.0)
+    second = planner.generate_tasks()
+    assert llm.calls == 11 + 2  # geänderte Iteration + fehlgeschlagener Aufruf wird wiederholt
+    assert second[0]['score'] == 50.0
+    assert len(second) == len(first)
+    # neuer Planner auf derselben DB nutzt den persistenten Cache
+    other = _planner(tmp_path, _LLM())
+    assert len(other.generate_tasks()) == 10 and other.llm.calls == 1
@@ -0,0 +1,116 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from codepipeline.metrics_pusher import MetricsPusher
+
+
+class _Gateway(BaseHTTPRequestHandler):
+    """Minimal Pushgateway stand-in recording request bodies."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        self.server.requests.append((self.path, body))
+        self.send_response(202)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def gateway():
+    server = HTTPServer(('127.0.0.1', 0), _Gateway)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_flush_coalesces_updates(gateway):
+    pusher = MetricsPusher(f'127.0.0.1:{gateway.server_port}', 'reward_engine')
+    for value in range(100):
+        pusher.set('pipeline_patch_score', value, {'patch_id': 'a'}, 'score')
+    pusher.set('pipeline_patch_score', 1.5, {'patch_id': 'b'})
+    assert pusher.flush()
+    [(path, body)] = gateway.requests
+    assert path == '/metrics/job/reward_engine'
+    assert 'pipeline_patch_score{patch_id="a"} 99.0' in body
+    assert 'pipeline_patch_score{patch_id="b"} 1.5' in body
+    assert pusher.pending == 0
+
+
+def test_flush_pushes_only_changed_families(gateway):
+    pusher = MetricsPusher(f'127.0.0.1:{gateway.server_port}', 'job')
+    pusher.set('a', 1.0, {'k': 'x'})
+    pusher.set('b', 2.0)
+    assert pusher.flush()
+    pusher.set('a', 3.0, {'k': 'y'})
+    assert pusher.flush()
+    assert pusher.flush()  # nothing changed, nothing sent
+    assert len(gateway.requests) == 2
+    body = gateway.requests[1][1]
+    assert 'a{k="x"} 1.0' in body and 'a{k="y"} 3.0' in body  # the whole family, POST replaces it by name
+    assert '\nb ' not in body
+
+
+def test_atexit_hook_does_not_keep_pusher_alive():
+    import gc
+    import weakref
+    pusher = MetricsPusher('127.0.0.1:1', 'job', interval=60)
+    pusher.start()
+    pusher._stopping.set()
+    pusher._wake.set()
+    pusher._thread.join()  # thread gone, exit hook still registered
+    ref = weakref.ref(pusher)
+    hook = pusher._atexit
+    del pusher
+    gc.collect()
+    assert ref() is None
+    hook()  # harmless once the pusher is gone
+
+
+def test_background_flush_on_size_threshold(gateway):
+    pusher = MetricsPusher(f'127.0.0.1:{gateway.server_port}', 'job', interval=60, flush_size=10)
+    with pusher:
+        pusher.set_many('m', (({'i': i}, i) for i in range(10)))
+        deadline = time.monotonic() + 5
+        while not gateway.requests and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert gateway.requests
+
+
+def test_bounded_drop_oldest_while_gateway_down():
+    pusher = MetricsPusher(f'127.0.0.1:{_free_port()}', 'job', max_series=5, timeout=1)
+    pusher.set_many('m', (({'i': i}, i) for i in range(8)))
+    assert not pusher.flush()
+    assert pusher.pending == 8  # kept pending for the next attempt
+    assert pusher.dropped == 3
+    assert [dict(labels)['i'] for _, labels in pusher._series] == ['3', '4', '5', '6', '7']
+
+
+def test_set_does_not_wait_for_slow_gateway():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen()  # accepts connections but never answers
+    pusher = MetricsPusher('127.0.0.1:%d' % listener.getsockname()[1], 'job', interval=0.01, timeout=2)
+    pusher.start()
+    try:
+        t0 = time.perf_counter()
+        for i in range(10_000):
+            pusher.set('m', i, {'k': 'v'})
+        assert time.perf_counter() - t0 < 1.0
+    finally:
+        pusher.stop(flush=False)
+        listener.close()
@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+from codepipeline.provider_broker import Broker, Provider
+
+
+class FakeProvider(Provider):
+    def __init__(self, name, latency=0.0, fail=False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.fail:
+            raise ValueError(f"{self.name} down")
+        return f"{self.name}:{prompt}"
+
+
+def test_routes_to_fastest_healthy_provider():
+    slow, fast = FakeProvider("slow", 0.02), FakeProvider("fast", 0.001)
+    broker = Broker([slow, fast], explore=0)
+    assert broker.generate("a") == "slow:a"  # unmeasured providers go first, in list order
+    assert broker.generate("b") == "fast:b"
+    for _ in range(5):
+        assert broker.generate("c") == "fast:c"
+    assert slow.calls == 1
+    assert broker.ranking() == [fast, slow]
+
+
+def test_failing_provider_is_demoted_and_recovers(monkeypatch):
+    flaky, backup = FakeProvider("flaky", fail=True), FakeProvider("backup", 0.005)
+    broker = Broker([flaky, backup], alpha=0.5, recovery_time=60, explore=0)
+    for _ in range(3):
+        assert broker.generate("x") == "backup:x"
+    assert broker.ranking() == [backup, flaky]
+    assert flaky.calls <= 2
+    flaky.fail = False
+    now = time.monotonic()
+    monkeypatch.setattr("codepipeline.provider_broker.time.monotonic", lambda: now + 61)
+    assert broker.ranking() == [backup, flaky]  # healthy again after recovery_time, not yet measured
+    backup.fail = True
+    assert broker.generate("y") == "flaky:y"
+    assert broker.ranking()[0] is flaky  # measured now, and faster
+
+
+def test_all_providers_failing_raises():
+    broker = Broker([FakeProvider("a", fail=True), FakeProvider("b", fail=True)], hedge=True)
+    with pytest.raises(RuntimeError, match="All providers failed"):
+        broker.generate("x")
+
+
+def test_hedged_request_beats_slow_primary():
+    primary, second = FakeProvider("primary", 0.002), FakeProvider("second", 0.02)
+    broker = Broker([primary, second], hedge=True, min_samples=5, explore=0)
+    for _ in range(6):  # second is tried once while unmeasured
+        broker.generate("warm")
+    assert broker.ranking()[0] is primary and primary.calls == 5
+    primary.latency = 0.3  # stall well beyond its p95
+    start = time.perf_counter()
+    assert broker.generate("x") == "second:x"
+    assert time.perf_counter() - start < 0.1
+    assert second.calls == 2
+    broker.close()
+
+
+def test_open_circuit_is_skipped_at_routing_time():
+    from codepipeline.circuit import BreakerRegistry, CircuitOpenError
+
+    down, up = FakeProvider("down", fail=True), FakeProvider("up")
+    broker = Broker([down, up], breakers=BreakerRegistry(fail_max=1, reset_timeout=60), explore=0, recovery_time=0)
+    for _ in range(4):
+        assert broker.generate("x") == "up:x"
+    assert down.calls == 1  # circuit opened on the first failure, never called again
+    assert broker.ranking() == [up]
+    up.fail = True
+    with pytest.raises(RuntimeError, match="up down"):
+        broker.generate("y")
+    with pytest.raises(CircuitOpenError):
+        broker.generate("z")
+
+
+def test_unmeasured_provider_gets_mean_latency_prior():
+    fast, slow, never = FakeProvider("fast", 0.001), FakeProvider("slow", 0.03), FakeProvider("never", fail=True)
+    broker = Broker([never, fast, slow], explore=0, max_error_rate=0.9)
+    broker.stats[id(fast)].record(0.001, True, broker.alpha)
+    broker.stats[id(slow)].record(0.03, True, broker.alpha)
+    # never-measured provider ranks by the mean of the others, not as if it had zero latency
+    assert broker.ranking() == [fast, never, slow]
+    broker.generate("x")
+    assert never.calls == 0
+    broker.stats[id(never)].record(0.0, False, broker.alpha)  # failed once, still healthy
+    assert broker.ranking() == [fast, never, slow]
+    broker.stats[id(slow)].latency = broker.stats[id(fast)].latency  # all three tie now
+    assert broker.ranking()[-1] is never  # ties go to providers that have not failed
+
+
+def test_broker_uses_private_registry_by_default():
+    from codepipeline.circuit import BREAKERS
+
+    provider = FakeProvider("private-default")
+    broker = Broker([provider])
+    assert broker.breakers[id(provider)] is not BREAKERS.get(*provider.breaker_key)
+    assert provider.breaker_key == ("private-default", "", "")
+
+
+def test_broker_requires_providers_and_does_not_explore_by_default():
+    with pytest.raises(ValueError):
+        Broker([])
+    assert Broker([FakeProvider("a")]).explore == 0
@@ -0,0 +1,79 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from codepipeline.rate_limit import RateLimiter, default_limiter, estimate_tokens, is_rate_limited, retry_after
+
+
+def _exc(status=429, **headers):
+    exc = RuntimeError("rate limited")
+    exc.status_code = status
+    exc.response = SimpleNamespace(status_code=status, headers=headers)
+    return exc
+
+
+def test_estimate_tokens():
+    msgs = [{"role": "system", "content": "x" * 40}, {"role": "user", "content": "y" * 400}]
+    assert estimate_tokens(msgs, max_tokens=100) == 4 + 10 + 4 + 100 + 100
+    assert estimate_tokens([], None) == 256
+
+
+def test_retry_after_headers():
+    assert retry_after(_exc(**{"retry-after": "3"})) == 3.0
+    assert retry_after(_exc(**{"retry-after-ms": "250", "retry-after": "3"})) == 0.25
+    date = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 30))
+    assert 25 < retry_after(_exc(**{"retry-after": date})) <= 30
+    assert retry_after(RuntimeError("no response")) is None
+    assert retry_after(_exc(**{"retry-after": "soon"})) is None
+    assert retry_after(_exc(**{"retry-after": ""})) is None
+    assert is_rate_limited(_exc()) and not is_rate_limited(_exc(status=500))
+
+
+def test_requests_bucket_paces_calls():
+    limiter = RateLimiter(rpm=600, headroom=1.0, burst_seconds=0.1)  # 10/s, burst 1
+    waits = [limiter.reserve() for _ in range(10)]
+    assert waits[0] == 0
+    assert waits[-1] == pytest.approx(0.9, abs=0.02)
+
+
+def test_tokens_bucket_paces_by_size():
+    limiter = RateLimiter(tpm=6000, headroom=1.0, burst_seconds=1)  # 100 tokens/s, burst 100
+    assert limiter.reserve(100) == 0
+    assert limiter.reserve(50) == pytest.approx(0.5, abs=0.02)
+
+
+def test_block_holds_back_everyone():
+    limiter = RateLimiter(rpm=6000)
+    limiter.block(1.0)
+    assert limiter.reserve() == pytest.approx(1.0, abs=0.02)
+    limiter.block(None)  # no hint -> no-op
+
+
+def test_threads_share_quota():
+    limiter = RateLimiter(rpm=1200, headroom=1.0, burst_seconds=0.05)  # 20/s, burst 1
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=lambda: [limiter.acquire() for _ in range(3)]) for _ in range(7)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert 0.9 <= time.monotonic() - t0 < 1.5  # 21 calls at 20/s
+
+
+def test_sqlite_state_shared_between_limiters(tmp_path):
+    a = RateLimiter(rpm=600, headroom=1.0, burst_seconds=0.1, path=tmp_path / "rl.db")
+    b = RateLimiter(rpm=600, headroom=1.0, burst_seconds=0.1, path=tmp_path / "rl.db")
+    assert a.reserve() == 0
+    assert b.reserve() == pytest.approx(0.1, abs=0.02)
+    b.block(2.0)
+    assert a.reserve() == pytest.approx(2.0, abs=0.05)
+
+
+def test_default_limiter_from_env(monkeypatch):
+    monkeypatch.delenv("LLM_RPM", raising=False)
+    monkeypatch.delenv("LLM_TPM", raising=False)
+    assert default_limiter() is None
+    monkeypatch.setenv("LLM_TPM", "90000")
+    assert default_limiter() is not None
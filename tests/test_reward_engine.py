@@ -0,0 +1,49 @@
+import pytest
+from codepipeline.metrics_pusher import MetricsPusher
+from codepipeline.reward_engine import RewardEngine
+
+@pytest.fixture
+def pushes(monkeypatch):
+    calls = []
+    monkeypatch.setattr('codepipeline.metrics_pusher.pushadd_to_gateway', lambda *a, **kw: calls.append(kw))
+    return calls
+
+def _engine(tmp_path):
+    return RewardEngine(tmp_path / 'it.db', pusher=MetricsPusher('localhost:1', 'reward_engine'))
+
+def test_evaluate_weighted_score(tmp_path, pushes):
+    engine = _engine(tmp_path)
+    engine.store.create_iteration('2025-01-01', 'fix-123', 0.0, 'ok', coverage_delta=2.0, performance=1.0, cost=1.0)
+    assert engine.evaluate('fix-123') == pytest.approx(0.5 * 2.0 + 0.3 * 1.0 - 0.2 * 1.0)
+    assert pushes == []  # Push erfolgt nicht mehr im Bewertungsaufruf
+    assert engine.pusher.flush()
+    assert len(pushes) == 1
+    with pytest.raises(ValueError):
+        engine.evaluate('unknown')
+
+def test_evaluate_many_single_push(tmp_path, pushes):
+    engine = _engine(tmp_path)
+    engine.store.create_iterations_bulk(
+        {'timestamp': '2025-01-01', 'patch': f'p{i}', 'score': 0.0, 'status': 'ok',
+         'coverage_delta': float(i), 'performance': 1.0, 'cost': 2.0}
+        for i in range(20)
+    )
+    engine.store.create_iteration('2025-01-02', 'p3', 0.0, 'ok', coverage_delta=99.0)  # jüngerer Duplikat-Eintrag
+    scores = engine.evaluate_many(['p5', 'p3', 'p5'])
+    assert list(scores) == ['p5', 'p3']
+    assert scores['p3'] == pytest.approx(0.5 * 3 + 0.3 - 0.4)
+    all_scores = engine.evaluate_all()
+    assert len(all_scores) == 20
+    assert all_scores['p19'] == pytest.approx(engine.evaluate('p19'))
+    assert engine.pusher.pending == 23
+    engine.pusher.flush()
+    assert len(pushes) == 1
+    with pytest.raises(ValueError):
+        engine.evaluate_many(['p1', 'missing'])
+
+def test_default_pusher_runs_in_background(tmp_path, pushes):
+    engine = RewardEngine(tmp_path / 'it.db', prometheus_gateway='localhost:1')
+    engine.store.create_iteration('2025-01-01', 'fix-1', 0.0, 'ok', coverage_delta=1.0)
+    engine.evaluate('fix-1')
+    engine.close()
+    assert pushes and pushes[-1]['job'] == 'reward_engine'
@@ -0,0 +1,168 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from codepipeline.prompt_guard import PromptTemplate
+from codepipeline.semantic_cache import SemanticCache, default_semantic_cache, is_semantic_hit, normalize_prompt
+
+PROMPT = "Write a Python function that parses an ISO 8601 date string and returns a datetime"
+
+
+def bag_of_words(text):
+    """Deterministic stand-in for an embedding model in tests."""
+    vec = np.zeros(256, dtype=np.float32)
+    for word in text.split():
+        vec[zlib.crc32(word.encode()) % 256] += 1.0
+    return vec
+
+
+class FixedEmbedder:
+    """Returns preset vectors, e.g. what a real model gives two opposite prompts."""
+
+    model = "fixed"
+
+    def __init__(self, vectors):
+        self.vectors = {normalize_prompt(k): np.asarray(v, dtype=np.float32) for k, v in vectors.items()}
+
+    def __call__(self, text):
+        return self.vectors[text]
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Write\ta  FUNCTION\n") == "write a function"
+
+
+def test_cache_requires_embedding_model(monkeypatch):
+    with pytest.raises(TypeError):
+        SemanticCache()
+    monkeypatch.delenv("LLM_SEMANTIC_EMBED_MODEL", raising=False)
+    assert default_semantic_cache() is None  # no embedding model, no semantic cache
+
+
+def test_opposite_prompts_miss_at_default_threshold():
+    # cosine 0.94: close in embedding space, opposite in meaning
+    asc, desc = "Sort the list in ascending order", "Sort the list in descending order"
+    cache = SemanticCache(FixedEmbedder({asc: [1.0, 0.0], desc: [0.94, np.sqrt(1 - 0.94 ** 2)]}))
+    cache.add("s", asc, "sorted(xs)")
+    assert cache.lookup("s", asc) == "sorted(xs)"
+    assert cache.lookup("s", desc) is None
+    assert PromptTemplate(name="t", system="s", semantic_cache=True).semantic_threshold == cache.threshold
+
+
+def test_lookup_threshold_scope_and_stats():
+    cache = SemanticCache(bag_of_words, threshold=0.9)
+    cache.add("scope-a", PROMPT, "def parse(s): ...")
+    hit = cache.lookup("scope-a", PROMPT.upper() + "  ")
+    assert hit == "def parse(s): ..." and is_semantic_hit(hit)
+    assert hit.similarity == pytest.approx(1.0) and hit.matched_prompt == PROMPT
+    assert cache.lookup("scope-b", PROMPT) is None  # other system prompt / model
+    assert cache.lookup("scope-a", "Implement a Redis backed rate limiter") is None
+    assert cache.lookup("scope-a", PROMPT + " object", threshold=0.99) is None
+    assert cache.stats == {"hits": 1, "misses": 3, "audits": 0, "false_hits": 0}
+
+
+def test_persistence_and_max_entries(tmp_path):
+    import sqlite3
+
+    cache = SemanticCache(bag_of_words, path=tmp_path / "s.db", max_entries=4, prune_batch=2)
+    for i in range(6):
+        cache.add("s", f"prompt number {i} about sorting", f"answer {i}")
+    with sqlite3.connect(tmp_path / "s.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM semantic_cache").fetchone()[0] == 6  # pruned in batches
+    cache.add("s", "prompt number 6 about sorting", "answer 6")
+    with sqlite3.connect(tmp_path / "s.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM semantic_cache").fetchone()[0] == 4
+    assert cache.lookup("s", "prompt number 2 about sorting", threshold=0.99) is None  # evicted
+    reloaded = SemanticCache(bag_of_words, path=tmp_path / "s.db", max_entries=4)
+    assert reloaded.lookup("s", "prompt number 6 about sorting") == "answer 6"
+    assert [len(index) for index in reloaded._scopes.values()] == [4]
+
+
+def test_ring_buffer_overwrites_oldest_in_place():
+    cache = SemanticCache(bag_of_words, max_entries=3)
+    for i in range(5):
+        cache.add("s", f"prompt {i}", f"answer {i}")
+    [index] = cache._scopes.values()
+    assert index.prompts == ["prompt 3", "prompt 4", "prompt 2"]
+    assert len(index.vectors) == 3
+    assert cache.lookup("s", "prompt 4", threshold=0.99) == "answer 4"
+    assert cache.lookup("s", "prompt 1", threshold=0.99) is None
+
+
+def test_audit_counts_false_hits():
+    cache = SemanticCache(bag_of_words)
+    cache.add("s", PROMPT, "def parse(s):\n    return datetime.fromisoformat(s)\n")
+    hit = cache.lookup("s", PROMPT)
+    assert cache.audit(hit, "def parse(s):\n    return datetime.fromisoformat(s)\n") is False
+    assert cache.audit(hit, "class RateLimiter:\n    pass\n") is True
+    assert cache.stats["audits"] == 2 and cache.stats["false_hits"] == 1
+
+
+def test_template_controls_gateway_semantic_cache():
+    from unittest.mock import MagicMock
+    from codepipeline.llm_gateway import LLMGateway
+
+    fake_client = MagicMock()
+    fake_client.chat.completions.create.return_value = MagicMock(choices=[MagicMock(message=MagicMock(content="code"))])
+    gw = LLMGateway(client=fake_client, semantic_cache=SemanticCache(bag_of_words))
+    tpl = PromptTemplate(name="t", system="sys", semantic_cache=True, similarity_threshold=0.9)
+    assert PromptTemplate(name="off", system="sys").semantic_threshold is None
+
+    def msgs(prompt):
+        return [{"role": "system", "content": "sys"}, {"role": "user", "content": prompt}]
+
+    first = gw.chat(msgs(PROMPT), semantic_threshold=tpl.semantic_threshold)
+    assert first == "code" and not is_semantic_hit(first)
+    second = gw.chat(msgs("  " + PROMPT.lower()), semantic_threshold=tpl.semantic_threshold)
+    assert is_semantic_hit(second) and second == "code"
+    assert fake_client.chat.completions.create.call_count == 1
+    # without the template opt-in, the paraphrase goes upstream
+    gw.chat(msgs(PROMPT.lower()))
+    assert fake_client.chat.completions.create.call_count == 2
+
+
+def test_openai_embedder_and_default_cache(monkeypatch, tmp_path):
+    from types import SimpleNamespace
+    from unittest.mock import MagicMock
+    from codepipeline.semantic_cache import OpenAIEmbedder
+
+    client = MagicMock()
+    client.embeddings.create.return_value = SimpleNamespace(data=[SimpleNamespace(embedding=[0.6, 0.8])])
+    embed = OpenAIEmbedder("text-embedding-3-large", client=client)
+    assert embed("hi") == [0.6, 0.8]
+    client.embeddings.create.assert_called_once_with(model="text-embedding-3-large", input="hi")
+
+    monkeypatch.setenv("LLM_SEMANTIC_EMBED_MODEL", "text-embedding-3-large")
+    monkeypatch.setenv("LLM_SEMANTIC_CACHE_PATH", "")
+    monkeypatch.setattr("openai.OpenAI", lambda: client)
+    cache = default_semantic_cache()
+    assert cache.embedder.model == "text-embedding-3-large" and cache.path is None
+
+
+def test_gateways_embed_once_per_miss_and_off_the_event_loop():
+    import asyncio
+    import threading
+    from unittest.mock import AsyncMock, MagicMock
+    from codepipeline.llm_gateway import AsyncLLMGateway, LLMGateway
+
+    calls = []
+
+    def embedder(text):
+        calls.append(threading.current_thread())
+        return bag_of_words(text)
+
+    msgs = [{"role": "user", "content": PROMPT}]
+    reply = MagicMock(choices=[MagicMock(message=MagicMock(content="code"))])
+    sync_client = MagicMock()
+    sync_client.chat.completions.create.return_value = reply
+    LLMGateway(client=sync_client, semantic_cache=SemanticCache(embedder)).chat(msgs, semantic_threshold=0.9)
+    assert len(calls) == 1  # the lookup's vector is reused for the insert
+
+    calls.clear()
+    async_client = MagicMock()
+    async_client.chat.completions.create = AsyncMock(return_value=reply)
+    gw = AsyncLLMGateway(client=async_client, semantic_cache=SemanticCache(embedder))
+    assert asyncio.run(gw.chat(msgs, semantic_threshold=0.9)) == "code"
+    assert is_semantic_hit(asyncio.run(gw.chat(msgs, semantic_threshold=0.9)))
+    assert len(calls) == 2 and threading.main_thread() not in calls
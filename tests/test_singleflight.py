@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from codepipeline.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("k", upstream))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while flight.coalesced < 7:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1]
+    assert results == ["result"] * 8
+    assert flight.in_flight() == 0
+    assert flight.do("k", lambda: "fresh") == "fresh"  # finished keys are forgotten
+
+
+def test_threads_share_exception():
+    flight = SingleFlight()
+    started = threading.Event()
+
+    def upstream():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("429")
+
+    errors = []
+
+    def caller():
+        try:
+            flight.do("k", upstream)
+        except RuntimeError as exc:
+            errors.append(str(exc))
+
+    first = threading.Thread(target=caller)
+    first.start()
+    started.wait()
+    second = threading.Thread(target=caller)
+    second.start()
+    first.join()
+    second.join()
+    assert errors == ["429", "429"]
+
+
+def test_async_callers_share_one_call():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def upstream(value):
+        calls.append(value)
+        await asyncio.sleep(0.02)
+        return value
+
+    async def run():
+        same = [flight.do("a", lambda: upstream("a")) for _ in range(5)]
+        other = flight.do("b", lambda: upstream("b"))
+        return await asyncio.gather(*same, other)
+
+    assert asyncio.run(run()) == ["a"] * 5 + ["b"]
+    assert sorted(calls) == ["a", "b"]
+    assert flight.coalesced == 4 and flight.in_flight() == 0
+
+
+def test_async_cancelled_waiter_does_not_cancel_shared_call():
+    flight = AsyncSingleFlight()
+
+    async def upstream():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(flight.do("k", upstream))
+        second = asyncio.ensure_future(flight.do("k", upstream))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "done"
@@ -0,0 +1,70 @@
+import threading
+import time
+from codepipeline.task_queue import TaskQueue
+from codepipeline.task_executor import TaskExecutor, TASK_QUEUE_WAIT, TASK_RUN_DURATION
+
+def _double(task):
+    return task['payload']['n'] * 2
+
+def test_executor_runs_registered_handlers(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    ids = q.enqueue_many([('double', {'n': i}) for i in range(20)])
+    other = q.enqueue('unregistered', {})
+    with TaskExecutor(q, max_workers=4, poll_timeout=0.05) as ex:
+        ex.register('double', _double)
+        deadline = time.monotonic() + 10
+        while q.get_status(ids[-1]) != 'success' and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert all(q.get_status(i) == 'success' for i in ids)
+    assert q.get_result(ids[3]) == 6
+    assert q.get_status(other) == 'pending'
+    assert TASK_QUEUE_WAIT.labels(type='double')._sum.get() >= 0
+    q.close()
+
+def test_per_type_concurrency_cap(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    ids = q.enqueue_many([('llm', {}) for _ in range(8)])
+    running, peak, lock = [0], [0], threading.Lock()
+    def handler(task):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+    ex = TaskExecutor(q, max_workers=6, poll_timeout=0.05)
+    ex.register('llm', handler, max_concurrency=2)
+    ex.start()
+    deadline = time.monotonic() + 10
+    while q.get_status(ids[-1]) != 'success' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ex.shutdown()
+    assert peak[0] == 2
+    q.close()
+
+def test_failures_retry_then_fail_and_shutdown_drains(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    bad = q.enqueue('boom', {})
+    slow = q.enqueue('slow', {})
+    ex = TaskExecutor(q, max_workers=2, max_attempts=1, poll_timeout=0.05)
+    ex.register('boom', lambda task: 1 / 0)
+    ex.register('slow', lambda task: time.sleep(0.2))
+    ex.start()
+    while q.get_status(slow) != 'in_progress':
+        time.sleep(0.01)
+    assert ex.shutdown(drain=True)
+    assert q.get_status(slow) == 'success'
+    assert q.get_status(bad) == 'failed'
+    assert TASK_RUN_DURATION.labels(type='boom', status='failed')._sum.get() > 0
+    q.close()
+
+def test_process_pool_mode(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    ids = q.enqueue_many([('double', {'n': i}) for i in range(4)])
+    with TaskExecutor(q, max_workers=2, use_processes=True, poll_timeout=0.05) as ex:
+        ex.register('double', _double)
+        deadline = time.monotonic() + 30
+        while q.get_status(ids[-1]) != 'success' and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert all(q.get_status(i) == 'success' for i in ids)
+    q.close()
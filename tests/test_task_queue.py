@@ -0,0 +1,192 @@
+import time
+from codepipeline.task_queue import TaskQueue
+
+def test_fetch_batch_claims_with_lease(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db', worker_id='w1')
+    ids = [q.enqueue('dummy', {'n': i}) for i in range(5)]
+    batch = q.fetch_batch(3, lease_seconds=60)
+    assert [t['id'] for t in batch] == ids[:3]
+    assert all(t['worker_id'] == 'w1' for t in batch)
+    assert [t['payload']['n'] for t in batch] == [0, 1, 2]
+    assert all(q.get_status(i) == 'in_progress' for i in ids[:3])
+    # remaining rows are still claimable, claimed ones are not handed out twice
+    assert [t['id'] for t in q.fetch_batch(10)] == ids[3:]
+    assert q.fetch_batch(10) == []
+    q.close()
+
+def test_expired_lease_is_requeued(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db', worker_id='crashed')
+    task_id = q.enqueue('dummy', {})
+    assert q.fetch_batch(1, lease_seconds=0.01)[0]['id'] == task_id
+    time.sleep(0.02)
+    task = q.fetch_next(worker_id='w2')
+    assert task['id'] == task_id
+    assert task['worker_id'] == 'w2'
+    # the crashed worker lost its lease and cannot renew it any more
+    assert not q.renew_lease(task_id, worker_id='crashed')
+    assert q.renew_lease(task_id, lease_seconds=60, worker_id='w2')
+    q.close()
+
+def test_heartbeat_renews_all_leases_of_worker(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db', worker_id='w1')
+    for _ in range(3):
+        q.enqueue('dummy', {})
+    q.fetch_batch(3, lease_seconds=0.05)
+    assert q.heartbeat(lease_seconds=60) == 3
+    time.sleep(0.06)
+    assert q.requeue_expired() == 0
+    assert q.fetch_batch(3) == []
+    q.close()
+
+def test_concurrent_threads_never_claim_twice(tmp_path):
+    import threading
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    for i in range(200):
+        q.enqueue('dummy', {'n': i})
+    claimed, lock = [], threading.Lock()
+    def worker():
+        while True:
+            batch = q.fetch_batch(7)
+            if not batch:
+                return
+            with lock:
+                claimed.extend(t['id'] for t in batch)
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == list(range(1, 201))
+    q.close()
+
+def test_tuned_storage_uses_wal(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    assert q.conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    q.close()
+    legacy = TaskQueue(db_path=':memory:')
+    assert not legacy.tuned
+    legacy.close()
+
+def test_enqueue_many_single_transaction_and_dedup(tmp_path):
+    from codepipeline.task_queue import make_dedup_key
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    key = make_dedup_key('synth', {'prompt': 'p', 'target': 'a.py'})
+    existing = q.enqueue('synth', {'prompt': 'p', 'target': 'a.py'}, dedup_key=key)
+    assert q.enqueue('synth', {'target': 'a.py', 'prompt': 'p'},
+                     dedup_key=make_dedup_key('synth', {'target': 'a.py', 'prompt': 'p'})) == existing
+    ids = q.enqueue_many([
+        ('synth', {'prompt': 'q'}),
+        {'type': 'synth', 'payload': {'prompt': 'p', 'target': 'a.py'}, 'dedup_key': key},
+        ('review', {'pr': 1}, 'pr-1'),
+        ('review', {'pr': 1}, 'pr-1'),
+        ('synth', {'prompt': 'r'}),
+    ])
+    assert ids[1] == existing
+    assert ids[2] == ids[3]
+    assert len(set(ids)) == 4
+    assert sorted(t['id'] for t in q.fetch_batch(10)) == sorted(set(ids))
+    assert q.enqueue_many([]) == []
+    q.close()
+
+def test_priority_then_fair_across_types(tmp_path):
+    from codepipeline.task_queue import PRIORITY_INTERACTIVE
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    bulk = q.enqueue_many([('fine_tune', {'n': i}) for i in range(3)])
+    review = q.enqueue_many([('review', {'n': i}) for i in range(3)])
+    synth = q.enqueue('synth', {'prompt': 'p'})
+    urgent = q.enqueue('review', {'n': 99}, priority=PRIORITY_INTERACTIVE)
+    order = [t['id'] for t in q.fetch_batch(10)]
+    assert order[:2] == [synth, urgent]
+    # equal priority: alternate between types instead of draining one first
+    assert order[2:] == [bulk[0], review[0], bulk[1], review[1], bulk[2], review[2]]
+    q.close()
+
+def test_retry_backoff_and_delay(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    later = q.enqueue('dummy', {}, delay=60)
+    task_id = q.enqueue('dummy', {})
+    assert q.fetch_next()['id'] == task_id
+    q.mark_retry(task_id, 'flaky')
+    assert q.get_status(task_id) == 'retry'
+    assert q.fetch_next() is None  # backing off, and `later` is not due yet
+    q.mark_retry(task_id, 'flaky', delay=0)
+    task = q.fetch_next()
+    assert task['id'] == task_id and task['attempts'] == 2
+    assert q.get_status(later) == 'pending'
+    q.close()
+
+def _enqueue_from_other_process(db_path):
+    TaskQueue(db_path=db_path).enqueue('dummy', {'from': 'child'})
+
+def test_blocking_fetch_wakes_on_enqueue(tmp_path):
+    import threading
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    assert q.fetch_next(timeout=0.05) is None
+    threading.Timer(0.1, q.enqueue, args=('dummy', {})).start()
+    t0 = time.monotonic()
+    assert q.fetch_next(timeout=10) is not None
+    assert time.monotonic() - t0 < 1.0
+    q.close()
+
+def test_blocking_fetch_wakes_on_enqueue_from_other_process(tmp_path):
+    import multiprocessing as mp
+    db = tmp_path / 'tasks.db'
+    q = TaskQueue(db_path=db)
+    proc = mp.get_context('spawn').Process(target=_enqueue_from_other_process, args=(db,))
+    proc.start()
+    task = q.fetch_next(timeout=30)
+    proc.join()
+    assert task['payload'] == {'from': 'child'}
+    q.close()
+
+def test_blocking_fetch_waits_for_delayed_task(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    task_id = q.enqueue('dummy', {}, delay=0.2)
+    t0 = time.monotonic()
+    assert q.fetch_next(timeout=10)['id'] == task_id
+    assert 0.15 < time.monotonic() - t0 < 1.0
+    q.close()
+
+def test_blocking_fetch_ignores_due_rows_of_other_types(tmp_path, monkeypatch):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    q.enqueue('unregistered', {})
+    claims = []
+    real_claim = q._claim
+    monkeypatch.setattr(q, '_claim', lambda *a, **kw: claims.append(1) or real_claim(*a, **kw))
+    assert q.fetch_next(timeout=0.3, types={'run_pipeline': 1}) is None
+    assert len(claims) <= 2  # waits on the notifier instead of re-claiming every 10 ms
+    assert q.get_status(1) == 'pending'
+    q.close()
+
+def test_results_are_stored_with_size_limit(tmp_path):
+    import pytest
+    from codepipeline import task_queue
+    q = TaskQueue(db_path=tmp_path / 'tasks.db')
+    task_id = q.enqueue('synth', {'prompt': 'p'})
+    q.fetch_next()
+    q.mark_success(task_id, {'code': "print('hi')"})
+    assert q.get_result(task_id) == {'code': "print('hi')"}
+    other = q.enqueue('synth', {'prompt': 'q'})
+    with pytest.raises(ValueError):
+        q.mark_success(other, 'x' * (task_queue.MAX_RESULT_BYTES + 1))
+    assert q.get_status(other) == 'pending'
+    assert q.get_result(other) is None
+    q.close()
+
+def test_archive_moves_old_finished_rows_and_compacts(tmp_path):
+    q = TaskQueue(db_path=tmp_path / 'tasks.db', archive_path=tmp_path / 'archive.db')
+    done = q.enqueue_many([('dummy', {'n': i}, f'key-{i}') for i in range(50)])
+    open_task = q.enqueue('dummy', {'n': 'open'})
+    for task_id in done:
+        q.mark_success(task_id, {'n': task_id})
+    assert q.archive_finished(ttl_seconds=3600) == 0
+    assert q.archive_finished(ttl_seconds=0, batch_size=7) == 50
+    assert q.conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0] == 1
+    assert q.get_status(done[0]) == ''
+    assert q.get_result(done[3]) == {'n': done[3]}
+    assert q.get_status(open_task) == 'pending'
+    # archived rows release their idempotency key
+    assert q.enqueue('dummy', {'n': 0}, dedup_key='key-0') not in done
+    q.compact()
+    assert q.conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    q.close()